@@ -0,0 +1,211 @@
+"""
+Overview: admission.py
+Purpose: Bounds concurrent orchestration with a fixed wait queue and runs admitted work on a sized executor.
+Notes: Requests beyond the queue fail fast with Overloaded so callers see 429 instead of a silent pile-up.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Collection, Deque, Dict, Optional, TypeVar
+
+from .memory import _env_int
+from .metrics import admission_requested
+
+T = TypeVar("T")
+
+# Weight of the newest sample in the service-time average used for Retry-After.
+_EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; ``retry_after`` is in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"Engine is at capacity ({reason}).")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Admits up to ``limit`` requests at once and queues up to ``queue_limit`` more.
+
+    Waiters are served in arrival order. A waiter that is not admitted within
+    ``queue_timeout`` seconds gives up with ``Overloaded`` rather than holding
+    its caller past any useful deadline. ``limit <= 0`` disables admission.
+    """
+
+    def __init__(self, limit: int, queue_limit: int, queue_timeout: float) -> None:
+        self.limit = limit
+        self.queue_limit = max(queue_limit, 0)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Guards counters read from scrape threads; admission itself runs on the event loop.
+        self._lock = threading.Lock()
+        self._service_seconds = 0.0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Estimates when a slot frees up from the queue depth and average service time."""
+        if self.limit <= 0:
+            return 1
+        backlog = (len(self._waiters) + 1) * self._service_seconds / self.limit
+        return max(1, math.ceil(backlog))
+
+    def check(self) -> None:
+        """Fails fast when a new request would be rejected; used before committing to a stream."""
+        if self.limit > 0 and self.in_flight >= self.limit and len(self._waiters) >= self.queue_limit:
+            with self._lock:
+                self.rejected_queue_full += 1
+            raise Overloaded("queue full", self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        admission_requested.set(time.perf_counter())
+        if self.limit <= 0:
+            yield
+            return
+        await self._acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._service_seconds += _EWMA_ALPHA * (elapsed - self._service_seconds)
+            self._release()
+
+    async def _acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            with self._lock:
+                self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_limit:
+            with self._lock:
+                self.rejected_queue_full += 1
+            raise Overloaded("queue full", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            if self.queue_timeout > 0:
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            else:
+                await waiter
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as the wait ended; hand the slot on instead of leaking it.
+                self._release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.TimeoutError):
+                with self._lock:
+                    self.rejected_timeout += 1
+                raise Overloaded("queue timeout", self.retry_after()) from None
+            raise
+        with self._lock:
+            self.admitted += 1
+
+    def _release(self) -> None:
+        # The slot passes straight to the oldest live waiter, so in_flight is unchanged.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool sized to the admission limit, so admitted work never waits for a thread."""
+        if self._executor is None:
+            workers = self.limit if self.limit > 0 else min(32, (os.cpu_count() or 1) + 4)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="orchestration")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Admits the caller, then runs blocking ``func`` on the orchestration executor."""
+        async with self.slot():
+            # Copy the caller's context so request-scoped values (the metrics start time) reach the thread.
+            context = contextvars.copy_context()
+            future = asyncio.get_running_loop().run_in_executor(self.executor(), context.run, func, *args)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # A running thread cannot be interrupted; keep its slot until it finishes.
+                await asyncio.wait([future])
+                raise
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "queueLimit": self.queue_limit,
+                "inFlight": self.in_flight,
+                "queued": len(self._waiters),
+                "admittedTotal": self.admitted,
+                "rejectedQueueFullTotal": self.rejected_queue_full,
+                "rejectedTimeoutTotal": self.rejected_timeout,
+                "avgServiceMs": round(self._service_seconds * 1000, 3),
+            }
+
+
+class AdmissionMiddleware:
+    """Rejects requests to admitted routes before their bodies are read or parsed.
+
+    The handler still takes a slot through ``admission``; this only makes the
+    overloaded case cheap, so rejections do not compete with admitted work.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Collection[str]) -> None:
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope.get("path") in self.paths:
+            try:
+                self.controller.check()
+            except Overloaded as exc:
+                body = json.dumps({"detail": str(exc)}).encode()
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 429,
+                        "headers": [
+                            (b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode()),
+                            (b"retry-after", str(exc.retry_after).encode()),
+                        ],
+                    }
+                )
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
+
+
+admission = AdmissionController(
+    limit=_env_int("AI_ENGINE_MAX_CONCURRENCY", 16),
+    queue_limit=_env_int("AI_ENGINE_MAX_QUEUE", 64),
+    queue_timeout=_env_int("AI_ENGINE_QUEUE_TIMEOUT_MS", 2000) / 1000,
+)
@@ -0,0 +1,114 @@
+"""
+Overview: batch.py
+Purpose: Runs many orchestration requests in one call for offline pipelines.
+Notes: Items sharing a sessionId run in submission order; distinct sessions run concurrently on a worker pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .memory import _env_int
+from .models import AIEngineBatchItem, AIEngineRequest, AIEngineResponse
+from .orchestrator import run_orchestration
+from .sharding import OP_RESPOND, ShardError, ShardPool, ShardUnavailable
+from .uploads import UploadTooLarge
+
+logger = logging.getLogger(__name__)
+
+batch_max_size = _env_int("AI_ENGINE_BATCH_MAX_SIZE", 256)
+batch_workers = max(1, _env_int("AI_ENGINE_BATCH_WORKERS", 8))
+
+_executor = ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix="eduvane-batch")
+
+
+def _run_item(index: int, request: AIEngineRequest) -> AIEngineBatchItem:
+    started = time.perf_counter()
+    try:
+        response = run_orchestration(request)
+    except UploadTooLarge as exc:
+        return AIEngineBatchItem(
+            index=index,
+            sessionId=request.sessionId,
+            status=413,
+            latencyMs=(time.perf_counter() - started) * 1000,
+            error=str(exc),
+        )
+    except Exception:
+        logger.exception("batch_item_failed", extra={"index": index})
+        return AIEngineBatchItem(
+            index=index,
+            sessionId=request.sessionId,
+            status=500,
+            latencyMs=(time.perf_counter() - started) * 1000,
+            error="Unable to complete orchestration.",
+        )
+    return AIEngineBatchItem(
+        index=index,
+        sessionId=request.sessionId,
+        status=200,
+        latencyMs=(time.perf_counter() - started) * 1000,
+        response=response,
+    )
+
+
+def _lanes(requests: List[AIEngineRequest]) -> List[List[int]]:
+    lanes: Dict[str, List[int]] = {}
+    for index, request in enumerate(requests):
+        lanes.setdefault(request.sessionId, []).append(index)
+    return list(lanes.values())
+
+
+def run_batch(requests: List[AIEngineRequest]) -> List[AIEngineBatchItem]:
+    """Returns one result per request, in request order."""
+    results: List[Optional[AIEngineBatchItem]] = [None] * len(requests)
+
+    def run_lane(indices: List[int]) -> None:
+        # One lane per session keeps memory updates in submission order.
+        for index in indices:
+            results[index] = _run_item(index, requests[index])
+
+    futures = [_executor.submit(run_lane, indices) for indices in _lanes(requests)]
+    for future in futures:
+        future.result()
+    return [item for item in results if item is not None]
+
+
+async def _run_item_on_shard(pool: ShardPool, index: int, request: AIEngineRequest) -> AIEngineBatchItem:
+    started = time.perf_counter()
+    status, response, error = 200, None, None
+    try:
+        reply = await pool.call(request.sessionId, OP_RESPOND, (request.model_dump_json(), None, "respond:batch", ""))
+        response = AIEngineResponse.model_validate_json(reply)
+    except ShardError as exc:
+        status, error = exc.status, exc.detail
+    except ShardUnavailable as exc:
+        status, error = 503, str(exc)
+    except Exception:
+        # Matches the in-process lane: one bad item must not fail the whole batch.
+        logger.exception("batch_item_failed", extra={"index": index})
+        status, response, error = 500, None, "Unable to complete orchestration."
+    return AIEngineBatchItem(
+        index=index,
+        sessionId=request.sessionId,
+        status=status,
+        latencyMs=(time.perf_counter() - started) * 1000,
+        response=response,
+        error=error,
+    )
+
+
+async def run_batch_on_shards(pool: ShardPool, requests: List[AIEngineRequest]) -> List[AIEngineBatchItem]:
+    """Sharded ``run_batch``: lanes run concurrently, each on the shard that owns its session."""
+    results: List[Optional[AIEngineBatchItem]] = [None] * len(requests)
+
+    async def run_lane(indices: List[int]) -> None:
+        for index in indices:
+            results[index] = await _run_item_on_shard(pool, index, requests[index])
+
+    await asyncio.gather(*(run_lane(indices) for indices in _lanes(requests)))
+    return [item for item in results if item is not None]
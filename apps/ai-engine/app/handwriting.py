@@ -6,7 +6,34 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 
 from __future__ import annotations
 
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence, Tuple
+
+from .handwriting_metrics import HandwritingMetrics, combine_metrics, compute_metrics
+from .memory import _env_int
 from .models import HandwritingFeedback
+from .upload_cache import CachedAnalysis, content_key, upload_cache
+from .uploads import UploadSource
+
+logger = logging.getLogger(__name__)
+
+handwriting_workers = max(1, _env_int("AI_ENGINE_HANDWRITING_WORKERS", os.cpu_count() or 1))
+handwriting_max_pages = max(1, _env_int("AI_ENGINE_HANDWRITING_MAX_PAGES", 4))
+handwriting_timeout_ms = _env_int("AI_ENGINE_HANDWRITING_TIMEOUT_MS", 5_000)
+# Pages allowed in flight across all requests before new work falls back.
+handwriting_queue_limit = max(1, _env_int("AI_ENGINE_HANDWRITING_QUEUE_LIMIT", handwriting_workers * 4))
+
+_IMAGE_MIME_TYPES = {"image/png", "image/jpeg", "image/jpg", "image/webp", "image/gif", "image/bmp", "image/tiff"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_admission = threading.BoundedSemaphore(handwriting_queue_limit)
 
 
 def evaluate_handwriting(has_upload: bool, has_pdf: bool) -> HandwritingFeedback:
@@ -44,3 +71,175 @@ def evaluate_handwriting(has_upload: bool, has_pdf: bool) -> HandwritingFeedback
             "Rewrite final answers on a fresh line to improve readability.",
         ],
     )
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned workers avoid inheriting request threads and locks.
+                _pool = ProcessPoolExecutor(
+                    max_workers=handwriting_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(executor: ProcessPoolExecutor, data: bytes) -> Optional[Future]:
+    if not _admission.acquire(blocking=False):
+        logger.warning("handwriting_pool_saturated")
+        return None
+    try:
+        future = executor.submit(compute_metrics, data)
+    except BrokenProcessPool:
+        _admission.release()
+        logger.warning("handwriting_pool_restarted")
+        _reset_executor(executor)
+        return None
+    future.add_done_callback(lambda _: _admission.release())
+    return future
+
+
+def _analyze_pages(uploads: Sequence[UploadSource]) -> List[CachedAnalysis]:
+    """Returns one analysis per measured image page, reusing cached results by content.
+
+    Pages that cannot be decoded, time out, fail, or cannot be admitted are left
+    out and are not cached, so a later request retries them.
+    """
+    pages = [upload for upload in uploads if upload.mime_type.lower() in _IMAGE_MIME_TYPES]
+    if not pages:
+        return []
+    analyses: List[CachedAnalysis] = []
+    pending: List[Tuple[str, Future]] = []
+    executor: Optional[ProcessPoolExecutor] = None
+    for upload in pages[:handwriting_max_pages]:
+        try:
+            data = upload.read()
+            key = content_key(data)
+        except ValueError as exc:
+            # Malformed base64 (binascii.Error), such as a data: URL prefix left on the payload.
+            logger.warning("handwriting_upload_undecodable", extra={"error": type(exc).__name__})
+            continue
+        cached = upload_cache.get(key)
+        if cached is not None:
+            analyses.append(cached)
+            continue
+        if executor is None:
+            executor = _executor()
+        future = _submit(executor, data)
+        if future is None:
+            break
+        pending.append((key, future))
+
+    timeout = handwriting_timeout_ms / 1000 if handwriting_timeout_ms > 0 else None
+    for key, future in pending:
+        try:
+            metrics = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning("handwriting_analysis_timeout")
+            future.cancel()
+            continue
+        except BrokenProcessPool:
+            logger.warning("handwriting_pool_restarted")
+            _reset_executor(executor)
+            continue
+        except Exception as exc:
+            # Undecodable images are expected input; fall back without a traceback.
+            logger.warning("handwriting_analysis_failed", extra={"error": type(exc).__name__})
+            continue
+        analysis = CachedAnalysis(
+            metrics=metrics,
+            feedback=feedback_from_metrics(metrics) if metrics is not None else None,
+        )
+        upload_cache.put(key, analysis)
+        analyses.append(analysis)
+    return analyses
+
+
+def measure_uploads(uploads: Sequence[UploadSource]) -> Optional[HandwritingMetrics]:
+    """Computes page metrics for image uploads in the process pool.
+
+    Returns None when there are no analyzable images, the pool is saturated, or
+    analysis does not finish within the timeout; callers then fall back to the
+    heuristic feedback.
+    """
+    results = [analysis.metrics for analysis in _analyze_pages(uploads) if analysis.metrics is not None]
+    if not results:
+        return None
+    return combine_metrics(results)
+
+
+def feedback_from_metrics(metrics: HandwritingMetrics) -> HandwritingFeedback:
+    """Maps measured page metrics onto the feedback model."""
+    suggestions: List[str] = []
+
+    if metrics.legibility >= 0.75:
+        legibility = "Clear and readable across the page."
+    elif metrics.legibility >= 0.5:
+        legibility = "Readable in most sections, with a few faint or crowded areas."
+    else:
+        legibility = "Hard to read in several areas; strokes are faint or crowded."
+        suggestions.append("Press slightly firmer and slow down so each character is fully formed.")
+    if metrics.contrast < 0.3:
+        suggestions.append("Use a darker pen or pencil so strokes stand out from the page.")
+
+    if metrics.baseline_drift < 0.06 and metrics.baseline_tilt_degrees < 2.0:
+        line_consistency = "Lines stay level with a steady baseline."
+    elif metrics.baseline_drift < 0.12:
+        line_consistency = "Mostly aligned with occasional baseline shifts."
+    else:
+        line_consistency = "Letters drift above and below the line in several places."
+        suggestions.append("Use ruled paper or a guide sheet to keep letters on the baseline.")
+    if metrics.baseline_tilt_degrees >= 4.0:
+        suggestions.append("Keep the page straight so lines do not slope across the page.")
+
+    if metrics.spacing_variation < 0.45 and metrics.tight_gap_share < 0.25:
+        character_spacing = "Spacing is generally clear between words."
+    elif metrics.tight_gap_share >= 0.25:
+        character_spacing = "Words are crowded together in several areas."
+        suggestions.append("Keep one finger-width between words and between math steps.")
+    else:
+        character_spacing = "Word spacing is inconsistent in several areas."
+        suggestions.append("Aim for even gaps between words so each one stands apart.")
+
+    if metrics.legibility >= 0.65:
+        meaning_impact = "The current handwriting quality should not block meaning."
+    else:
+        meaning_impact = "Some symbols may be interpreted incorrectly due to spacing and alignment."
+        suggestions.append("Rewrite final answers on a fresh line to improve readability.")
+
+    if not suggestions:
+        suggestions.append("Keep this level of care in multi-line answers.")
+
+    return HandwritingFeedback(
+        legibility=legibility,
+        lineConsistency=line_consistency,
+        characterSpacing=character_spacing,
+        meaningImpact=meaning_impact,
+        suggestions=suggestions,
+    )
+
+
+def assess_handwriting(
+    uploads: Sequence[UploadSource],
+) -> Tuple[HandwritingFeedback, Optional[HandwritingMetrics]]:
+    """Returns feedback for the uploads plus the metrics it was derived from, if measured."""
+    analyses = [
+        analysis for analysis in (_analyze_pages(uploads) if uploads else []) if analysis.metrics is not None
+    ]
+    if not analyses:
+        has_pdf = any(upload.is_pdf for upload in uploads)
+        return evaluate_handwriting(bool(uploads), has_pdf), None
+    if len(analyses) == 1 and analyses[0].feedback is not None:
+        return analyses[0].feedback, analyses[0].metrics
+    metrics = combine_metrics([analysis.metrics for analysis in analyses])
+    return feedback_from_metrics(metrics), metrics
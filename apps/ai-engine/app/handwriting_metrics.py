@@ -0,0 +1,197 @@
+"""
+Overview: handwriting_metrics.py
+Purpose: Computes legibility, baseline and spacing metrics from a handwriting page image with NumPy.
+Notes: Functions here run inside worker processes, so keep them pure and importable without app state.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+# Bump whenever the metrics or feedback mapping change so cached results are not reused.
+ANALYZER_VERSION = "hw-metrics-1"
+# Pages are downscaled to this width before analysis; metrics are scale-free.
+ANALYSIS_WIDTH = 1200
+# Baseline drift is estimated from this many horizontal segments per text line.
+_BASELINE_SEGMENTS = 8
+
+
+@dataclass(frozen=True)
+class HandwritingMetrics:
+    """Scale-free page metrics; ratios are relative to the median text-line height."""
+
+    legibility: float
+    contrast: float
+    ink_density: float
+    line_count: int
+    baseline_drift: float
+    baseline_tilt_degrees: float
+    spacing_variation: float
+    word_gap_ratio: float
+    tight_gap_share: float
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    levels = np.arange(256, dtype=np.float64)
+    weight_dark = np.cumsum(histogram)
+    weight_light = total - weight_dark
+    sum_dark = np.cumsum(histogram * levels)
+    mean_dark = sum_dark / np.maximum(weight_dark, 1)
+    mean_light = (sum_dark[-1] - sum_dark) / np.maximum(weight_light, 1)
+    between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between))
+
+
+def _runs(mask: np.ndarray) -> List[tuple[int, int]]:
+    """Returns [start, end) index pairs for each run of True values."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def _text_lines(ink: np.ndarray) -> List[tuple[int, int]]:
+    rows = ink.sum(axis=1)
+    if rows.max(initial=0) == 0:
+        return []
+    active = rows > max(1.0, 0.05 * float(rows.max()))
+    lines = [(start, end) for start, end in _runs(active) if end - start >= 3]
+    return lines
+
+
+def _baseline(band: np.ndarray, line_height: int) -> tuple[float, float]:
+    """Estimates baseline wobble and tilt for one text line band."""
+    height, width = band.shape
+    segment_width = max(1, width // _BASELINE_SEGMENTS)
+    xs: List[float] = []
+    ys: List[float] = []
+    row_index = np.arange(height, dtype=np.float64)
+    for start in range(0, width - segment_width + 1, segment_width):
+        profile = band[:, start:start + segment_width].sum(axis=1).astype(np.float64)
+        mass = profile.sum()
+        if mass < 3:
+            continue
+        # The 85th percentile of ink mass approximates where letters sit.
+        cumulative = np.cumsum(profile) / mass
+        ys.append(float(row_index[np.searchsorted(cumulative, 0.85)]))
+        xs.append(start + segment_width / 2)
+    if len(xs) < 3:
+        return 0.0, 0.0
+    x = np.asarray(xs)
+    y = np.asarray(ys)
+    slope, intercept = np.polyfit(x, y, 1)
+    residual = y - (slope * x + intercept)
+    wobble = float(np.std(residual)) / max(line_height, 1)
+    tilt = float(np.degrees(np.arctan(slope)))
+    return wobble, tilt
+
+
+def _gaps(band: np.ndarray) -> np.ndarray:
+    columns = band.any(axis=0)
+    inked = np.flatnonzero(columns)
+    if inked.size == 0:
+        return np.empty(0)
+    inner = ~columns[inked[0]:inked[-1] + 1]
+    return np.asarray([end - start for start, end in _runs(inner)], dtype=np.float64)
+
+
+def compute_metrics(data: bytes) -> Optional[HandwritingMetrics]:
+    """Analyzes one page image; returns None when no text lines are found."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("L")
+        if image.width > ANALYSIS_WIDTH:
+            height = max(1, round(image.height * ANALYSIS_WIDTH / image.width))
+            image = image.resize((ANALYSIS_WIDTH, height), Image.Resampling.BILINEAR)
+        gray = np.asarray(image, dtype=np.uint8)
+
+    threshold = _otsu_threshold(gray)
+    ink = gray <= threshold
+    ink_ratio = float(ink.mean())
+    # Dark backgrounds (for example inverted scans) flip the ink mask.
+    if ink_ratio > 0.5:
+        ink = ~ink
+        ink_ratio = 1.0 - ink_ratio
+    if ink_ratio == 0.0:
+        return None
+
+    ink_mean = float(gray[ink].mean())
+    paper_mean = float(gray[~ink].mean()) if ink_ratio < 1.0 else ink_mean
+    contrast = abs(paper_mean - ink_mean) / 255.0
+
+    lines = _text_lines(ink)
+    if not lines:
+        return None
+    line_height = int(np.median([end - start for start, end in lines]))
+
+    wobbles: List[float] = []
+    tilts: List[float] = []
+    gap_widths: List[np.ndarray] = []
+    for start, end in lines:
+        band = ink[start:end]
+        wobble, tilt = _baseline(band, line_height)
+        wobbles.append(wobble)
+        tilts.append(tilt)
+        gap_widths.append(_gaps(band))
+
+    gaps = np.concatenate(gap_widths) if gap_widths else np.empty(0)
+    gaps = gaps / max(line_height, 1)
+    # Gaps wider than a quarter line height are treated as word gaps.
+    word_gaps = gaps[gaps >= 0.25]
+    if word_gaps.size >= 2:
+        spacing_variation = float(np.std(word_gaps) / np.mean(word_gaps))
+        word_gap_ratio = float(np.median(word_gaps))
+        tight_gap_share = float(np.mean(word_gaps < 0.4))
+    else:
+        spacing_variation = 0.0
+        word_gap_ratio = float(word_gaps.mean()) if word_gaps.size else 0.0
+        tight_gap_share = 0.0
+
+    baseline_drift = float(np.mean(wobbles))
+    tilt_spread = float(np.std(tilts)) if len(tilts) > 1 else abs(tilts[0])
+    legibility = (
+        0.35 * min(contrast / 0.5, 1.0)
+        + 0.35 * (1.0 - min(baseline_drift / 0.25, 1.0))
+        + 0.30 * (1.0 - min(spacing_variation, 1.0))
+    )
+
+    return HandwritingMetrics(
+        legibility=round(legibility, 4),
+        contrast=round(contrast, 4),
+        ink_density=round(ink_ratio, 4),
+        line_count=len(lines),
+        baseline_drift=round(baseline_drift, 4),
+        baseline_tilt_degrees=round(tilt_spread, 3),
+        spacing_variation=round(spacing_variation, 4),
+        word_gap_ratio=round(word_gap_ratio, 4),
+        tight_gap_share=round(tight_gap_share, 4),
+    )
+
+
+def combine_metrics(pages: Sequence[HandwritingMetrics]) -> HandwritingMetrics:
+    """Averages per-page metrics, weighting each page by its line count."""
+    weights = np.asarray([max(page.line_count, 1) for page in pages], dtype=np.float64)
+
+    def mean(name: str) -> float:
+        values = np.asarray([getattr(page, name) for page in pages], dtype=np.float64)
+        return round(float(np.average(values, weights=weights)), 4)
+
+    return HandwritingMetrics(
+        legibility=mean("legibility"),
+        contrast=mean("contrast"),
+        ink_density=mean("ink_density"),
+        line_count=int(sum(page.line_count for page in pages)),
+        baseline_drift=mean("baseline_drift"),
+        baseline_tilt_degrees=mean("baseline_tilt_degrees"),
+        spacing_variation=mean("spacing_variation"),
+        word_gap_ratio=mean("word_gap_ratio"),
+        tight_gap_share=mean("tight_gap_share"),
+    )
@@ -0,0 +1,249 @@
+"""
+Overview: idempotency.py
+Purpose: Replays completed respond results for a repeated Idempotency-Key and collapses concurrent duplicates.
+Notes: Entries are bounded by count and expire after a TTL; failed runs are replayed too unless nothing ran.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Generic, Optional, Tuple, Type, TypeVar
+
+from .admission import Overloaded
+from .memory import _env_int
+from .models import AIEngineResponse
+from .sharding import ShardUnavailable
+from .sqlite_store import DONE, FAILED, SqliteIdempotencyStore
+from .uploads import UploadTooLarge
+
+T = TypeVar("T")
+
+
+class IdempotencyConflict(ValueError):
+    """Raised when a key is reused with a different request body."""
+
+
+class IdempotencyFailed(Exception):
+    """Replays a run for the same key that failed in another worker."""
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("fingerprint", "future", "created")
+
+    def __init__(self, fingerprint: str, created: float) -> None:
+        self.fingerprint = fingerprint
+        # A thread-safe future, so waiters on any event loop or thread can share one run.
+        self.future: "Future[T]" = Future()
+        self.created = created
+
+
+def fingerprint(body: str) -> str:
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class IdempotencyCache(Generic[T]):
+    """Maps scoped idempotency keys to one shared run of the request.
+
+    The first request for a key runs; duplicates that arrive while it is in
+    flight wait on the same future, and later ones get the stored result until
+    ``ttl`` seconds after the first arrival. ``max_entries <= 0`` disables the cache.
+
+    The run is not cancelled with the request that started it, so a client that
+    disconnects and retries gets the stored result instead of a second run. A
+    failed run is replayed as well, since it may have written session memory,
+    unless it raised one of ``retryable``, which fail before anything runs.
+    With ``shared`` set, results are also recorded there, so a retry that lands
+    on another worker replays them or waits for the run still in flight.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        retryable: Tuple[Type[BaseException], ...] = (),
+        shared: Optional[SqliteIdempotencyStore] = None,
+        encode: Callable[[T], str] = str,
+        decode: Callable[[str], T] = str,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self.retryable = retryable
+        self.shared = shared
+        self.encode = encode
+        self.decode = decode
+        self._entries: "OrderedDict[str, _Entry[T]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks: set = set()
+        self.replayed = 0
+        self.collapsed = 0
+        self.misses = 0
+        self.conflicts = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def run(self, key: str, body_fingerprint: str, compute: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Returns ``(result, replayed)``, running ``compute`` only for the first request per key."""
+        if not self.enabled:
+            return await compute(), False
+        entry, leader = self._claim(key, body_fingerprint)
+        if not leader:
+            # Shielded so a follower that disconnects does not cancel the shared run.
+            return await asyncio.shield(asyncio.wrap_future(entry.future)), True
+        if self.shared is not None:
+            try:
+                result = await self._follow_shared(key, body_fingerprint)
+            except BaseException as exc:
+                self._forget(key, entry)
+                entry.future.set_exception(exc if isinstance(exc, Exception) else asyncio.CancelledError())
+                raise
+            if result is not None:
+                entry.future.set_result(result[0])
+                return result[0], True
+        task = asyncio.ensure_future(self._lead(key, entry, compute))
+        # Holding a reference keeps the run alive after its caller is cancelled.
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return await asyncio.shield(task), False
+
+    def _finished(self, task: "asyncio.Future[T]") -> None:
+        self._tasks.discard(task)
+        if not task.cancelled():
+            # Retrieved here too, so a run whose caller went away does not log an unretrieved error.
+            task.exception()
+
+    async def _lead(self, key: str, entry: _Entry[T], compute: Callable[[], Awaitable[T]]) -> T:
+        try:
+            result = await compute()
+        except BaseException as exc:
+            retry = isinstance(exc, self.retryable) or not isinstance(exc, Exception)
+            if retry:
+                self._forget(key, entry)
+            else:
+                with self._lock:
+                    self.failed += 1
+            # Waiting duplicates fail with the leader; later ones run afresh only if nothing ran.
+            entry.future.set_exception(exc if isinstance(exc, Exception) else asyncio.CancelledError())
+            if self.shared is not None:
+                if retry:
+                    await asyncio.to_thread(self.shared.forget, key)
+                else:
+                    await asyncio.to_thread(self.shared.finish, key, FAILED)
+            raise
+        entry.future.set_result(result)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.finish, key, DONE, self.encode(result))
+        return result
+
+    async def _follow_shared(self, key: str, body_fingerprint: str) -> Optional[Tuple[T]]:
+        """Claims ``key`` in the shared store; returns None to run it here, else ``(result,)`` from another worker."""
+        delay = 0.01
+        record = await asyncio.to_thread(self.shared.claim, key, body_fingerprint)
+        while record is not None:
+            stored_fingerprint, state, stored = record
+            if stored_fingerprint != body_fingerprint:
+                with self._lock:
+                    self.conflicts += 1
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request.")
+            if state == DONE:
+                with self._lock:
+                    self.replayed += 1
+                return (self.decode(stored),)
+            if state == FAILED:
+                with self._lock:
+                    self.replayed += 1
+                raise IdempotencyFailed("An earlier request with this Idempotency-Key failed.")
+            # Another worker is running it; its record expires with the TTL if that worker died.
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            record = await asyncio.to_thread(self.shared.lookup, key)
+            if record is None:
+                # The other run expired or failed before it started; claim the key again.
+                record = await asyncio.to_thread(self.shared.claim, key, body_fingerprint)
+        return None
+
+    def _claim(self, key: str, body_fingerprint: str) -> Tuple[_Entry[T], bool]:
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.fingerprint != body_fingerprint:
+                    self.conflicts += 1
+                    raise IdempotencyConflict("Idempotency-Key was already used with a different request.")
+                if entry.future.done():
+                    self.replayed += 1
+                else:
+                    self.collapsed += 1
+                return entry, False
+            entry = _Entry(body_fingerprint, now)
+            self._entries[key] = entry
+            self.misses += 1
+            while len(self._entries) > self.max_entries:
+                # Dropping an in-flight entry only stops later duplicates from joining it.
+                self._entries.popitem(last=False)
+            return entry, True
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in arrival order and share one TTL, so expired ones sit at the front.
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if now - entry.created < self.ttl:
+                break
+            self._entries.popitem(last=False)
+
+    def _forget(self, key: str, entry: _Entry[T]) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "replayed": self.replayed,
+                "collapsed": self.collapsed,
+                "misses": self.misses,
+                "conflicts": self.conflicts,
+                "failed": self.failed,
+                "shared": self.shared is not None,
+            }
+
+
+def scoped_key(user_id: str, session_id: str, key: str) -> str:
+    # Keys are chosen by callers, so scope them to one user's session.
+    return f"{user_id}\x00{session_id}\x00{key}"
+
+
+def create_idempotency_cache() -> IdempotencyCache[AIEngineResponse]:
+    """Builds the respond cache; with the sqlite session backend, records are shared by all workers."""
+    ttl = float(_env_int("AI_ENGINE_IDEMPOTENCY_TTL_SECONDS", 600))
+    shared = None
+    if os.getenv("AI_ENGINE_SESSION_BACKEND", "memory").strip().lower() == "sqlite":
+        shared = SqliteIdempotencyStore(os.getenv("AI_ENGINE_SESSION_SQLITE_PATH", "eduvane-sessions.sqlite3"), ttl)
+    return IdempotencyCache(
+        max_entries=_env_int("AI_ENGINE_IDEMPOTENCY_MAX_ENTRIES", 10_000),
+        ttl=ttl,
+        retryable=(Overloaded, ShardUnavailable, UploadTooLarge),
+        shared=shared,
+        encode=lambda response: response.model_dump_json(),
+        decode=AIEngineResponse.model_validate_json,
+    )
+
+
+idempotency_cache = create_idempotency_cache()
+
@@ -6,39 +6,147 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 
 from __future__ import annotations
 
-from typing import Literal
+import re
+from typing import Dict, Literal, Mapping, Optional
 
 from .models import AIEngineRequest
 
 Intent = Literal["ANALYSIS", "QUESTION_GENERATION", "CONVERSATIONAL"]
 
 
-ANALYSIS_HINTS = {
-    "analyze",
-    "analysis",
-    "review",
-    "feedback",
-    "check",
-    "evaluate",
-    "marking",
+# Weighted hint vocabulary per intent. Phrases may span several words and are
+# matched case-insensitively on word boundaries; the last word also matches its
+# plural and verb inflections (see ``_inflections``).
+INTENT_HINTS: Dict[Intent, Dict[str, float]] = {
+    "QUESTION_GENERATION": {
+        "question": 1.0,
+        "questions": 1.0,
+        "practice": 1.0,
+        "worksheet": 1.0,
+        "generate": 1.0,
+        "quiz": 1.0,
+    },
+    "ANALYSIS": {
+        "analyze": 1.0,
+        "analysis": 1.0,
+        "review": 1.0,
+        "feedback": 1.0,
+        "check": 1.0,
+        "evaluate": 1.0,
+        "marking": 1.0,
+    },
 }
 
-QUESTION_HINTS = {
-    "question",
-    "questions",
-    "practice",
-    "worksheet",
-    "generate",
-    "quiz",
-}
+# Ties resolve in this order, matching the original question-first precedence.
+_INTENT_PRIORITY: tuple[Intent, ...] = ("QUESTION_GENERATION", "ANALYSIS")
+
+ANALYSIS_HINTS = set(INTENT_HINTS["ANALYSIS"])
+QUESTION_HINTS = set(INTENT_HINTS["QUESTION_GENERATION"])
+
+_WHITESPACE = re.compile(r"\s+")
+_VOWELS = frozenset("aeiou")
+
+
+def _inflections(word: str) -> set[str]:
+    """Returns ``word`` with its plural and verb endings, including stem changes.
+
+    Covers doubled final consonants (quiz → quizzes), dropped silent e
+    (analyze → analyzing), consonant + y (study → studies) and -is plurals
+    (analysis → analyses), which a plain suffix group cannot reach.
+    """
+    forms = {word} | {word + suffix for suffix in ("s", "es", "d", "ed", "ing")}
+    if word.endswith("e"):
+        forms.add(word[:-1] + "ing")
+    if word.endswith("y") and len(word) > 1 and word[-2] not in _VOWELS:
+        forms.update({word[:-1] + "ies", word[:-1] + "ied"})
+    if word.endswith("is"):
+        forms.add(word[:-2] + "es")
+    if (
+        len(word) >= 3
+        and word[-1] not in _VOWELS | {"w", "x", "y"}
+        and word[-2] in _VOWELS
+        and (word[-3] not in _VOWELS or word[-4:-2] == "qu")
+    ):
+        forms.update(word + word[-1] + suffix for suffix in ("es", "ed", "ing"))
+    return forms
+
+
+def _trie_pattern(phrases: list[str]) -> str:
+    """Builds a prefix-factored alternation so shared prefixes are matched once."""
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + render(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+class IntentClassifier:
+    """Scores every intent in one regex pass over the message.
+
+    All hint phrases are compiled once into a single prefix-factored pattern
+    anchored on word boundaries, so matching cost tracks message length rather
+    than vocabulary size.
+    """
+
+    def __init__(self, hints: Mapping[Intent, Mapping[str, float]]) -> None:
+        self._weights: Dict[str, tuple[Intent, float]] = {}
+        for intent in _INTENT_PRIORITY:
+            for phrase, weight in hints.get(intent, {}).items():
+                key = _WHITESPACE.sub(" ", phrase.lower().strip())
+                if not key:
+                    continue
+                head, _, last = key.rpartition(" ")
+                for form in sorted(_inflections(last)):
+                    inflected = f"{head} {form}" if head else form
+                    if inflected not in self._weights:
+                        self._weights[inflected] = (intent, weight)
+
+        alternation = _trie_pattern(list(self._weights))
+        self._pattern = re.compile(rf"\b({alternation})(?!\w)")
+
+    def scores(self, text: str) -> Dict[Intent, float]:
+        totals: Dict[Intent, float] = {}
+        weights = self._weights
+        for match in self._pattern.finditer(text.lower()):
+            phrase = match.group(1)
+            hit = weights.get(phrase) or weights.get(_WHITESPACE.sub(" ", phrase))
+            if hit is None:
+                continue
+            totals[hit[0]] = totals.get(hit[0], 0.0) + hit[1]
+        return totals
+
+    def classify(self, text: str) -> Optional[Intent]:
+        totals = self.scores(text)
+        best: Optional[Intent] = None
+        for intent in _INTENT_PRIORITY:
+            score = totals.get(intent, 0.0)
+            if score > 0 and (best is None or score > totals[best]):
+                best = intent
+        return best
+
+
+_classifier = IntentClassifier(INTENT_HINTS)
 
 
 def detect_intent(request: AIEngineRequest) -> Intent:
-    text = request.message.lower().strip()
-    if request.uploads:
-        return "ANALYSIS"
-    if any(token in text for token in QUESTION_HINTS):
-        return "QUESTION_GENERATION"
-    if any(token in text for token in ANALYSIS_HINTS):
+    return classify_intent(request.message, bool(request.uploads))
+
+
+def classify_intent(message: str, has_upload: bool) -> Intent:
+    if has_upload:
         return "ANALYSIS"
-    return "CONVERSATIONAL"
+    return _classifier.classify(message) or "CONVERSATIONAL"
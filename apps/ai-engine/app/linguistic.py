@@ -6,16 +6,16 @@ Notes: Keeps communicative intent stable while varying surface form with role-sa
 
 from __future__ import annotations
 
-import random
-from typing import Literal, Optional, Sequence, Tuple
+import sys
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
 
-from .memory import memory
+from .memory import SessionState, memory
+from .session_rng import draw_below
 
 Role = Literal["TEACHER", "STUDENT", "UNKNOWN"]
 Intent = Literal["ANALYSIS", "QUESTION_GENERATION", "CONVERSATIONAL"]
 
 Variant = Tuple[str, str]
-_rng = random.SystemRandom()
 
 GREETING_TOKENS = {
     "hi",
@@ -34,277 +34,388 @@ def _is_greeting_message(text: str) -> bool:
     return clean in GREETING_TOKENS or any(clean.startswith(token + " ") for token in GREETING_TOKENS)
 
 
-def _pick_variant(session_id: str, act: str, options: Sequence[Variant]) -> str:
-    state = memory.get(session_id)
-    last_structure = state.last_structure_by_act.get(act)
-
-    # First pass: avoid exact repeats and avoid consecutive structural duplicates.
-    filtered = [
-        (structure, text)
-        for structure, text in options
-        if text not in state.recent_phrases and structure != last_structure
-    ]
-    if not filtered:
-        # Second pass: allow structural reuse but still avoid exact sentence repetition.
-        filtered = [(structure, text) for structure, text in options if text not in state.recent_phrases]
-    if not filtered:
-        # Final fallback: all options available (should be rare with current pool size).
-        filtered = list(options)
-
-    structure, text = _rng.choice(filtered)
-    state.last_structure_by_act[act] = structure
-    return text
+class VariantPool:
+    """One communicative act's options, compiled to parallel tuples.
 
+    Variant ``index`` in the pool has the registry-wide id ``first_id + index``.
+    """
 
-def realize_role_clarification(session_id: str) -> str:
-    text = _pick_variant(
-        session_id,
-        "role_clarification",
-        (
-            ("direct_prompt", "Please confirm your role once: Student or Teacher."),
-            ("choice_prompt", "Before we continue, please confirm your role: Student or Teacher."),
-            ("readiness_prompt", "To tailor responses correctly, please choose your role: Student or Teacher."),
-            ("setup_prompt", "Quick setup: are you working as a Student or a Teacher?"),
-        ),
-    )
-    realized = _ensure_unique(session_id, text)
-    memory.remember_phrase(session_id, realized)
-    return realized
+    __slots__ = ("act", "structures", "texts", "first_id")
 
+    def __init__(self, act: str, structures: Tuple[str, ...], texts: Tuple[str, ...], first_id: int) -> None:
+        self.act = act
+        self.structures = structures
+        self.texts = texts
+        self.first_id = first_id
 
-def realize_role_clarification_follow_up(session_id: str) -> str:
-    text = _pick_variant(
-        session_id,
-        "role_clarification_followup",
-        (
-            ("tailor_tone", "Once your role is set, I will tailor tone and feedback format."),
-            ("tailor_style", "After role confirmation, I will adapt language and response style accordingly."),
-            ("tailor_perspective", "As soon as your role is confirmed, I will adjust perspective and guidance format."),
-            ("tailor_scope", "Confirming role lets me align response framing to your context."),
-        ),
-    )
-    realized = _ensure_unique(session_id, text)
-    memory.remember_phrase(session_id, realized)
-    return realized
 
+# Registry-wide variant id -> text, filled once at import.
+VARIANT_TEXTS: List[str] = []
+VARIANT_POOLS: Dict[str, VariantPool] = {}
 
-def _greeting_prefix(session_id: str, role: Role) -> str:
-    if role == "TEACHER":
-        options: Sequence[Variant] = (
+
+def _compile(act: str, options: Sequence[Variant]) -> VariantPool:
+    pool = VariantPool(
+        act=act,
+        structures=tuple(sys.intern(structure) for structure, _ in options),
+        texts=tuple(text for _, text in options),
+        first_id=len(VARIANT_TEXTS),
+    )
+    VARIANT_TEXTS.extend(pool.texts)
+    VARIANT_POOLS[act] = pool
+    return pool
+
+
+def _compile_by_role(prefix: str, options_by_role: Dict[Role, Sequence[Variant]]) -> Dict[Role, VariantPool]:
+    return {role: _compile(f"{prefix}_{role.lower()}", options) for role, options in options_by_role.items()}
+
+
+def _select_variant(session_id: str, state: SessionState, pool: VariantPool) -> int:
+    """Picks a variant id without building candidate lists.
+
+    Pools are small and fixed, so eligibility is collected into bitmasks in one
+    pass; membership in the session's phrase history is a set lookup.
+    """
+    recent = state.recent_phrases
+    last_structure = state.last_structure_by_act.get(pool.act)
+    structures = pool.structures
+    texts = pool.texts
+    novel_mask = 0
+    novel_count = 0
+    fresh_mask = 0
+    fresh_count = 0
+    for index in range(len(texts)):
+        if texts[index] in recent:
+            continue
+        novel_mask |= 1 << index
+        novel_count += 1
+        if structures[index] != last_structure:
+            fresh_mask |= 1 << index
+            fresh_count += 1
+
+    # First choice avoids exact repeats and consecutive structural duplicates;
+    # then structural reuse is allowed; finally every option is available.
+    if fresh_count:
+        mask, count = fresh_mask, fresh_count
+    elif novel_count:
+        mask, count = novel_mask, novel_count
+    else:
+        count = len(texts)
+        mask = (1 << count) - 1
+
+    pick = draw_below(state, session_id, count)
+    index = 0
+    while True:
+        if mask & (1 << index):
+            if pick == 0:
+                break
+            pick -= 1
+        index += 1
+    state.last_structure_by_act[pool.act] = structures[index]
+    return pool.first_id + index
+
+
+def _pick_variant(session_id: str, pool: VariantPool) -> str:
+    return VARIANT_TEXTS[_select_variant(session_id, memory.get(session_id), pool)]
+
+
+_ROLE_CLARIFICATION = _compile(
+    "role_clarification",
+    (
+        ("direct_prompt", "Please confirm your role once: Student or Teacher."),
+        ("choice_prompt", "Before we continue, please confirm your role: Student or Teacher."),
+        ("readiness_prompt", "To tailor responses correctly, please choose your role: Student or Teacher."),
+        ("setup_prompt", "Quick setup: are you working as a Student or a Teacher?"),
+    ),
+)
+
+_ROLE_CLARIFICATION_FOLLOW_UP = _compile(
+    "role_clarification_followup",
+    (
+        ("tailor_tone", "Once your role is set, I will tailor tone and feedback format."),
+        ("tailor_style", "After role confirmation, I will adapt language and response style accordingly."),
+        ("tailor_perspective", "As soon as your role is confirmed, I will adjust perspective and guidance format."),
+        ("tailor_scope", "Confirming role lets me align response framing to your context."),
+    ),
+)
+
+_GREETINGS = _compile_by_role(
+    "greeting",
+    {
+        "TEACHER": (
             ("welcome_professional", "Welcome."),
             ("steady_intro", "Good to see you."),
             ("supportive_open", "Hello."),
             ("ready_open", "Thanks for joining."),
-        )
-    elif role == "STUDENT":
-        options = (
+        ),
+        "STUDENT": (
             ("warm_open", "Hi there."),
             ("friendly_open", "Hello."),
             ("steady_open", "Good to see you."),
             ("ready_open", "Hi."),
-        )
-    else:
-        options = (
+        ),
+        "UNKNOWN": (
             ("neutral_open", "Hello."),
             ("calm_open", "Welcome."),
             ("supportive_open", "Hi there."),
             ("ready_open", "Good to have you here."),
-        )
-    return _pick_variant(session_id, f"greeting_{role.lower()}", options)
-
+        ),
+    },
+)
 
-def _readiness_line(session_id: str, role: Role) -> str:
-    if role == "TEACHER":
-        options: Sequence[Variant] = (
+_READINESS = _compile_by_role(
+    "readiness",
+    {
+        "TEACHER": (
             ("upload_first", "Share student work or a target skill, and I will return focused feedback."),
             ("analysis_first", "Upload an artifact or describe the objective, and I will provide analysis."),
             ("path_forward", "Provide the task context or upload work, and I will guide the next step."),
             ("direct_support", "Send the work sample when ready, and I will help structure the response plan."),
-        )
-    elif role == "STUDENT":
-        options = (
+        ),
+        "STUDENT": (
             ("upload_first", "Upload your work or ask for practice, and I will help you move forward."),
             ("practice_first", "Share what you are working on, and we can review it together."),
             ("calm_support", "When you are ready, send your work and I will guide the next step."),
             ("direct_support", "Type your question or upload your work, and I will help from there."),
-        )
-    else:
-        options = (
+        ),
+        "UNKNOWN": (
             ("neutral_path", "Share your goal or upload work, and I will suggest the next step."),
             ("exploratory_path", "You can start with a question or send a file for analysis."),
             ("guided_path", "Type what you need help with, or upload work to review."),
             ("ready_path", "Start with a prompt or an upload, and I will take it from there."),
-        )
-    return _pick_variant(session_id, f"readiness_{role.lower()}", options)
-
+        ),
+    },
+)
 
-def _analysis_transition(session_id: str, role: Role, has_upload: bool) -> str:
-    if role == "TEACHER":
-        uploaded_options: Sequence[Variant] = (
+_ANALYSIS_TRANSITIONS_UPLOAD = _compile_by_role(
+    "analysis_transition_upload",
+    {
+        "TEACHER": (
             ("upload_received", "Upload received. Preparing focused diagnostic feedback."),
             ("artifact_received", "Work artifact received. Starting analysis now."),
             ("submission_ack", "Submission received. Reviewing for instructional next steps."),
             ("review_start", "File received. Beginning targeted review."),
-        )
-        text_only_options: Sequence[Variant] = (
-            ("text_review_start", "Understood. Building analysis from the current details."),
-            ("text_ack", "Acknowledged. Preparing a focused review."),
-            ("text_transition", "Noted. Starting diagnostic analysis now."),
-            ("text_support", "Request received. I will return structured feedback."),
-        )
-    elif role == "STUDENT":
-        uploaded_options = (
+        ),
+        "STUDENT": (
             ("upload_received", "Got your upload. I am reviewing it now."),
             ("artifact_received", "File received. Starting your analysis now."),
             ("submission_ack", "Your work is in. I will break down what to improve."),
             ("review_start", "Upload received. Let us review it step by step."),
-        )
-        text_only_options = (
-            ("text_review_start", "Understood. I am building your feedback now."),
-            ("text_ack", "Got it. I will analyze this and guide your next step."),
-            ("text_transition", "Thanks for sharing that. I am preparing your review."),
-            ("text_support", "I hear you. Let us turn this into focused feedback."),
-        )
-    else:
-        uploaded_options = (
+        ),
+        "UNKNOWN": (
             ("upload_received", "Upload received. Running analysis now."),
             ("artifact_received", "File received. Preparing a focused review."),
             ("submission_ack", "Work sample received. Starting evaluation."),
             ("review_start", "Upload is in. Building feedback now."),
-        )
-        text_only_options = (
+        ),
+    },
+)
+
+_ANALYSIS_TRANSITIONS_TEXT = _compile_by_role(
+    "analysis_transition_text",
+    {
+        "TEACHER": (
+            ("text_review_start", "Understood. Building analysis from the current details."),
+            ("text_ack", "Acknowledged. Preparing a focused review."),
+            ("text_transition", "Noted. Starting diagnostic analysis now."),
+            ("text_support", "Request received. I will return structured feedback."),
+        ),
+        "STUDENT": (
+            ("text_review_start", "Understood. I am building your feedback now."),
+            ("text_ack", "Got it. I will analyze this and guide your next step."),
+            ("text_transition", "Thanks for sharing that. I am preparing your review."),
+            ("text_support", "I hear you. Let us turn this into focused feedback."),
+        ),
+        "UNKNOWN": (
             ("text_review_start", "Understood. I am preparing a focused analysis."),
             ("text_ack", "Acknowledged. I will review this now."),
             ("text_transition", "Got it. I am building feedback from your request."),
             ("text_support", "Request received. Starting analysis now."),
-        )
-
-    if has_upload:
-        return _pick_variant(session_id, f"analysis_transition_upload_{role.lower()}", uploaded_options)
-    return _pick_variant(session_id, f"analysis_transition_text_{role.lower()}", text_only_options)
-
+        ),
+    },
+)
 
-def _question_transition(session_id: str, role: Role) -> str:
-    if role == "TEACHER":
-        options: Sequence[Variant] = (
+_QUESTION_TRANSITIONS = _compile_by_role(
+    "question_transition",
+    {
+        "TEACHER": (
             ("set_intro", "Building a focused practice set now."),
             ("set_transition", "Preparing questions aligned to observed gaps."),
             ("set_start", "Question set generation is in progress."),
             ("set_ack", "Understood. Generating targeted prompts for instruction."),
-        )
-    elif role == "STUDENT":
-        options = (
+        ),
+        "STUDENT": (
             ("set_intro", "Great. I am generating focused practice now."),
             ("set_transition", "Let us build questions matched to your current gaps."),
             ("set_start", "Working on a targeted practice set for you now."),
             ("set_ack", "Understood. I will generate questions you can use right away."),
-        )
-    else:
-        options = (
+        ),
+        "UNKNOWN": (
             ("set_intro", "Preparing a focused practice set now."),
             ("set_transition", "Generating questions aligned to this request."),
             ("set_start", "Question generation is underway."),
             ("set_ack", "Understood. Building a targeted question set."),
-        )
-    return _pick_variant(session_id, f"question_transition_{role.lower()}", options)
-
+        ),
+    },
+)
 
-def _conversation_confirmation(session_id: str, role: Role) -> str:
-    if role == "TEACHER":
-        options: Sequence[Variant] = (
+_CONVERSATION_CONFIRMATIONS = _compile_by_role(
+    "conversation_confirm",
+    {
+        "TEACHER": (
             ("confirm_professional", "Understood."),
             ("confirm_calm", "Noted."),
             ("confirm_ready", "Acknowledged."),
             ("confirm_support", "Request received."),
-        )
-    elif role == "STUDENT":
-        options = (
+        ),
+        "STUDENT": (
             ("confirm_warm", "Got it."),
             ("confirm_calm", "Understood."),
             ("confirm_ready", "I hear you."),
             ("confirm_support", "Thanks for sharing that."),
-        )
-    else:
-        options = (
+        ),
+        "UNKNOWN": (
             ("confirm_neutral", "Understood."),
             ("confirm_calm", "Got it."),
             ("confirm_ready", "Acknowledged."),
             ("confirm_support", "Thanks for sharing."),
-        )
-    return _pick_variant(session_id, f"conversation_confirm_{role.lower()}", options)
+        ),
+    },
+)
+
+_ANALYSIS_FOLLOW_UPS = _compile_by_role(
+    "followup_analysis",
+    {
+        "TEACHER": (
+            ("analysis_followup_a", "Upload the next attempt when ready, and I will compare progress."),
+            ("analysis_followup_b", "Share the next draft when available, and I will track change over time."),
+            ("analysis_followup_c", "When the student revises, upload the new attempt and I will compare outcomes."),
+            ("analysis_followup_d", "Please upload the follow-up attempt, and I will provide a progress comparison."),
+        ),
+        "STUDENT": (
+            ("analysis_followup_a", "Upload your next attempt when ready, and I will compare your progress."),
+            ("analysis_followup_b", "Try a revision and upload it, then I will review what improved."),
+            ("analysis_followup_c", "When you are ready, send your next version and I will compare it for you."),
+            ("analysis_followup_d", "Upload your follow-up attempt and I will help you track improvement."),
+        ),
+        "UNKNOWN": (
+            ("analysis_followup_a", "Upload the next attempt when ready, and I will compare progress."),
+            ("analysis_followup_b", "Share a revised version next, and I will provide a comparison."),
+            ("analysis_followup_c", "Send the follow-up attempt when available, and I will track the change."),
+            ("analysis_followup_d", "Upload the next draft and I will compare the results."),
+        ),
+    },
+)
+
+_QUESTION_FOLLOW_UPS = _compile_by_role(
+    "followup_question",
+    {
+        "TEACHER": (
+            ("q_followup_a", "Have the student attempt these, then upload responses for feedback."),
+            ("q_followup_b", "Ask the student to complete these and upload the work for review."),
+            ("q_followup_c", "Once attempted, upload student responses and I will provide targeted feedback."),
+            ("q_followup_d", "Please upload completed responses next, and I will assess the outcomes."),
+        ),
+        "STUDENT": (
+            ("q_followup_a", "Try these questions first, then upload your responses for feedback."),
+            ("q_followup_b", "Complete these and share your work, and I will review it."),
+            ("q_followup_c", "Work through these questions, then upload your answers for analysis."),
+            ("q_followup_d", "When finished, upload your responses and I will guide the next step."),
+        ),
+        "UNKNOWN": (
+            ("q_followup_a", "Attempt these questions first, then upload responses for feedback."),
+            ("q_followup_b", "Complete the set and upload the results for review."),
+            ("q_followup_c", "Try these questions, then share responses for analysis."),
+            ("q_followup_d", "When ready, upload responses and I will provide feedback."),
+        ),
+    },
+)
+
+# Appended in order when a realized sentence was used recently.
+_UNIQUENESS_TAILS = _compile(
+    "uniqueness_tail",
+    (
+        ("continue_a", " I am ready for the next step."),
+        ("continue_b", " Share the next detail when ready."),
+        ("continue_c", " We can continue from here."),
+        ("continue_d", " I can proceed as soon as you are ready."),
+    ),
+)
+
+
+def realize_role_clarification(session_id: str) -> str:
+    text = _pick_variant(session_id, _ROLE_CLARIFICATION)
+    realized = _ensure_unique(session_id, text)
+    memory.remember_phrase(session_id, realized)
+    return realized
+
+
+def realize_role_clarification_follow_up(session_id: str) -> str:
+    text = _pick_variant(session_id, _ROLE_CLARIFICATION_FOLLOW_UP)
+    realized = _ensure_unique(session_id, text)
+    memory.remember_phrase(session_id, realized)
+    return realized
+
+
+def _greeting_prefix(session_id: str, role: Role) -> str:
+    return _pick_variant(session_id, _GREETINGS[role])
+
+
+def _readiness_line(session_id: str, role: Role) -> str:
+    return _pick_variant(session_id, _READINESS[role])
+
+
+def _analysis_transition(session_id: str, role: Role, has_upload: bool) -> str:
+    pools = _ANALYSIS_TRANSITIONS_UPLOAD if has_upload else _ANALYSIS_TRANSITIONS_TEXT
+    return _pick_variant(session_id, pools[role])
+
+
+def _question_transition(session_id: str, role: Role) -> str:
+    return _pick_variant(session_id, _QUESTION_TRANSITIONS[role])
+
+
+def _conversation_confirmation(session_id: str, role: Role) -> str:
+    return _pick_variant(session_id, _CONVERSATION_CONFIRMATIONS[role])
 
 
 def _follow_up_line(session_id: str, role: Role, intent: Intent) -> Optional[str]:
     if intent == "ANALYSIS":
-        if role == "TEACHER":
-            options: Sequence[Variant] = (
-                ("analysis_followup_a", "Upload the next attempt when ready, and I will compare progress."),
-                ("analysis_followup_b", "Share the next draft when available, and I will track change over time."),
-                ("analysis_followup_c", "When the student revises, upload the new attempt and I will compare outcomes."),
-                ("analysis_followup_d", "Please upload the follow-up attempt, and I will provide a progress comparison."),
-            )
-        elif role == "STUDENT":
-            options = (
-                ("analysis_followup_a", "Upload your next attempt when ready, and I will compare your progress."),
-                ("analysis_followup_b", "Try a revision and upload it, then I will review what improved."),
-                ("analysis_followup_c", "When you are ready, send your next version and I will compare it for you."),
-                ("analysis_followup_d", "Upload your follow-up attempt and I will help you track improvement."),
-            )
-        else:
-            options = (
-                ("analysis_followup_a", "Upload the next attempt when ready, and I will compare progress."),
-                ("analysis_followup_b", "Share a revised version next, and I will provide a comparison."),
-                ("analysis_followup_c", "Send the follow-up attempt when available, and I will track the change."),
-                ("analysis_followup_d", "Upload the next draft and I will compare the results."),
-            )
-        return _ensure_unique(session_id, _pick_variant(session_id, f"followup_analysis_{role.lower()}", options))
-
+        return _ensure_unique(session_id, _pick_variant(session_id, _ANALYSIS_FOLLOW_UPS[role]))
     if intent == "QUESTION_GENERATION":
-        if role == "TEACHER":
-            options = (
-                ("q_followup_a", "Have the student attempt these, then upload responses for feedback."),
-                ("q_followup_b", "Ask the student to complete these and upload the work for review."),
-                ("q_followup_c", "Once attempted, upload student responses and I will provide targeted feedback."),
-                ("q_followup_d", "Please upload completed responses next, and I will assess the outcomes."),
-            )
-        elif role == "STUDENT":
-            options = (
-                ("q_followup_a", "Try these questions first, then upload your responses for feedback."),
-                ("q_followup_b", "Complete these and share your work, and I will review it."),
-                ("q_followup_c", "Work through these questions, then upload your answers for analysis."),
-                ("q_followup_d", "When finished, upload your responses and I will guide the next step."),
-            )
-        else:
-            options = (
-                ("q_followup_a", "Attempt these questions first, then upload responses for feedback."),
-                ("q_followup_b", "Complete the set and upload the results for review."),
-                ("q_followup_c", "Try these questions, then share responses for analysis."),
-                ("q_followup_d", "When ready, upload responses and I will provide feedback."),
-            )
-        return _ensure_unique(session_id, _pick_variant(session_id, f"followup_question_{role.lower()}", options))
-
+        return _ensure_unique(session_id, _pick_variant(session_id, _QUESTION_FOLLOW_UPS[role]))
     return None
 
 
 def _ensure_unique(session_id: str, text: str) -> str:
     state = memory.get(session_id)
-    if text not in state.recent_phrases:
+    recent = state.recent_phrases
+    if text not in recent:
         return text
 
-    tails = (
-        ("continue_a", " I am ready for the next step."),
-        ("continue_b", " Share the next detail when ready."),
-        ("continue_c", " We can continue from here."),
-        ("continue_d", " I can proceed as soon as you are ready."),
-    )
-    for structure, tail in tails:
+    pool = _UNIQUENESS_TAILS
+    last_structure = state.last_structure_by_act.get(pool.act)
+    for structure, tail in zip(pool.structures, pool.texts):
         candidate = f"{text}{tail}"
-        if candidate not in state.recent_phrases and state.last_structure_by_act.get("uniqueness_tail") != structure:
-            state.last_structure_by_act["uniqueness_tail"] = structure
+        if candidate not in recent and last_structure != structure:
+            state.last_structure_by_act[pool.act] = structure
             return candidate
     return text
 
 
+def realize_transition(
+    session_id: str,
+    role: Role,
+    intent: Intent,
+    has_upload: bool,
+) -> Optional[str]:
+    """Picks the opening transition for analysis and question responses."""
+    if intent == "ANALYSIS":
+        return _analysis_transition(session_id, role, has_upload)
+    if intent == "QUESTION_GENERATION":
+        return _question_transition(session_id, role)
+    return None
+
+
 def realize_response(
     session_id: str,
     role: Role,
@@ -313,16 +424,14 @@ def realize_response(
     has_upload: bool,
     base_text: str,
     base_follow_up: Optional[str] = None,
+    transition: Optional[str] = None,
 ) -> tuple[str, Optional[str]]:
     response_text = base_text.strip()
     follow_up = base_follow_up
 
-    if intent == "ANALYSIS":
-        transition = _analysis_transition(session_id, role, has_upload)
-        response_text = _ensure_unique(session_id, f"{transition} {response_text}".strip())
-        follow_up = _follow_up_line(session_id, role, intent)
-    elif intent == "QUESTION_GENERATION":
-        transition = _question_transition(session_id, role)
+    if intent in ("ANALYSIS", "QUESTION_GENERATION"):
+        if transition is None:
+            transition = realize_transition(session_id, role, intent, has_upload)
         response_text = _ensure_unique(session_id, f"{transition} {response_text}".strip())
         follow_up = _follow_up_line(session_id, role, intent)
     else:
@@ -7,38 +7,437 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 from __future__ import annotations
 
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
-from .models import AIEngineRequest, AIEngineResponse
-from .orchestrator import run_orchestration
+from . import template_catalog
+from .admission import AdmissionMiddleware, Overloaded, admission
+from .batch import batch_max_size, run_batch, run_batch_on_shards
+from .idempotency import IdempotencyConflict, fingerprint, idempotency_cache, scoped_key
+from .memory import memory
+from .metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, register_gauge, render_metrics
+from .models import (
+    AIEngineBatchRequest,
+    AIEngineBatchResponse,
+    AIEngineRequest,
+    AIEngineResponse,
+    ClassifyRequest,
+    ClassifyResponse,
+)
+from .orchestrator import run_classification, run_orchestration
+from .profiling import profiler
+from .sharding import OP_CLASSIFY, OP_RESPOND, ShardError, ShardUnavailable, shard_pool
+from .streaming import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, stream_events
+from .upload_cache import upload_cache
+from .uploads import (
+    InvalidUpload,
+    UploadSource,
+    UploadTooLarge,
+    close_sources,
+    read_multipart_request,
+    sources_from_request,
+)
 
 # Shared secret protects internal gateway-to-engine traffic.
 shared_secret = os.getenv("AI_ENGINE_SHARED_SECRET", "change-me")
 
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Starts shard workers before serving and stops them on shutdown."""
+    if shard_pool is not None:
+        await shard_pool.ready()
+    yield
+    if shard_pool is not None:
+        shard_pool.close()
+
+
 # FastAPI app exposes health and orchestration endpoints.
-app = FastAPI(title="Eduvane AI Engine", version="0.1.0")
+app = FastAPI(title="Eduvane AI Engine", version="0.1.0", lifespan=_lifespan)
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    paths=(
+        "/v1/intelligence/respond",
+        "/v1/intelligence/respond:raw",
+        "/v1/intelligence/respond:multipart",
+        "/v1/intelligence/respond:stream",
+        "/v1/intelligence/respond:batch",
+    ),
+)
+# Added last so it wraps admission and also times fast 429 rejections.
+app.add_middleware(MetricsMiddleware, routes=lambda: [route.path for route in app.routes])
+
+register_gauge(
+    "eduvane_sessions",
+    "Sessions held in this worker's session store.",
+    lambda: [((), memory.stats()["sessions"])],
+)
+register_gauge(
+    "eduvane_session_memory_bytes",
+    "Approximate resident size of session state in this worker.",
+    lambda: [((), memory.stats()["approxBytes"])],
+)
+register_gauge(
+    "eduvane_sessions_evicted_total",
+    "Sessions evicted from this worker, by reason.",
+    lambda: [
+        (("lru",), memory.stats()["evictedLruTotal"]),
+        (("idle",), memory.stats()["evictedIdleTotal"]),
+    ],
+    label_names=("reason",),
+    kind="counter",
+)
+register_gauge(
+    "eduvane_admission_in_flight",
+    "Orchestration requests admitted and running.",
+    lambda: [((), admission.in_flight)],
+)
+register_gauge(
+    "eduvane_admission_queued",
+    "Requests waiting for an orchestration slot.",
+    lambda: [((), admission.queued)],
+)
+register_gauge(
+    "eduvane_admission_rejected_total",
+    "Requests rejected with 429, by reason.",
+    lambda: [
+        (("queue_full",), admission.rejected_queue_full),
+        (("queue_timeout",), admission.rejected_timeout),
+    ],
+    label_names=("reason",),
+    kind="counter",
+)
+register_gauge(
+    "eduvane_idempotency_lookups_total",
+    "Respond requests carrying an Idempotency-Key, by outcome.",
+    lambda: [
+        (("replayed",), idempotency_cache.replayed),
+        (("collapsed",), idempotency_cache.collapsed),
+        (("miss",), idempotency_cache.misses),
+        (("conflict",), idempotency_cache.conflicts),
+    ],
+    label_names=("result",),
+    kind="counter",
+)
+register_gauge(
+    "eduvane_shard_healthy",
+    "1 when the shard worker answered its last health ping, by shard.",
+    lambda: [((str(entry["shard"]),), int(entry["healthy"])) for entry in shard_pool.health()] if shard_pool else [],
+    label_names=("shard",),
+)
+register_gauge(
+    "eduvane_upload_cache_lookups_total",
+    "Upload analysis cache lookups, by result.",
+    lambda: [
+        (("memory_hit",), upload_cache.hits_memory),
+        (("disk_hit",), upload_cache.hits_disk),
+        (("miss",), upload_cache.misses),
+    ],
+    label_names=("result",),
+    kind="counter",
+)
 
 
 @app.get("/health")
 def health() -> dict:
     """Returns service liveness metadata for monitoring systems."""
-    return {"status": "ok", "service": "eduvane-ai-engine", "version": "0.1.0"}
+    payload = {"status": "ok", "service": "eduvane-ai-engine", "version": "0.1.0"}
+    if shard_pool is not None:
+        shards = shard_pool.health()
+        payload["shards"] = shards
+        if not all(entry["healthy"] for entry in shards):
+            payload["status"] = "degraded"
+    return payload
+
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    """Exposes latency histograms and session gauges in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _authorize(x_eduvane_shared_secret: str) -> None:
+    """Rejects callers that do not present the gateway shared secret."""
+    if shared_secret and x_eduvane_shared_secret != shared_secret:
+        raise HTTPException(status_code=401, detail="Unauthorized engine request.")
+
+
+@app.get("/v1/internal/stats")
+async def internal_stats(x_eduvane_shared_secret: str = Header(default="")) -> dict:
+    """Returns session store, upload cache and template catalog counters for operators.
+
+    In sharded mode sessions live in the workers, so each shard reports its own under ``shards``.
+    """
+    _authorize(x_eduvane_shared_secret)
+    payload = {
+        "sessions": memory.stats(),
+        "uploadCache": upload_cache.stats(),
+        "templates": template_catalog.stats(),
+        "profiling": profiler.stats(),
+        "admission": admission.stats(),
+        "idempotency": idempotency_cache.stats(),
+    }
+    if shard_pool is not None:
+        payload["shards"] = await shard_pool.stats()
+    return payload
+
+
+def _run_orchestration(
+    request: AIEngineRequest,
+    uploads: Optional[list[UploadSource]],
+    route: str,
+    profile: str,
+) -> AIEngineResponse:
+    """Runs orchestration, under a profiling capture when this request is selected."""
+    with profiler.maybe_capture(request.sessionId, route, profile):
+        return run_orchestration(request, uploads)
+
+
+async def _orchestrate(
+    request: AIEngineRequest,
+    uploads: Optional[list[UploadSource]],
+    route: str,
+    profile: str,
+) -> AIEngineResponse:
+    """Admits the request, then runs it on the executor or on the shard that owns its session."""
+    if shard_pool is None:
+        return await admission.run(_run_orchestration, request, uploads, route, profile)
+    forwarded = None
+    if uploads is not None:
+        # Spooled multipart files may be on disk, so they are read off the event loop.
+        forwarded = await run_in_threadpool(lambda: [(item.file_name, item.mime_type, item.read()) for item in uploads])
+    async with admission.slot():
+        reply = await shard_pool.call(request.sessionId, OP_RESPOND, (request.model_dump_json(), forwarded, route, profile))
+    return AIEngineResponse.model_validate_json(reply)
+
+
+def _overloaded(exc: Overloaded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
+
+
+def _shard_failed(exc: Exception) -> HTTPException:
+    if isinstance(exc, ShardError):
+        return HTTPException(status_code=exc.status, detail=exc.detail)
+    # The worker is restarting; its replacement is usually up within a few seconds.
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+def _upload_sources(request: AIEngineRequest) -> list[UploadSource]:
+    try:
+        return sources_from_request(request)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+
+
+@app.post("/v1/intelligence/classify", response_model=ClassifyResponse)
+async def classify(
+    request: ClassifyRequest,
+    x_eduvane_shared_secret: str = Header(default=""),
+) -> ClassifyResponse:
+    """Returns intent and role only; upload bodies are not accepted and memory is not written."""
+    _authorize(x_eduvane_shared_secret)
+    if shard_pool is None:
+        return await run_in_threadpool(run_classification, request)
+    try:
+        reply = await shard_pool.call(request.sessionId, OP_CLASSIFY, request.model_dump_json())
+    except (ShardError, ShardUnavailable) as exc:
+        raise _shard_failed(exc) from exc
+    return ClassifyResponse.model_validate_json(reply)
+
+
+async def _respond(
+    request: AIEngineRequest,
+    profile: str,
+    idempotency_key: str,
+) -> tuple[AIEngineResponse, bool]:
+    """Runs one respond request, replaying a stored result for a repeated ``Idempotency-Key``.
+
+    Returns ``(response, replayed)`` and maps failures to the HTTP errors both respond routes share.
+    """
+
+    async def orchestrate() -> AIEngineResponse:
+        # Inline uploads are decoded on the executor (or shard) along with the rest of the work.
+        return await _orchestrate(request, None, "respond", profile)
+
+    try:
+        if not idempotency_key:
+            return await orchestrate(), False
+        if len(idempotency_key) > 255:
+            raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters.")
+        return await idempotency_cache.run(
+            scoped_key(request.userId, request.sessionId, idempotency_key),
+            fingerprint(request.model_dump_json()),
+            orchestrate,
+        )
+    except HTTPException:
+        raise
+    except IdempotencyConflict as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    except Overloaded as exc:
+        raise _overloaded(exc) from exc
+    except (ShardError, ShardUnavailable) as exc:
+        raise _shard_failed(exc) from exc
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500,
+            detail="Unable to complete orchestration.",
+        ) from exc
 
 
 @app.post("/v1/intelligence/respond", response_model=AIEngineResponse)
-def respond(
+async def respond(
     request: AIEngineRequest,
+    response: Response,
     x_eduvane_shared_secret: str = Header(default=""),
+    x_eduvane_profile: str = Header(default=""),
+    idempotency_key: str = Header(default=""),
 ) -> AIEngineResponse:
-    """Validates caller secret and runs orchestration for the incoming request."""
-    if shared_secret and x_eduvane_shared_secret != shared_secret:
-        raise HTTPException(status_code=401, detail="Unauthorized engine request.")
+    """Validates caller secret, waits for admission and runs orchestration on the executor.
+
+    With an ``Idempotency-Key`` header, a repeated request gets the stored
+    response, and duplicates in flight share one run, so memory is written once.
+    """
+    _authorize(x_eduvane_shared_secret)
+    result, replayed = await _respond(request, x_eduvane_profile, idempotency_key)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+def _body_errors(exc: ValidationError) -> list[dict]:
+    """Shapes errors like FastAPI's body validation; malformed JSON drops the raw bytes it would echo."""
+    errors = []
+    for error in exc.errors(include_url=False):
+        error["loc"] = ("body", *error["loc"])
+        if isinstance(error.get("input"), bytes):
+            del error["input"]
+        errors.append(error)
+    return errors
 
+
+@app.post(
+    "/v1/intelligence/respond:raw",
+    response_model=AIEngineResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/AIEngineRequest"}}},
+        }
+    },
+)
+async def respond_raw(
+    http_request: Request,
+    x_eduvane_shared_secret: str = Header(default=""),
+    x_eduvane_profile: str = Header(default=""),
+    idempotency_key: str = Header(default=""),
+) -> Response:
+    """Same contract as ``respond``, decoded from and encoded to raw JSON bytes.
+
+    The body is validated in one pass with ``model_validate_json`` instead of
+    ``json.loads`` plus model validation, and the response is serialized once
+    with ``model_dump_json``; returning a ``Response`` skips FastAPI's
+    ``response_model`` round trip, which rebuilds the model before encoding it.
+    """
+    _authorize(x_eduvane_shared_secret)
     try:
-        return run_orchestration(request)
+        request = AIEngineRequest.model_validate_json(await http_request.body())
+    except ValidationError as exc:
+        raise RequestValidationError(_body_errors(exc)) from exc
+    result, replayed = await _respond(request, x_eduvane_profile, idempotency_key)
+    return Response(
+        content=result.model_dump_json(),
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"} if replayed else None,
+    )
+
+
+@app.post("/v1/intelligence/respond:multipart", response_model=AIEngineResponse)
+async def respond_multipart(
+    http_request: Request,
+    x_eduvane_shared_secret: str = Header(default=""),
+    x_eduvane_profile: str = Header(default=""),
+) -> AIEngineResponse:
+    """Accepts a JSON `request` part plus raw file parts, streamed to spooled storage."""
+    _authorize(x_eduvane_shared_secret)
+    try:
+        request, uploads = await read_multipart_request(http_request)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except InvalidUpload as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False)) from exc
+
+    try:
+        return await _orchestrate(request, uploads, "respond:multipart", x_eduvane_profile)
+    except Overloaded as exc:
+        raise _overloaded(exc) from exc
+    except (ShardError, ShardUnavailable) as exc:
+        raise _shard_failed(exc) from exc
     except Exception as exc:
         raise HTTPException(
             status_code=500,
             detail="Unable to complete orchestration.",
         ) from exc
+    finally:
+        close_sources(uploads)
+
+
+@app.post("/v1/intelligence/respond:stream")
+async def respond_stream(
+    request: AIEngineRequest,
+    accept: str = Header(default=""),
+    x_eduvane_shared_secret: str = Header(default=""),
+) -> StreamingResponse:
+    """Streams orchestration stages as typed events; SSE when requested, NDJSON otherwise."""
+    _authorize(x_eduvane_shared_secret)
+    # AdmissionMiddleware has already rejected this request if the queue was full;
+    # the stream itself waits for a slot before orchestration starts.
+    uploads = _upload_sources(request)
+    sse = SSE_MEDIA_TYPE in accept
+    return StreamingResponse(
+        stream_events(request, uploads, sse, shard_pool),
+        media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/v1/intelligence/respond:batch", response_model=AIEngineBatchResponse)
+async def respond_batch(
+    request: AIEngineBatchRequest,
+    x_eduvane_shared_secret: str = Header(default=""),
+) -> AIEngineBatchResponse:
+    """Runs a batch of orchestration requests and reports per-item status and latency.
+
+    A batch takes one admission slot; its items fan out on the batch worker pool.
+    """
+    _authorize(x_eduvane_shared_secret)
+    if batch_max_size > 0 and len(request.requests) > batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds the maximum of {batch_max_size} requests.",
+        )
+
+    started = time.perf_counter()
+    try:
+        if shard_pool is None:
+            results = await admission.run(run_batch, request.requests)
+        else:
+            async with admission.slot():
+                results = await run_batch_on_shards(shard_pool, request.requests)
+    except Overloaded as exc:
+        raise _overloaded(exc) from exc
+    return AIEngineBatchResponse(
+        results=results,
+        latencyMs=(time.perf_counter() - started) * 1000,
+    )
@@ -6,30 +6,545 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 
 from __future__ import annotations
 
+import base64
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Dict, List, Literal
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+)
 
 Role = Literal["TEACHER", "STUDENT", "UNKNOWN"]
 
+# Rough CPython object sizes used for session byte accounting.
+_STATE_OVERHEAD_BYTES = 640
+_TURN_OVERHEAD_BYTES = 64
+_STRING_OVERHEAD_BYTES = 56
+_ACT_ENTRY_BYTES = 160
+_ATTEMPT_OVERHEAD_BYTES = 360
+_ATTEMPT_TOPIC_BYTES = 120
 
-@dataclass
+# Recent phrases kept per session for repeat avoidance.
+RECENT_PHRASE_LIMIT = 30
+# Conversation turns kept per session.
+TURN_LIMIT = 40
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+# Analysis attempts kept per session; progress totals also cover evicted attempts.
+ATTEMPT_LIMIT = max(1, _env_int("AI_ENGINE_ATTEMPT_LIMIT", 20))
+
+
+class PhraseHistory:
+    """Fixed-size ring of recent phrases with constant-time membership checks.
+
+    ``counts`` tracks how many slots hold each phrase, so a phrase stays a
+    member until its last copy is overwritten. Slots are allocated as the ring
+    fills, and ``text_bytes`` keeps a running total for byte accounting.
+    """
+
+    __slots__ = ("_slots", "_head", "_capacity", "_counts", "text_bytes")
+
+    def __init__(self, phrases: Iterable[str] = (), capacity: int = RECENT_PHRASE_LIMIT) -> None:
+        self._slots: List[str] = []
+        self._head = 0
+        self._capacity = capacity
+        self._counts: Dict[str, int] = {}
+        self.text_bytes = 0
+        for phrase in phrases:
+            self.append(phrase)
+
+    def append(self, phrase: str) -> None:
+        slots = self._slots
+        if len(slots) < self._capacity:
+            slots.append(phrase)
+        else:
+            evicted = slots[self._head]
+            remaining = self._counts[evicted] - 1
+            if remaining:
+                self._counts[evicted] = remaining
+            else:
+                del self._counts[evicted]
+            self.text_bytes -= len(evicted)
+            slots[self._head] = phrase
+            self._head = (self._head + 1) % self._capacity
+        self._counts[phrase] = self._counts.get(phrase, 0) + 1
+        self.text_bytes += len(phrase)
+
+    def __contains__(self, phrase: object) -> bool:
+        return phrase in self._counts
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __iter__(self) -> Iterator[str]:
+        """Yields phrases oldest first."""
+        slots = self._slots
+        yield from slots[self._head :]
+        yield from slots[: self._head]
+
+    def __repr__(self) -> str:
+        return f"PhraseHistory({list(self)!r})"
+
+
+class TurnHistory:
+    """Fixed-size ring of conversation turns kept as parallel role and content slots.
+
+    Roles are interned, so a turn costs two slot pointers and its content
+    string instead of a dict. Iteration yields ``{"role", "content"}`` dicts
+    for callers and serializers; ``pairs()`` yields tuples without building them.
+    """
+
+    __slots__ = ("_roles", "_contents", "_head", "_capacity", "text_bytes")
+
+    def __init__(self, turns: Iterable[Tuple[str, str]] = (), capacity: int = TURN_LIMIT) -> None:
+        self._roles: List[str] = []
+        self._contents: List[str] = []
+        self._head = 0
+        self._capacity = capacity
+        self.text_bytes = 0
+        for role, content in turns:
+            self.append(role, content)
+
+    def append(self, role: str, content: str) -> None:
+        role = sys.intern(role)
+        if len(self._roles) < self._capacity:
+            self._roles.append(role)
+            self._contents.append(content)
+        else:
+            head = self._head
+            self.text_bytes -= len(self._contents[head])
+            self._roles[head] = role
+            self._contents[head] = content
+            self._head = (head + 1) % self._capacity
+        self.text_bytes += len(content)
+
+    def pairs(self) -> Iterator[Tuple[str, str]]:
+        """Yields ``(role, content)`` oldest first."""
+        head = self._head
+        yield from zip(self._roles[head:], self._contents[head:])
+        yield from zip(self._roles[:head], self._contents[:head])
+
+    def __len__(self) -> int:
+        return len(self._roles)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for role, content in self.pairs():
+            yield {"role": role, "content": content}
+
+    def __repr__(self) -> str:
+        return f"TurnHistory({list(self.pairs())!r})"
+
+
+class Attempt:
+    """One analysis attempt: its gap vector and, when pages were measured, handwriting metrics."""
+
+    __slots__ = ("gap_ids", "gap_scores", "metrics")
+
+    def __init__(self, gap_ids: Tuple[str, ...], gap_scores: array, metrics: Optional[array]) -> None:
+        self.gap_ids = gap_ids
+        self.gap_scores = gap_scores
+        self.metrics = metrics
+
+    def gap_load(self) -> float:
+        return sum(self.gap_scores)
+
+
+class AttemptLog:
+    """Fixed-size ring of analysis attempts plus running totals over every attempt.
+
+    Gap scores and metrics are stored as float32 arrays. ``gap_totals``,
+    ``gap_hits`` and ``metric_totals`` cover evicted attempts too, so an
+    attempt is compared with the previous one and with all earlier ones in
+    time proportional to its own gap vector, however many attempts came before.
+    """
+
+    __slots__ = (
+        "_slots",
+        "_head",
+        "_capacity",
+        "count",
+        "gap_totals",
+        "gap_hits",
+        "gap_mass",
+        "metric_totals",
+        "metric_count",
+    )
+
+    def __init__(self, capacity: int = ATTEMPT_LIMIT) -> None:
+        self._slots: List[Attempt] = []
+        self._head = 0
+        self._capacity = capacity
+        self.count = 0
+        self.gap_totals: Dict[str, float] = {}
+        self.gap_hits: Dict[str, int] = {}
+        self.gap_mass = 0.0
+        self.metric_totals: Optional[List[float]] = None
+        self.metric_count = 0
+
+    def append(self, gaps: Sequence[Tuple[str, float]], metrics: Optional[Sequence[float]]) -> None:
+        attempt = Attempt(
+            tuple(sys.intern(topic_id) for topic_id, _ in gaps),
+            array("f", (score for _, score in gaps)),
+            array("f", metrics) if metrics is not None else None,
+        )
+        self._store(attempt)
+        self.count += 1
+        totals = self.gap_totals
+        hits = self.gap_hits
+        for topic_id, score in zip(attempt.gap_ids, attempt.gap_scores):
+            totals[topic_id] = totals.get(topic_id, 0.0) + score
+            hits[topic_id] = hits.get(topic_id, 0) + 1
+            self.gap_mass += score
+        if attempt.metrics is not None:
+            if self.metric_totals is None or len(self.metric_totals) != len(attempt.metrics):
+                self.metric_totals = [0.0] * len(attempt.metrics)
+                self.metric_count = 0
+            for position, value in enumerate(attempt.metrics):
+                self.metric_totals[position] += value
+            self.metric_count += 1
+
+    def _store(self, attempt: Attempt) -> None:
+        if len(self._slots) < self._capacity:
+            self._slots.append(attempt)
+        else:
+            self._slots[self._head] = attempt
+            self._head = (self._head + 1) % self._capacity
+
+    def last(self) -> Optional[Attempt]:
+        if not self._slots:
+            return None
+        return self._slots[self._head - 1]
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __iter__(self) -> Iterator[Attempt]:
+        """Yields stored attempts oldest first."""
+        slots = self._slots
+        yield from slots[self._head :]
+        yield from slots[: self._head]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "gapTotals": dict(self.gap_totals),
+            "gapHits": dict(self.gap_hits),
+            "metricTotals": self.metric_totals,
+            "metricCount": self.metric_count,
+            "attempts": [
+                {
+                    "gaps": [[topic_id, score] for topic_id, score in zip(attempt.gap_ids, attempt.gap_scores)],
+                    "metrics": attempt.metrics.tolist() if attempt.metrics is not None else None,
+                }
+                for attempt in self
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "AttemptLog":
+        log = cls()
+        for item in payload.get("attempts", []):
+            gaps = item.get("gaps", [])
+            metrics = item.get("metrics")
+            log._store(
+                Attempt(
+                    tuple(sys.intern(topic_id) for topic_id, _ in gaps),
+                    array("f", (score for _, score in gaps)),
+                    array("f", metrics) if metrics is not None else None,
+                )
+            )
+        log.count = int(payload.get("count", len(log)))
+        log.gap_totals = {sys.intern(topic_id): float(total) for topic_id, total in payload.get("gapTotals", {}).items()}
+        log.gap_hits = {sys.intern(topic_id): int(hits) for topic_id, hits in payload.get("gapHits", {}).items()}
+        log.gap_mass = sum(log.gap_totals.values())
+        totals = payload.get("metricTotals")
+        log.metric_totals = [float(value) for value in totals] if totals is not None else None
+        log.metric_count = int(payload.get("metricCount", 0))
+        return log
+
+    def __repr__(self) -> str:
+        return f"AttemptLog(count={self.count}, stored={len(self)})"
+
+
+class SlotBitset:
+    """Mutable bitset over a fixed number of slots with a running member count."""
+
+    __slots__ = ("bits", "count")
+
+    def __init__(self, size: int, bits: Optional[bytearray] = None) -> None:
+        needed = (size + 7) // 8
+        if bits is None:
+            bits = bytearray(needed)
+        elif len(bits) < needed:
+            bits.extend(bytes(needed - len(bits)))
+        self.bits = bits
+        self.count = int.from_bytes(bits, "little").bit_count()
+
+    def __contains__(self, slot: int) -> bool:
+        return bool(self.bits[slot >> 3] & (1 << (slot & 7)))
+
+    def add(self, slot: int) -> None:
+        bit = 1 << (slot & 7)
+        if not self.bits[slot >> 3] & bit:
+            self.bits[slot >> 3] |= bit
+            self.count += 1
+
+    def to_text(self) -> str:
+        return base64.b64encode(self.bits).decode("ascii")
+
+    @classmethod
+    def from_text(cls, text: str) -> "SlotBitset":
+        bits = bytearray(base64.b64decode(text))
+        return cls(len(bits) * 8, bits)
+
+
+@dataclass(slots=True)
 class SessionState:
     role: Role = "UNKNOWN"
     asked_role_clarification: bool = False
-    turns: List[dict] = field(default_factory=list)
+    turns: TurnHistory = field(default_factory=TurnHistory)
     learning_gaps: List[str] = field(default_factory=list)
-    recent_phrases: List[str] = field(default_factory=list)
+    recent_phrases: PhraseHistory = field(default_factory=PhraseHistory)
     last_structure_by_act: Dict[str, str] = field(default_factory=dict)
+    # SplitMix64 position for linguistic variability; seeded on first draw.
+    rng_state: Optional[int] = None
+    # Question-bank slots already served, one bitset per bank bucket.
+    served_questions: Dict[str, SlotBitset] = field(default_factory=dict)
+    # Length of the gateway transcript that ``turns`` accounts for; None until history is synced.
+    history_cursor: Optional[int] = None
+    # Analysis attempts with gap vectors and handwriting metrics, for progress comparison.
+    attempts: AttemptLog = field(default_factory=AttemptLog)
 
 
-class SessionMemory:
+def state_to_dict(state: SessionState) -> Dict[str, Any]:
+    return {
+        "role": state.role,
+        "askedRoleClarification": state.asked_role_clarification,
+        "turns": list(state.turns),
+        "learningGaps": list(state.learning_gaps),
+        "recentPhrases": list(state.recent_phrases),
+        "lastStructureByAct": dict(state.last_structure_by_act),
+        "rngState": state.rng_state,
+        "servedQuestions": {key: bitset.to_text() for key, bitset in state.served_questions.items()},
+        "historyCursor": state.history_cursor,
+        "attempts": state.attempts.to_dict() if state.attempts.count else None,
+    }
+
+
+def state_from_dict(payload: Dict[str, Any]) -> SessionState:
+    return SessionState(
+        role=payload.get("role", "UNKNOWN"),
+        asked_role_clarification=bool(payload.get("askedRoleClarification", False)),
+        turns=TurnHistory((turn.get("role", ""), turn.get("content", "")) for turn in payload.get("turns", [])),
+        learning_gaps=[sys.intern(gap) for gap in payload.get("learningGaps", [])],
+        recent_phrases=PhraseHistory(payload.get("recentPhrases", [])),
+        # Act names, structures and bank keys come from small fixed vocabularies, so decoded copies are shared.
+        last_structure_by_act={
+            sys.intern(act): sys.intern(structure) for act, structure in payload.get("lastStructureByAct", {}).items()
+        },
+        rng_state=payload.get("rngState"),
+        served_questions={
+            sys.intern(key): SlotBitset.from_text(text) for key, text in payload.get("servedQuestions", {}).items()
+        },
+        history_cursor=payload.get("historyCursor"),
+        attempts=AttemptLog.from_dict(payload["attempts"]) if payload.get("attempts") else AttemptLog(),
+    )
+
+
+def estimate_state_bytes(state: SessionState) -> int:
+    """Approximates the resident size of one session without walking the heap."""
+    turns = state.turns
+    phrases = state.recent_phrases
+    total = _STATE_OVERHEAD_BYTES + _TURN_OVERHEAD_BYTES * len(turns) + turns.text_bytes
+    total += _STRING_OVERHEAD_BYTES * len(phrases) + phrases.text_bytes
+    for text in state.learning_gaps:
+        total += _STRING_OVERHEAD_BYTES + len(text)
+    total += _ACT_ENTRY_BYTES * len(state.last_structure_by_act)
+    for key, bitset in state.served_questions.items():
+        total += _ACT_ENTRY_BYTES + len(key) + len(bitset.bits)
+    attempts = state.attempts
+    if attempts.count:
+        total += _ATTEMPT_OVERHEAD_BYTES * len(attempts) + _ATTEMPT_TOPIC_BYTES * len(attempts.gap_totals)
+    return total
+
+
+class _Entry:
+    # ``version`` and ``fingerprint`` are only used by durable backends; the snapshot
+    # store keeps a change counter and its record position in them.
+    __slots__ = ("state", "last_seen", "size", "version", "fingerprint")
+
+    def __init__(self, state: SessionState, last_seen: float, version: int = 0) -> None:
+        self.state = state
+        self.last_seen = last_seen
+        self.size = estimate_state_bytes(state)
+        self.version = version
+        self.fingerprint: Optional[int] = None
+
+
+class _SessionLock:
+    __slots__ = ("lock", "holders")
+
     def __init__(self) -> None:
-        self._sessions: Dict[str, SessionState] = {}
+        self.lock = threading.RLock()
+        self.holders = 0
+
+
+class SessionStore(Protocol):
+    """Interface shared by every session backend used by the orchestrator."""
+
+    def session(self, session_id: str) -> ContextManager[SessionState]: ...
+
+    def get(self, session_id: str) -> SessionState: ...
+
+    def peek(self, session_id: str) -> Optional[SessionState]: ...
+
+    def set_role(self, session_id: str, role: Role) -> None: ...
+
+    def remember_gaps(self, session_id: str, gaps: List[str]) -> None: ...
+
+    def append_turn(self, session_id: str, role: str, content: str) -> None: ...
+
+    def sync_history(self, session_id: str, base: int, turns: Sequence[Tuple[str, str]]) -> Optional[int]: ...
+
+    def record_attempt(
+        self, session_id: str, gaps: Sequence[Tuple[str, float]], metrics: Optional[Sequence[float]]
+    ) -> None: ...
+
+    def remember_phrase(self, session_id: str, phrase: str) -> None: ...
+
+    def stats(self) -> Dict[str, Any]: ...
+
+
+class SessionMemory:
+    """Bounded session store with LRU ordering and idle-TTL expiry.
+
+    A ``max_sessions`` or ``idle_ttl_seconds`` of zero disables that bound.
+    Work on one session is serialized through ``session()``; the shared index
+    is guarded by a short structural lock so distinct sessions run in parallel.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int | None = None,
+        idle_ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_sessions = (
+            max_sessions
+            if max_sessions is not None
+            else _env_int("AI_ENGINE_SESSION_MAX", 50_000)
+        )
+        self.idle_ttl_seconds = (
+            idle_ttl_seconds
+            if idle_ttl_seconds is not None
+            else _env_int("AI_ENGINE_SESSION_IDLE_TTL_SECONDS", 3_600)
+        )
+        self._clock = clock
+        self._sessions: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._index_lock = threading.Lock()
+        self._session_locks: Dict[str, _SessionLock] = {}
+        self._total_bytes = 0
+        self.created_total = 0
+        self.evicted_lru_total = 0
+        self.evicted_idle_total = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[SessionState]:
+        """Holds the per-session lock for a read-modify-write of one session."""
+        with self._hold(session_id):
+            self._refresh(session_id)
+            try:
+                yield self.get(session_id)
+            finally:
+                self._commit(session_id)
+
+    @contextmanager
+    def _hold(self, session_id: str) -> Iterator[None]:
+        """Takes the per-session lock; a held session is never evicted."""
+        with self._index_lock:
+            holder = self._session_locks.get(session_id)
+            if holder is None:
+                holder = _SessionLock()
+                self._session_locks[session_id] = holder
+            holder.holders += 1
+        try:
+            with holder.lock:
+                yield
+        finally:
+            with self._index_lock:
+                holder.holders -= 1
+                if holder.holders == 0:
+                    del self._session_locks[session_id]
 
     def get(self, session_id: str) -> SessionState:
-        if session_id not in self._sessions:
-            self._sessions[session_id] = SessionState()
-        return self._sessions[session_id]
+        with self._index_lock:
+            entry = self._touch(session_id)
+            if entry is not None:
+                return entry.state
+        # Backends may read through to durable storage; keep that outside the index lock.
+        loaded = self._load(session_id)
+        with self._index_lock:
+            entry = self._touch(session_id)
+            if entry is not None:
+                return entry.state
+            if loaded is None:
+                entry = _Entry(SessionState(), self._clock())
+                self.created_total += 1
+            else:
+                entry = _Entry(loaded[0], self._clock(), version=loaded[1])
+                self._loaded(session_id, entry)
+            self._sessions[session_id] = entry
+            self._total_bytes += entry.size
+            self._evict_overflow()
+            return entry.state
+
+    def peek(self, session_id: str) -> Optional[SessionState]:
+        """Returns a session without creating it or refreshing its recency."""
+        with self._index_lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                return entry.state
+        loaded = self._load(session_id)
+        return loaded[0] if loaded is not None else None
+
+    def discard(self, session_id: str) -> None:
+        with self._index_lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry.size
+                self._evicted(session_id, entry)
 
     def set_role(self, session_id: str, role: Role) -> None:
         state = self.get(session_id)
@@ -39,12 +554,49 @@ class SessionMemory:
         state = self.get(session_id)
         unique = [gap for gap in gaps if gap]
         state.learning_gaps = unique[:5]
+        self._account(session_id)
 
     def append_turn(self, session_id: str, role: str, content: str) -> None:
         state = self.get(session_id)
-        state.turns.append({"role": role, "content": content})
-        if len(state.turns) > 40:
-            state.turns = state.turns[-40:]
+        state.turns.append(role, content)
+        if state.history_cursor is not None:
+            # The gateway saves every exchange it receives, so its transcript grows in step.
+            state.history_cursor += 1
+        self._account(session_id)
+
+    def sync_history(self, session_id: str, base: int, turns: Sequence[Tuple[str, str]]) -> Optional[int]:
+        """Reconciles gateway transcript turns starting at index ``base``; returns the new cursor.
+
+        Turns the session already accounts for are skipped. A session that is
+        unsynced, that missed turns before ``base``, or that holds turns past the
+        end of the transcript (an exchange the gateway failed to save), is
+        rebuilt from the delta when it starts the transcript or fills the turn
+        window; otherwise the cursor is cleared so the gateway resends a full
+        window next time.
+        """
+        state = self.get(session_id)
+        cursor = state.history_cursor
+        if cursor is not None and base <= cursor <= base + len(turns):
+            for role, content in turns[cursor - base :]:
+                state.turns.append(role, content)
+            state.history_cursor = max(cursor, base + len(turns))
+        elif base == 0 or len(turns) >= TURN_LIMIT:
+            state.turns = TurnHistory(turns[-TURN_LIMIT:])
+            state.history_cursor = base + len(turns)
+        else:
+            state.history_cursor = None
+        self._account(session_id)
+        return state.history_cursor
+
+    def record_attempt(
+        self, session_id: str, gaps: Sequence[Tuple[str, float]], metrics: Optional[Sequence[float]]
+    ) -> None:
+        """Appends an analysis attempt; attempts with no gaps and no measured pages are not kept."""
+        if not gaps and metrics is None:
+            return
+        state = self.get(session_id)
+        state.attempts.append(gaps, metrics)
+        self._account(session_id)
 
     def remember_phrase(self, session_id: str, phrase: str) -> None:
         state = self.get(session_id)
@@ -52,8 +604,117 @@ class SessionMemory:
         if not clean:
             return
         state.recent_phrases.append(clean)
-        if len(state.recent_phrases) > 30:
-            state.recent_phrases = state.recent_phrases[-30:]
+        self._account(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns occupancy and eviction counters for monitoring."""
+        with self._index_lock:
+            return {
+                "sessions": len(self._sessions),
+                "approxBytes": self._total_bytes,
+                "maxSessions": self.max_sessions,
+                "createdTotal": self.created_total,
+                "evictedLruTotal": self.evicted_lru_total,
+                "evictedIdleTotal": self.evicted_idle_total,
+            }
+
+    def _touch(self, session_id: str) -> Optional[_Entry]:
+        now = self._clock()
+        self._expire_idle(now)
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            entry.last_seen = now
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def _load(self, session_id: str) -> Optional[Tuple[SessionState, int]]:
+        """Returns durable state and its version for a cache miss; none in memory."""
+        return None
+
+    def _refresh(self, session_id: str) -> None:
+        """Reconciles a cached session with durable storage before it is used."""
+
+    def _commit(self, session_id: str) -> None:
+        """Persists a session after a ``session()`` scope ends."""
+
+    def _loaded(self, session_id: str, entry: _Entry) -> None:
+        """Called under the index lock when a ``_load`` result enters the cache."""
+
+    def _evicted(self, session_id: str, entry: _Entry) -> None:
+        """Called under the index lock when a session leaves the cache."""
+
+    def _account(self, session_id: str) -> None:
+        with self._index_lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            size = estimate_state_bytes(entry.state)
+            self._total_bytes += size - entry.size
+            entry.size = size
+
+    def _expire_idle(self, now: float) -> None:
+        if self.idle_ttl_seconds <= 0:
+            return
+        cutoff = now - self.idle_ttl_seconds
+        # Entries are kept in access order, so expired sessions sit at the front.
+        budget = len(self._sessions)
+        while self._sessions and budget > 0:
+            budget -= 1
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry.last_seen > cutoff:
+                break
+            if session_id in self._session_locks:
+                # Never drop state out from under an in-flight request.
+                self._sessions.move_to_end(session_id)
+                continue
+            self._sessions.popitem(last=False)
+            self._total_bytes -= entry.size
+            self.evicted_idle_total += 1
+            self._evicted(session_id, entry)
+
+    def _evict_overflow(self) -> None:
+        if self.max_sessions <= 0:
+            return
+        budget = len(self._sessions)
+        while len(self._sessions) > self.max_sessions and budget > 0:
+            budget -= 1
+            session_id, entry = next(iter(self._sessions.items()))
+            if session_id in self._session_locks:
+                self._sessions.move_to_end(session_id)
+                continue
+            self._sessions.popitem(last=False)
+            self._total_bytes -= entry.size
+            self.evicted_lru_total += 1
+            self._evicted(session_id, entry)
+
+
+def create_session_store() -> SessionStore:
+    """Builds the configured backend; ``AI_ENGINE_SESSION_BACKEND`` is memory or sqlite.
+
+    The memory backend survives restarts when ``AI_ENGINE_SESSION_SNAPSHOT_PATH`` is set.
+    """
+    backend = os.getenv("AI_ENGINE_SESSION_BACKEND", "memory").strip().lower()
+    if backend == "sqlite":
+        from .sqlite_store import SqliteSessionStore
+
+        return SqliteSessionStore(
+            os.getenv("AI_ENGINE_SESSION_SQLITE_PATH", "eduvane-sessions.sqlite3")
+        )
+    if backend not in {"", "memory"}:
+        raise ValueError(f"Unknown session backend: {backend}")
+    snapshot_path = os.getenv("AI_ENGINE_SESSION_SNAPSHOT_PATH", "").strip()
+    if snapshot_path:
+        shard = os.getenv("AI_ENGINE_SHARD_INDEX", "").strip()
+        if shard:
+            # Each shard worker owns a disjoint set of sessions, so each keeps its own file.
+            snapshot_path = f"{snapshot_path}.shard{shard}"
+        from .session_snapshot import SnapshotSessionMemory
+
+        return SnapshotSessionMemory(
+            snapshot_path,
+            interval_seconds=_env_int("AI_ENGINE_SESSION_SNAPSHOT_INTERVAL_SECONDS", 300),
+        )
+    return SessionMemory()
 
 
-memory = SessionMemory()
+memory: SessionStore = create_session_store()
@@ -0,0 +1,262 @@
+"""
+Overview: metrics.py
+Purpose: Records per-stage and per-route latency histograms and renders them with gauges in Prometheus text format.
+Notes: Stage timings are buffered per request and observed once at the end, so the hot path is a clock read per stage.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+metrics_enabled = os.getenv("AI_ENGINE_METRICS_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+# Seconds; spans sub-millisecond stages up to slow handwriting analysis.
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Set by the middleware so orchestration can attribute body decoding and validation.
+request_started: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+# Set when the handler asks for an admission slot, which is where decoding ends.
+admission_requested: ContextVar[Optional[float]] = ContextVar("admission_requested", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Series:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, size: int) -> None:
+        # One count per bucket plus the overflow (+Inf) bucket.
+        self.counts = [0] * size
+        self.total = 0.0
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+        # Series grouped by every label but the first, so a request's stages share one lookup.
+        self._groups: Dict[Tuple[str, ...], Dict[str, _Series]] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self, labels: Tuple[str, ...]) -> _Series:
+        series = self._series[labels] = _Series(len(self.buckets) + 1)
+        self._groups.setdefault(labels[1:], {})[labels[0]] = series
+        return series
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels) or self._new_series(labels)
+            series.counts[bisect_left(self.buckets, value)] += 1
+            series.total += value
+
+    def observe_group(self, rest: Tuple[str, ...], values: Dict[str, float]) -> None:
+        """Records one sample per first-label value, sharing the remaining labels, under one lock."""
+        buckets = self.buckets
+        with self._lock:
+            group = self._groups.get(rest) or {}
+            for first, value in values.items():
+                series = group.get(first) or self._new_series((first, *rest))
+                series.counts[bisect_left(buckets, value)] += 1
+                series.total += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series.counts), series.total) for labels, series in sorted(self._series.items())]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total!r}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+GaugeSample = Tuple[Tuple[str, ...], float]
+
+
+class _Collected:
+    """Gauge or counter whose samples are read from a callback at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        kind: str,
+        label_names: Sequence[str],
+        read: Callable[[], Iterable[GaugeSample]],
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self.read = read
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.read():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "eduvane_stage_duration_seconds",
+    "Time spent in each orchestration stage.",
+    ("stage", "intent", "role"),
+    STAGE_BUCKETS,
+)
+request_seconds = Histogram(
+    "eduvane_http_request_duration_seconds",
+    "End-to-end HTTP request time, including streaming the body.",
+    ("route", "status"),
+    REQUEST_BUCKETS,
+)
+_collected: List[_Collected] = []
+
+
+def register_gauge(
+    name: str,
+    help_text: str,
+    read: Callable[[], Iterable[GaugeSample]],
+    label_names: Sequence[str] = (),
+    kind: str = "gauge",
+) -> None:
+    _collected.append(_Collected(name, help_text, kind, label_names, read))
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for histogram in (stage_seconds, request_seconds):
+        lines.extend(histogram.render())
+    for collected in _collected:
+        try:
+            lines.extend(collected.render())
+        except Exception:
+            # One failing source must not take down the whole scrape.
+            continue
+    return "\n".join(lines) + "\n"
+
+
+class StageClock:
+    """Accumulates per-stage durations for one request.
+
+    ``mark(stage)`` charges the time since the previous mark to ``stage``;
+    ``resume()`` drops time spent outside the engine, such as a suspended
+    streaming generator waiting on its consumer.
+    """
+
+    __slots__ = ("_last", "_stages")
+
+    def __init__(self) -> None:
+        self._last = time.perf_counter()
+        self._stages: Dict[str, float] = {}
+        started = request_started.get()
+        if started is None:
+            return
+        requested = admission_requested.get()
+        if requested is not None and requested >= started:
+            # Body read, JSON decoding and pydantic validation happen before the handler asks
+            # for a slot; queueing and the executor hand-off are charged separately.
+            self._stages["decode"] = requested - started
+            self._stages["admission_wait"] = self._last - requested
+        else:
+            self._stages["decode"] = self._last - started
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self._stages[stage] = self._stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def resume(self) -> None:
+        self._last = time.perf_counter()
+
+    def observe(self, intent: str, role: str) -> None:
+        stage_seconds.observe_group((intent, role), self._stages)
+        self._stages.clear()
+
+
+class _NullClock:
+    __slots__ = ()
+
+    def mark(self, stage: str) -> None:
+        pass
+
+    def resume(self) -> None:
+        pass
+
+    def observe(self, intent: str, role: str) -> None:
+        pass
+
+
+_NULL_CLOCK = _NullClock()
+
+
+def start_clock() -> StageClock:
+    return StageClock() if metrics_enabled else _NULL_CLOCK  # type: ignore[return-value]
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route and status.
+
+    Paths outside ``routes`` share the ``other`` label to bound cardinality.
+    """
+
+    def __init__(self, app, routes: Callable[[], Iterable[str]]) -> None:
+        self.app = app
+        self._routes = routes
+        self._known: Optional[frozenset] = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+        if self._known is None:
+            self._known = frozenset(self._routes())
+        started = time.perf_counter()
+        token = request_started.set(started)
+        status = "500"
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_started.reset(token)
+            path = scope.get("path", "")
+            route = path if path in self._known else "other"
+            request_seconds.observe((route, status), time.perf_counter() - started)
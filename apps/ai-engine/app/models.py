@@ -6,7 +6,7 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 
 from __future__ import annotations
 
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -20,6 +20,11 @@ class UploadArtifact(BaseModel):
     base64Data: str = Field(min_length=1)
 
 
+class UploadDescriptor(BaseModel):
+    fileName: str
+    mimeType: str
+
+
 class ConversationTurn(BaseModel):
     role: Literal["user", "assistant"]
     content: str
@@ -33,6 +38,23 @@ class AIEngineRequest(BaseModel):
     message: str = ""
     uploads: List[UploadArtifact] = Field(default_factory=list)
     history: List[ConversationTurn] = Field(default_factory=list)
+    # History sync: 0 ignores ``history``; 1 reads it as the gateway transcript from index ``historyBase``.
+    historyProtocol: Literal[0, 1] = 0
+    historyBase: int = Field(default=0, ge=0)
+
+
+class ClassifyRequest(BaseModel):
+    userId: str
+    role: Role
+    sessionId: str
+    message: str = ""
+    uploads: List[UploadDescriptor] = Field(default_factory=list)
+
+
+class ClassifyResponse(BaseModel):
+    sessionId: str
+    intent: Intent
+    role: Role
 
 
 class HandwritingFeedback(BaseModel):
@@ -43,6 +65,23 @@ class HandwritingFeedback(BaseModel):
     suggestions: List[str]
 
 
+class ProgressReport(BaseModel):
+    # 1-based number of this attempt in the session.
+    attempt: int
+    resolvedGaps: List[str]
+    newGaps: List[str]
+    persistentGaps: List[str]
+    # Current gaps that also appeared in at least half of the earlier attempts.
+    recurringGaps: List[str]
+    # Summed gap evidence; lower is better.
+    gapLoad: float
+    gapLoadChange: float
+    gapLoadVsAverage: float
+    # Metric differences (current minus previous, or minus the running mean) when pages were measured.
+    handwritingChange: Optional[Dict[str, float]] = None
+    handwritingVsAverage: Optional[Dict[str, float]] = None
+
+
 class AIEngineResponse(BaseModel):
     sessionId: str
     intent: Intent
@@ -51,3 +90,25 @@ class AIEngineResponse(BaseModel):
     followUpSuggestion: Optional[str] = None
     generatedQuestions: Optional[List[str]] = None
     handwritingFeedback: Optional[HandwritingFeedback] = None
+    # Set on analysis responses once the session has an earlier attempt to compare with.
+    progress: Optional[ProgressReport] = None
+    # Transcript length the engine accounts for once this exchange is saved; null asks for a full window.
+    historyCursor: Optional[int] = None
+
+
+class AIEngineBatchRequest(BaseModel):
+    requests: List[AIEngineRequest]
+
+
+class AIEngineBatchItem(BaseModel):
+    index: int
+    sessionId: str
+    status: int
+    latencyMs: float
+    response: Optional[AIEngineResponse] = None
+    error: Optional[str] = None
+
+
+class AIEngineBatchResponse(BaseModel):
+    results: List[AIEngineBatchItem]
+    latencyMs: float
@@ -7,22 +7,34 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 from __future__ import annotations
 
 import os
+from typing import Any, Iterator, Optional, Sequence, Tuple
 
-from .handwriting import evaluate_handwriting
-from .intent import detect_intent
+from .handwriting import assess_handwriting
+from .intent import classify_intent
 from .linguistic import (
     realize_response,
+    realize_transition,
     realize_role_clarification,
     realize_role_clarification_follow_up,
 )
 from .memory import memory
-from .models import AIEngineRequest, AIEngineResponse, Role
-from .question_generation import extract_learning_gaps, generate_questions
+from .metrics import StageClock, start_clock
+from .models import (
+    AIEngineRequest,
+    AIEngineResponse,
+    ClassifyRequest,
+    ClassifyResponse,
+    Role,
+)
+from .progress import compare_attempt, metric_vector
+from .question_generation import extract_learning_gaps, generate_questions, learning_gap_vector
 from .synthesis import (
     build_analysis_response,
     build_conversational_response,
+    build_progress_note,
     build_question_prompt,
 )
+from .uploads import UploadSource, sources_from_request
 
 legacy_linguistic_enabled = (
     os.getenv("AI_ENGINE_LINGUISTIC_LEGACY_ENABLED", "false").strip().lower()
@@ -40,17 +52,78 @@ def resolve_role(request_role: Role, session_id: str) -> Role:
     return "UNKNOWN"
 
 
+def peek_role(request_role: Role, session_id: str) -> Role:
+    """Resolves the effective role without touching session memory."""
+    if request_role != "UNKNOWN":
+        return request_role
+    state = memory.peek(session_id)
+    return state.role if state is not None else "UNKNOWN"
+
+
 def _role_clarification_prompt() -> str:
     return "Please confirm your role once: Student or Teacher."
 
 
-def run_orchestration(request: AIEngineRequest) -> AIEngineResponse:
+OrchestrationEvent = Tuple[str, Any]
+
+
+def run_orchestration(
+    request: AIEngineRequest,
+    uploads: Optional[Sequence[UploadSource]] = None,
+) -> AIEngineResponse:
+    """Runs orchestration; ``uploads`` defaults to the request's inline uploads."""
+    clock = start_clock()
+    if uploads is None:
+        uploads = sources_from_request(request)
+    # Requests for one session run one at a time; other sessions proceed in parallel.
+    with memory.session(request.sessionId):
+        clock.mark("session_lock")
+        response: Optional[AIEngineResponse] = None
+        for event, payload in _orchestrate(request, uploads, clock):
+            if event == "done":
+                response = payload
+        assert response is not None
+        return response
+
+
+def stream_orchestration(
+    request: AIEngineRequest,
+    uploads: Optional[Sequence[UploadSource]] = None,
+) -> Iterator[OrchestrationEvent]:
+    """Yields orchestration stages as they complete, ending with ``("done", response)``.
+
+    The session lock is held until the generator is exhausted or closed, so it
+    must be consumed on a single thread.
+    """
+    clock = start_clock()
+    if uploads is None:
+        uploads = sources_from_request(request)
+    with memory.session(request.sessionId):
+        clock.mark("session_lock")
+        yield from _orchestrate(request, uploads, clock)
+
+
+def _orchestrate(
+    request: AIEngineRequest,
+    uploads: Sequence[UploadSource],
+    clock: StageClock,
+) -> Iterator[OrchestrationEvent]:
+    # Upload bytes are never read here; stages that need them call upload.read().
+    # Each clock.mark() charges the time since the previous mark to that stage.
+    has_upload = bool(uploads)
+    if request.historyProtocol:
+        memory.sync_history(request.sessionId, request.historyBase, [(turn.role, turn.content) for turn in request.history])
+        clock.mark("history")
     role = resolve_role(request.role, request.sessionId)
     state = memory.get(request.sessionId)
-    intent = detect_intent(request)
+    clock.mark("role")
+    intent = classify_intent(request.message, has_upload)
+    clock.mark("intent")
 
     if role == "UNKNOWN" and not state.asked_role_clarification:
         state.asked_role_clarification = True
+        yield "meta", {"sessionId": request.sessionId, "intent": "CONVERSATIONAL", "role": role}
+        clock.resume()
         if legacy_linguistic_enabled:
             clarification_text = realize_role_clarification(request.sessionId)
             clarification_follow_up = realize_role_clarification_follow_up(
@@ -68,26 +141,69 @@ def run_orchestration(request: AIEngineRequest) -> AIEngineResponse:
             responseText=clarification_text,
             followUpSuggestion=clarification_follow_up
         )
+        clock.mark("linguistic")
         memory.append_turn(request.sessionId, "user", request.message)
         memory.append_turn(request.sessionId, "assistant", response.responseText)
-        return response
+        clock.mark("memory")
+        clock.observe("CONVERSATIONAL", role)
+        if request.historyProtocol:
+            response.historyCursor = state.history_cursor
+        yield "response", {"responseText": response.responseText}
+        yield "followUp", {"followUpSuggestion": response.followUpSuggestion}
+        yield "done", response
+        return
+
+    yield "meta", {"sessionId": request.sessionId, "intent": intent, "role": role}
+    clock.resume()
+
+    # The transition line only depends on linguistic state, so it is realized
+    # (and streamed) before the slower analysis stages run.
+    transition: Optional[str] = None
+    if legacy_linguistic_enabled:
+        transition = realize_transition(
+            session_id=request.sessionId,
+            role=role,
+            intent=intent,
+            has_upload=has_upload,
+        )
+        clock.mark("linguistic")
+        if transition:
+            yield "transition", {"text": transition}
+            clock.resume()
 
     if intent == "ANALYSIS":
-        gaps = extract_learning_gaps(request.message)
+        vector = learning_gap_vector(request.message)
+        gaps = extract_learning_gaps(request.message, vector)
         memory.remember_gaps(request.sessionId, gaps)
-        has_pdf = any(upload.mimeType.lower() == "application/pdf" for upload in request.uploads)
-        handwriting_feedback = evaluate_handwriting(bool(request.uploads), has_pdf)
+        clock.mark("gaps")
+        handwriting_feedback, handwriting_metrics = assess_handwriting(uploads)
+        clock.mark("handwriting")
+        # Structured results are streamed as each stage finishes, ahead of the response text.
+        if handwriting_feedback is not None:
+            yield "handwriting", {"handwritingFeedback": handwriting_feedback.model_dump()}
+            clock.resume()
+        metrics = metric_vector(handwriting_metrics)
+        progress = compare_attempt(state.attempts, vector, metrics)
+        memory.record_attempt(request.sessionId, vector, metrics)
+        clock.mark("progress")
+        if progress is not None:
+            yield "progress", {"progress": progress.model_dump()}
+            clock.resume()
         response_text = build_analysis_response(role, gaps)
+        if progress is not None:
+            response_text = f"{response_text} {build_progress_note(progress)}".strip()
         follow_up = "Upload the next attempt when ready, and I will compare progress."
+        clock.mark("synthesis")
         if legacy_linguistic_enabled:
             response_text, follow_up = realize_response(
                 session_id=request.sessionId,
                 role=role,
                 intent="ANALYSIS",
                 user_text=request.message,
-                has_upload=bool(request.uploads),
+                has_upload=has_upload,
                 base_text=response_text,
                 base_follow_up=follow_up,
+                transition=transition,
             )
         response = AIEngineResponse(
             sessionId=request.sessionId,
@@ -95,24 +211,31 @@ def run_orchestration(request: AIEngineRequest) -> AIEngineResponse:
             intent="ANALYSIS",
             responseText=response_text,
             handwritingFeedback=handwriting_feedback,
+            progress=progress,
             followUpSuggestion=follow_up
         )
     elif intent == "QUESTION_GENERATION":
         gaps = state.learning_gaps or extract_learning_gaps(request.message)
-        questions = generate_questions(gaps)
+        clock.mark("gaps")
+        questions = generate_questions(gaps, session_id=request.sessionId, role=role)
+        clock.mark("questions")
+        yield "questions", {"generatedQuestions": questions}
+        clock.resume()
         response_text = build_question_prompt(role, questions)
         follow_up = (
             "Attempt these questions first, then upload your responses for feedback."
         )
+        clock.mark("synthesis")
         if legacy_linguistic_enabled:
             response_text, follow_up = realize_response(
                 session_id=request.sessionId,
                 role=role,
                 intent="QUESTION_GENERATION",
                 user_text=request.message,
-                has_upload=bool(request.uploads),
+                has_upload=has_upload,
                 base_text=response_text,
                 base_follow_up=follow_up,
+                transition=transition,
             )
         response = AIEngineResponse(
             sessionId=request.sessionId,
@@ -125,13 +248,14 @@ def run_orchestration(request: AIEngineRequest) -> AIEngineResponse:
     else:
         response_text = build_conversational_response(role, request.message)
         follow_up = None
+        clock.mark("synthesis")
         if legacy_linguistic_enabled:
             response_text, follow_up = realize_response(
                 session_id=request.sessionId,
                 role=role,
                 intent="CONVERSATIONAL",
                 user_text=request.message,
-                has_upload=bool(request.uploads),
+                has_upload=has_upload,
                 base_text=response_text,
                 base_follow_up=None,
             )
@@ -143,6 +267,23 @@ def run_orchestration(request: AIEngineRequest) -> AIEngineResponse:
             followUpSuggestion=follow_up,
         )
 
+    clock.mark("linguistic")
     memory.append_turn(request.sessionId, "user", request.message)
     memory.append_turn(request.sessionId, "assistant", response.responseText)
-    return response
+    clock.mark("memory")
+    clock.observe(intent, role)
+    if request.historyProtocol:
+        response.historyCursor = state.history_cursor
+
+    yield "response", {"responseText": response.responseText}
+    yield "followUp", {"followUpSuggestion": response.followUpSuggestion}
+    yield "done", response
+
+
+def run_classification(request: ClassifyRequest) -> ClassifyResponse:
+    """Classifies intent and role with no session side effects."""
+    return ClassifyResponse(
+        sessionId=request.sessionId,
+        intent=classify_intent(request.message, bool(request.uploads)),
+        role=peek_role(request.role, request.sessionId),
+    )
@@ -0,0 +1,242 @@
+"""
+Overview: profiling.py
+Purpose: Captures opt-in cProfile and tracemalloc snapshots for selected respond requests.
+Notes: Requests are chosen by a privileged header or a sampling rate; session ids only appear hashed in file names.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import ContextManager, Dict, Iterator, Optional
+
+from .memory import _env_int, estimate_state_bytes, memory
+
+_MODES = {"cpu", "alloc"}
+# Allocation differences written per capture.
+_ALLOC_TOP = 50
+
+
+def _env_rate(name: str) -> float:
+    raw = os.getenv(name, "").strip()
+    try:
+        return min(max(float(raw), 0.0), 1.0) if raw else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _parse_modes(raw: str) -> frozenset:
+    modes = frozenset(part.strip().lower() for part in raw.split(",") if part.strip())
+    return (modes & _MODES) or frozenset({"cpu"})
+
+
+class Profiler:
+    """Decides which requests to profile and writes their captures.
+
+    Captures never block a request: when ``max_concurrent`` are already
+    running, the request runs unprofiled and is counted as skipped.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        token: str = "",
+        sample_rate: float = 0.0,
+        modes: frozenset = frozenset({"cpu"}),
+        max_concurrent: int = 1,
+        max_captures: int = 200,
+        alloc_frames: int = 1,
+        salt: bytes = b"",
+    ) -> None:
+        self.directory = Path(directory) if directory else None
+        self.token = token
+        self.sample_rate = sample_rate
+        self.modes = modes
+        self.max_captures = max_captures
+        self.alloc_frames = max(alloc_frames, 1)
+        self._salt = salt[:64]
+        self._slots = threading.BoundedSemaphore(max(max_concurrent, 1))
+        self._lock = threading.Lock()
+        self._sequence = 0
+        # tracemalloc is process-wide, so concurrent captures share one tracing session.
+        self._tracing_users = 0
+        self._started_tracing = False
+        self.captured = 0
+        self.skipped_busy = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None and (bool(self.token) or self.sample_rate > 0)
+
+    def wanted(self, header_value: str = "") -> bool:
+        if self.directory is None:
+            return False
+        if header_value and self.token and hmac.compare_digest(header_value, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def maybe_capture(self, session_id: str, route: str, header_value: str = "") -> ContextManager[None]:
+        """Returns a capture context for selected requests and a no-op context otherwise."""
+        if not self.wanted(header_value):
+            return nullcontext()
+        return self.capture(session_id, route)
+
+    def session_tag(self, session_id: str) -> str:
+        return hashlib.blake2b(session_id.encode("utf-8"), key=self._salt, digest_size=8).hexdigest()
+
+    @contextmanager
+    def capture(self, session_id: str, route: str) -> Iterator[None]:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.skipped_busy += 1
+            yield
+            return
+        try:
+            meta = self._session_shape(session_id)
+            profile = self._start_cpu() if "cpu" in self.modes else None
+            before = self._start_alloc() if "alloc" in self.modes else None
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - started
+                if profile is not None:
+                    profile.disable()
+                after = self._stop_alloc() if before is not None else None
+                meta.update(route=route, elapsedMs=round(elapsed * 1000, 3), modes=sorted(self.modes))
+                try:
+                    self._write(session_id, meta, profile, before, after)
+                except OSError:
+                    with self._lock:
+                        self.failed += 1
+        finally:
+            self._slots.release()
+
+    def _session_shape(self, session_id: str) -> Dict[str, object]:
+        """Records the history sizes the request starts with, which drive most slow paths."""
+        state = memory.peek(session_id)
+        if state is None:
+            return {"turns": 0, "recentPhrases": 0, "learningGaps": 0, "approxStateBytes": 0}
+        return {
+            "turns": len(state.turns),
+            "recentPhrases": len(state.recent_phrases),
+            "learningGaps": len(state.learning_gaps),
+            "approxStateBytes": estimate_state_bytes(state),
+        }
+
+    def _start_cpu(self) -> Optional[cProfile.Profile]:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler already owns this interpreter (Python 3.12+ allows one at a time).
+            return None
+        return profile
+
+    def _start_alloc(self) -> tracemalloc.Snapshot:
+        with self._lock:
+            if self._tracing_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(self.alloc_frames)
+                self._started_tracing = True
+            self._tracing_users += 1
+        return tracemalloc.take_snapshot()
+
+    def _stop_alloc(self) -> tracemalloc.Snapshot:
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            self._tracing_users -= 1
+            if self._tracing_users == 0 and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        return snapshot
+
+    def _write(
+        self,
+        session_id: str,
+        meta: Dict[str, object],
+        profile: Optional[cProfile.Profile],
+        before: Optional[tracemalloc.Snapshot],
+        after: Optional[tracemalloc.Snapshot],
+    ) -> None:
+        assert self.directory is not None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        base = self.directory / f"{stamp}-{os.getpid()}-{sequence:06d}-{self.session_tag(session_id)}"
+        if profile is not None:
+            profile.dump_stats(f"{base}.prof")
+        if before is not None and after is not None:
+            meta["allocations"] = self._write_alloc(Path(f"{base}.alloc.txt"), before, after)
+        with open(f"{base}.json", "w", encoding="utf-8") as handle:
+            json.dump(meta, handle, indent=2, sort_keys=True)
+        with self._lock:
+            self.captured += 1
+        self._prune()
+
+    def _write_alloc(self, path: Path, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> Dict[str, int]:
+        # Drop tracemalloc's own bookkeeping and this module's snapshot handling.
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        differences = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        grown = sum(stat.size_diff for stat in differences if stat.size_diff > 0)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(f"# net bytes allocated and still live at request end: {grown}\n")
+            for stat in differences[:_ALLOC_TOP]:
+                handle.write(f"{stat}\n")
+        return {"grownBytes": grown, "sites": len(differences)}
+
+    def _prune(self) -> None:
+        """Keeps the newest ``max_captures`` captures; file names sort by time."""
+        if self.max_captures <= 0 or self.directory is None:
+            return
+        metas = sorted(self.directory.glob("*.json"))
+        for stale in metas[: max(len(metas) - self.max_captures, 0)]:
+            stem = stale.name[: -len(".json")]
+            for suffix in (".json", ".prof", ".alloc.txt"):
+                try:
+                    (self.directory / f"{stem}{suffix}").unlink()
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sampleRate": self.sample_rate,
+                "modes": sorted(self.modes),
+                "captured": self.captured,
+                "skippedBusy": self.skipped_busy,
+                "failed": self.failed,
+            }
+
+
+def create_profiler() -> Profiler:
+    return Profiler(
+        directory=os.getenv("AI_ENGINE_PROFILE_DIR", "").strip(),
+        token=os.getenv("AI_ENGINE_PROFILE_TOKEN", "").strip(),
+        sample_rate=_env_rate("AI_ENGINE_PROFILE_SAMPLE_RATE"),
+        modes=_parse_modes(os.getenv("AI_ENGINE_PROFILE_MODE", "cpu")),
+        max_concurrent=_env_int("AI_ENGINE_PROFILE_MAX_CONCURRENT", 1),
+        max_captures=_env_int("AI_ENGINE_PROFILE_MAX_CAPTURES", 200),
+        alloc_frames=_env_int("AI_ENGINE_PROFILE_ALLOC_FRAMES", 1),
+        # Keyed with the engine secret so tags match across workers but cannot be reversed by guessing ids.
+        salt=os.getenv("AI_ENGINE_SHARED_SECRET", "").encode("utf-8"),
+    )
+
+
+profiler = create_profiler()
+
@@ -0,0 +1,80 @@
+"""
+Overview: progress.py
+Purpose: Compares an analysis attempt with the session's previous attempt and running totals.
+Notes: Work is proportional to the gap vector and metric count; earlier attempts and uploads are never re-read.
+"""
+
+from __future__ import annotations
+
+from dataclasses import fields
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .handwriting_metrics import HandwritingMetrics
+from .memory import AttemptLog
+from .models import ProgressReport
+from .taxonomy import get_taxonomy_index
+
+# Metric field order stored in attempt logs, and the camelCase names used in reports.
+METRIC_FIELDS = tuple(item.name for item in fields(HandwritingMetrics))
+METRIC_NAMES = tuple(
+    head + "".join(part.title() for part in rest) for head, *rest in (name.split("_") for name in METRIC_FIELDS)
+)
+
+
+def metric_vector(metrics: Optional[HandwritingMetrics]) -> Optional[List[float]]:
+    if metrics is None:
+        return None
+    return [float(getattr(metrics, name)) for name in METRIC_FIELDS]
+
+
+def _labels(topic_ids: Sequence[str]) -> List[str]:
+    index = get_taxonomy_index()
+    return [index.label(topic_id) for topic_id in topic_ids]
+
+
+def _rounded(value: float) -> float:
+    # Adding 0.0 turns a rounded -0.0 into 0.0.
+    return round(value, 4) + 0.0
+
+
+def _differences(current: Sequence[float], baseline: Sequence[float], scale: float = 1.0) -> Dict[str, float]:
+    return {name: _rounded(value - reference * scale) for name, value, reference in zip(METRIC_NAMES, current, baseline)}
+
+
+def compare_attempt(
+    log: AttemptLog,
+    gaps: Sequence[Tuple[str, float]],
+    metrics: Optional[Sequence[float]],
+) -> Optional[ProgressReport]:
+    """Compares a new attempt with the log before it is appended; None for a first attempt."""
+    previous = log.last()
+    if previous is None:
+        return None
+    current = dict(gaps)
+    earlier = dict(zip(previous.gap_ids, previous.gap_scores))
+    hits = log.gap_hits
+    # Seen in at least half of the earlier attempts, and more than once.
+    threshold = max(2, (log.count + 1) // 2)
+    load = sum(current.values())
+
+    handwriting_change = None
+    handwriting_vs_average = None
+    if metrics is not None:
+        if previous.metrics is not None and len(previous.metrics) == len(metrics):
+            handwriting_change = _differences(metrics, previous.metrics)
+        totals = log.metric_totals
+        if log.metric_count and totals is not None and len(totals) == len(metrics):
+            handwriting_vs_average = _differences(metrics, totals, 1.0 / log.metric_count)
+
+    return ProgressReport(
+        attempt=log.count + 1,
+        resolvedGaps=_labels([topic_id for topic_id in previous.gap_ids if topic_id not in current]),
+        newGaps=_labels([topic_id for topic_id in current if topic_id not in earlier]),
+        persistentGaps=_labels([topic_id for topic_id in current if topic_id in earlier]),
+        recurringGaps=_labels([topic_id for topic_id in current if hits.get(topic_id, 0) >= threshold]),
+        gapLoad=_rounded(load),
+        gapLoadChange=_rounded(load - previous.gap_load()),
+        gapLoadVsAverage=_rounded(load - log.gap_mass / log.count),
+        handwritingChange=handwriting_change,
+        handwritingVsAverage=handwriting_vs_average,
+    )
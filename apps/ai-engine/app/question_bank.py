@@ -0,0 +1,277 @@
+"""
+Overview: question_bank.py
+Purpose: Serves practice questions from an indexed SQLite bank without repeating items within a session.
+Notes: Items are grouped into (topic, difficulty, audience) buckets with dense slots, so a draw is one indexed lookup.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .memory import SessionState, SlotBitset
+from .session_rng import draw_below
+
+DEFAULT_SEED_PATH = Path(__file__).with_name("data") / "question_bank_seed.jsonl"
+
+AUDIENCES = ("ANY", "STUDENT", "TEACHER")
+# Random probes into a bucket before switching to a scan of its free slots.
+_PROBES = 8
+_NOT_FULL_BYTE = re.compile(rb"[^\xff]")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    topic TEXT NOT NULL,
+    difficulty INTEGER NOT NULL,
+    audience TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (topic, difficulty, audience, slot)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS buckets (
+    topic TEXT NOT NULL,
+    difficulty INTEGER NOT NULL,
+    audience TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (topic, difficulty, audience)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+Bucket = Tuple[str, int, str]
+
+
+def build_bank(connection: sqlite3.Connection, items: Iterable[dict], batch_size: int = 10_000) -> int:
+    """Writes items into an empty bank, assigning each a dense slot within its bucket.
+
+    Each item needs ``topic``, ``difficulty`` (int), ``text`` and optionally
+    ``audience`` (ANY, STUDENT or TEACHER). Returns the number of items written.
+    """
+    connection.executescript(_SCHEMA)
+    sizes: Dict[Bucket, int] = {}
+    content = hashlib.blake2b(digest_size=6)
+    batch: List[tuple] = []
+    total = 0
+    connection.execute("BEGIN")
+    try:
+        for item in items:
+            audience = str(item.get("audience", "ANY")).upper()
+            if audience not in AUDIENCES:
+                raise ValueError(f"Unknown audience {audience!r}.")
+            bucket = (item["topic"], int(item["difficulty"]), audience)
+            slot = sizes.get(bucket, 0)
+            sizes[bucket] = slot + 1
+            batch.append((*bucket, slot, item["text"]))
+            content.update(json.dumps([*bucket, slot, item["text"]]).encode("utf-8"))
+            if len(batch) >= batch_size:
+                connection.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?)", batch)
+                total += len(batch)
+                batch.clear()
+        if batch:
+            connection.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?)", batch)
+            total += len(batch)
+        connection.executemany(
+            "INSERT INTO buckets VALUES (?, ?, ?, ?)",
+            [(*bucket, size) for bucket, size in sizes.items()],
+        )
+        # The id hashes every slot assignment, so rebuilding the same items (as every process does
+        # with the seed bank) keeps served-item bitsets valid, while any change to the slots invalidates them.
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('bank_id', ?)", (content.hexdigest(),))
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return total
+
+
+def read_jsonl(path: Path) -> Iterable[dict]:
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+class QuestionBank:
+    """Read-only view over a built bank.
+
+    Bucket sizes are loaded once, so choosing a slot needs no query; fetching
+    the item is a primary-key lookup. A session's served items are one bitset
+    per touched bucket, stored on its ``SessionState``.
+    """
+
+    def __init__(self, path: str, uri: bool = False, keepalive: Optional[sqlite3.Connection] = None) -> None:
+        self.path = path
+        self._uri = uri
+        # Holds a shared in-memory database open for the life of the bank.
+        self._keepalive = keepalive
+        self._local = threading.local()
+        connection = self._connection()
+        self.bank_id = connection.execute("SELECT value FROM meta WHERE key = 'bank_id'").fetchone()[0]
+        self._prefix = f"{self.bank_id}/"
+        self.sizes: Dict[Bucket, int] = {}
+        self._by_topic: Dict[str, List[Bucket]] = {}
+        for topic, difficulty, audience, size in connection.execute(
+            "SELECT topic, difficulty, audience, size FROM buckets ORDER BY topic, difficulty, audience"
+        ):
+            bucket = (topic, difficulty, audience)
+            self.sizes[bucket] = size
+            self._by_topic.setdefault(topic, []).append(bucket)
+        self.item_count = sum(self.sizes.values())
+
+    @classmethod
+    def open(cls, path: str) -> "QuestionBank":
+        return cls(f"file:{path}?mode=ro", uri=True)
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict]) -> "QuestionBank":
+        """Builds a bank in a process-local shared in-memory database."""
+        uri = f"file:question-bank-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        keepalive = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+        build_bank(keepalive, items)
+        return cls(uri, uri=True, keepalive=keepalive)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, uri=self._uri, isolation_level=None, check_same_thread=False)
+            self._local.connection = connection
+        return connection
+
+    def has_topic(self, topic: str) -> bool:
+        return topic in self._by_topic
+
+    def sample(
+        self,
+        state: SessionState,
+        session_id: str,
+        topics: Sequence[str],
+        role: str,
+        count: int,
+        difficulty: Optional[int] = None,
+    ) -> List[str]:
+        """Draws up to ``count`` unseen items, filling from ``topics`` in order."""
+        served = self._served(state)
+        results: List[str] = []
+        for topic in topics:
+            buckets = [
+                bucket
+                for bucket in self._by_topic.get(topic, ())
+                if bucket[2] in ("ANY", role) and (difficulty is None or bucket[1] == difficulty)
+            ]
+            keys = [self._key(bucket) for bucket in buckets]
+            while buckets and len(results) < count:
+                remaining = [
+                    self.sizes[bucket] - (served[key].count if key in served else 0)
+                    for bucket, key in zip(buckets, keys)
+                ]
+                total = sum(remaining)
+                if total <= 0:
+                    break
+                # Buckets are weighted by unseen items so every unseen item is equally likely.
+                pick = draw_below(state, session_id, total)
+                index = 0
+                while pick >= remaining[index]:
+                    pick -= remaining[index]
+                    index += 1
+                bucket = buckets[index]
+                bitset = served.get(keys[index])
+                if bitset is None:
+                    bitset = served[keys[index]] = SlotBitset(self.sizes[bucket])
+                slot = self._free_slot(state, session_id, self.sizes[bucket], bitset)
+                bitset.add(slot)
+                row = self._connection().execute(
+                    "SELECT text FROM items WHERE topic = ? AND difficulty = ? AND audience = ? AND slot = ?",
+                    (*bucket, slot),
+                ).fetchone()
+                if row is not None:
+                    results.append(row[0])
+            if len(results) >= count:
+                break
+        return results
+
+    def _served(self, state: SessionState) -> Dict[str, SlotBitset]:
+        served = state.served_questions
+        if served and not next(iter(served)).startswith(self._prefix):
+            # Bitsets from a previous build refer to different slots.
+            served.clear()
+        return served
+
+    def _key(self, bucket: Bucket) -> str:
+        return f"{self._prefix}{bucket[0]}/{bucket[1]}/{bucket[2]}"
+
+    @staticmethod
+    def _free_slot(state: SessionState, session_id: str, size: int, bitset: SlotBitset) -> int:
+        for _ in range(_PROBES):
+            slot = draw_below(state, session_id, size)
+            if slot not in bitset:
+                return slot
+        # Mostly-served bucket: take the first free slot after a random start.
+        bits = bitset.bits
+        start = draw_below(state, session_id, size) >> 3
+        for position in (start, 0):
+            match = _NOT_FULL_BYTE.search(bits, position)
+            while match is not None:
+                byte_index = match.start()
+                byte = bits[byte_index]
+                for bit in range(8):
+                    slot = byte_index * 8 + bit
+                    if slot >= size:
+                        break
+                    if not byte & (1 << bit):
+                        return slot
+                match = _NOT_FULL_BYTE.search(bits, byte_index + 1)
+        raise LookupError("No free slot in a bucket with unseen items.")
+
+
+_bank: Optional[QuestionBank] = None
+_bank_lock = threading.Lock()
+_bank_loaded = False
+
+
+def get_question_bank() -> Optional[QuestionBank]:
+    """Opens AI_ENGINE_QUESTION_BANK_PATH, or builds the bundled seed bank, once per process."""
+    global _bank, _bank_loaded
+    if not _bank_loaded:
+        with _bank_lock:
+            if not _bank_loaded:
+                path = os.getenv("AI_ENGINE_QUESTION_BANK_PATH", "").strip()
+                if path.lower() == "off":
+                    _bank = None
+                elif path:
+                    _bank = QuestionBank.open(path)
+                else:
+                    _bank = QuestionBank.from_items(read_jsonl(DEFAULT_SEED_PATH))
+                _bank_loaded = True
+    return _bank
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 3 or argv[0] != "build":
+        print("usage: python -m app.question_bank build <items.jsonl> <bank.sqlite>")
+        return 2
+    source, target = Path(argv[1]), argv[2]
+    if os.path.exists(target):
+        print(f"{target} already exists; remove it first.")
+        return 1
+    connection = sqlite3.connect(target, isolation_level=None)
+    try:
+        count = build_bank(connection, read_jsonl(source))
+    finally:
+        connection.close()
+    print(f"wrote {count} items to {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
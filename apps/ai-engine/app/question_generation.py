@@ -6,25 +6,32 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 
 from __future__ import annotations
 
-from typing import List
-
-
-def extract_learning_gaps(message: str) -> List[str]:
-    lowered = message.lower()
-    candidates = []
-    for token in [
-        "fractions",
-        "decimals",
-        "algebra",
-        "linear equations",
-        "geometry",
-        "grammar",
-        "reading comprehension",
-        "chemistry",
-        "physics",
-    ]:
-        if token in lowered:
-            candidates.append(token)
+from typing import List, Optional, Tuple
+
+from .memory import memory
+from .question_bank import get_question_bank
+from .taxonomy import get_taxonomy_index
+
+QUESTIONS_PER_SET = 3
+# Topics kept in an attempt's gap vector for progress comparison.
+GAP_VECTOR_LIMIT = 8
+
+
+def rank_learning_gaps(message: str, limit: int = 3) -> List[str]:
+    """Returns canonical taxonomy ids for the gaps mentioned in a message."""
+    return get_taxonomy_index().rank(message, limit=limit)
+
+
+def learning_gap_vector(message: str) -> List[Tuple[str, float]]:
+    """Returns up to ``GAP_VECTOR_LIMIT`` ``(topic_id, evidence)`` pairs, strongest first."""
+    return get_taxonomy_index().rank_scored(message, limit=GAP_VECTOR_LIMIT)
+
+
+def extract_learning_gaps(message: str, vector: Optional[List[Tuple[str, float]]] = None) -> List[str]:
+    index = get_taxonomy_index()
+    if vector is None:
+        vector = index.rank_scored(message, limit=3)
+    candidates = [index.label(topic_id) for topic_id, _ in vector[:3]]
 
     if not candidates and message.strip():
         candidates.append(message.strip()[:42])
@@ -32,10 +39,42 @@ def extract_learning_gaps(message: str) -> List[str]:
     return candidates[:3]
 
 
-def generate_questions(gaps: List[str]) -> List[str]:
+def _templated_questions(gaps: List[str]) -> List[str]:
     focus = gaps[0] if gaps else "the target skill"
     return [
         f"Solve two problems that apply {focus} in different contexts.",
         f"Explain each step you used to solve a {focus} problem in plain text.",
         f"Create one new {focus} question and solve it completely.",
     ]
+
+
+def _bank_topics(gaps: List[str]) -> List[str]:
+    """Maps gap labels to taxonomy ids, adding parents as broader fallbacks."""
+    index = get_taxonomy_index()
+    topics: List[str] = []
+    parents: List[str] = []
+    for gap in gaps:
+        topic_id = index.id_for_label(gap)
+        if topic_id is None:
+            continue
+        topics.append(topic_id)
+        parent = index.topics[topic_id].parent
+        if parent is not None:
+            parents.append(parent)
+    return list(dict.fromkeys(topics + parents))
+
+
+def generate_questions(gaps: List[str], session_id: Optional[str] = None, role: str = "UNKNOWN") -> List[str]:
+    """Serves unseen bank items for the gaps, topping up with templated prompts.
+
+    Without a session (or with the bank disabled) only templated prompts are used.
+    """
+    templated = _templated_questions(gaps)
+    bank = get_question_bank() if session_id is not None else None
+    if bank is None:
+        return templated
+    topics = _bank_topics(gaps)
+    if not topics:
+        return templated
+    questions = bank.sample(memory.get(session_id), session_id, topics, role, QUESTIONS_PER_SET)
+    return questions + templated[: QUESTIONS_PER_SET - len(questions)]
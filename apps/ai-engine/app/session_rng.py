@@ -0,0 +1,78 @@
+"""
+Overview: session_rng.py
+Purpose: Supplies per-session pseudo-random draws for linguistic variability without a syscall per choice.
+Notes: The generator state is one integer stored on the session, so draws stay reproducible across workers and restarts.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+from typing import Literal, Optional
+
+from .memory import SessionState, _env_int
+
+RngMode = Literal["session", "deterministic", "system"]
+
+_MASK = (1 << 64) - 1
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+_DETERMINISTIC_DEFAULT_SEED = 0
+
+
+def _resolve_mode(raw: str) -> RngMode:
+    mode = raw.strip().lower()
+    if mode in ("session", "deterministic", "system"):
+        return mode  # type: ignore[return-value]
+    return "session"
+
+
+rng_mode: RngMode = _resolve_mode(os.getenv("AI_ENGINE_RNG_MODE", "session"))
+_seed_override: Optional[int] = (
+    _env_int("AI_ENGINE_RNG_SEED", 0) if os.getenv("AI_ENGINE_RNG_SEED", "").strip() else None
+)
+# Without an explicit seed each process draws its own, so sessions vary between deployments.
+server_seed: int = (
+    _seed_override
+    if _seed_override is not None
+    else _DETERMINISTIC_DEFAULT_SEED
+    if rng_mode == "deterministic"
+    else int.from_bytes(os.urandom(8), "big")
+)
+
+_system_rng = random.SystemRandom()
+
+
+def configure(mode: RngMode, seed: Optional[int] = None) -> None:
+    """Switches the strategy at runtime; benchmarks use this to pin a seed."""
+    global rng_mode, server_seed
+    rng_mode = mode
+    if seed is not None:
+        server_seed = seed
+    elif mode == "deterministic":
+        server_seed = _DETERMINISTIC_DEFAULT_SEED
+
+
+def seed_for(session_id: str) -> int:
+    digest = hashlib.blake2b(
+        session_id.encode("utf-8"),
+        digest_size=8,
+        key=(server_seed & _MASK).to_bytes(8, "big"),
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+def draw_below(state: SessionState, session_id: str, bound: int) -> int:
+    """Returns an integer in [0, bound) from the session's SplitMix64 stream."""
+    if rng_mode == "system":
+        return _system_rng.randrange(bound)
+    current = state.rng_state
+    if current is None:
+        current = seed_for(session_id)
+    current = (current + _GOLDEN_GAMMA) & _MASK
+    state.rng_state = current
+    mixed = ((current ^ (current >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    mixed = ((mixed ^ (mixed >> 27)) * 0x94D049BB133111EB) & _MASK
+    mixed ^= mixed >> 31
+    # Multiply-shift maps the 64-bit output onto the range without a modulo.
+    return (mixed * bound) >> 64
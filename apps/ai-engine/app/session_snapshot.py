@@ -0,0 +1,543 @@
+"""
+Overview: session_snapshot.py
+Purpose: Writes session memory to a compact binary snapshot and restores sessions from it lazily after a restart.
+Notes: The snapshot is memory-mapped; a session is decoded only when its first request arrives.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .memory import Attempt, AttemptLog, PhraseHistory, SessionMemory, SessionState, SlotBitset, TurnHistory, _Entry
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"EDVSNAP\x00"
+# Bump when the record or index layout changes; unreadable versions are ignored, not misread.
+FORMAT_VERSION = 3
+# Versions 2 and 3 only added optional flagged fields, so older records decode unchanged.
+READABLE_VERSIONS = (1, 2, 3)
+HEADER_SIZE = 64
+# magic, format version, header size, reserved, record count, index offset, written at (unix seconds)
+_HEADER = struct.Struct("<8sHHIQQd")
+# session id length, last seen (unix seconds), payload length
+_RECORD_HEAD = struct.Struct("<HdI")
+_U8U8 = struct.Struct("<BB")
+_U64 = struct.Struct("<Q")
+
+_ROLES = ("UNKNOWN", "STUDENT", "TEACHER")
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+_FLAG_ASKED = 1
+_FLAG_RNG = 2
+_FLAG_ASCII = 4
+_FLAG_CURSOR = 8
+_FLAG_ATTEMPTS = 16
+_SECTIONS = struct.Struct("<IIIII")
+# attempt count, measured attempt count, stored attempts, metric width, topics, topic table bytes
+_ATTEMPTS_HEAD = struct.Struct("<IIHHII")
+
+# Positions in a snapshot are tagged with its generation so entries never point into a replaced file.
+_POSITION_BITS = 40
+_POSITION_MASK = (1 << _POSITION_BITS) - 1
+
+if sys.byteorder != "little" or array("I").itemsize != 4 or array("Q").itemsize != 8:
+    raise ImportError("Session snapshots require a little-endian platform with 4- and 8-byte array items.")
+
+
+class SnapshotError(ValueError):
+    """Raised for a snapshot file that is truncated, foreign or of another format version."""
+
+
+def key_hash(session_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def encode_state(state: SessionState) -> bytes:
+    """Encodes one session as a single string table plus the served-question bitsets.
+
+    Layout: flags and role, the optional RNG state and history cursor, five
+    section counts, every string length, the string bytes, the bitset lengths
+    and bytes, then the optional attempt log. When all text is ASCII (the
+    common case) it is encoded and decoded in one call.
+    """
+    acts = state.last_structure_by_act
+    served = state.served_questions
+    texts: List[str] = []
+    for role, content in state.turns.pairs():
+        texts.append(role)
+        texts.append(content)
+    texts.extend(state.learning_gaps)
+    texts.extend(state.recent_phrases)
+    for act, structure in acts.items():
+        texts.append(act)
+        texts.append(structure)
+    texts.extend(served)
+    joined = "".join(texts)
+    ascii_only = joined.isascii()
+    flags = (
+        (_FLAG_ASKED if state.asked_role_clarification else 0)
+        | (_FLAG_RNG if state.rng_state is not None else 0)
+        | (_FLAG_CURSOR if state.history_cursor is not None else 0)
+        | (_FLAG_ATTEMPTS if state.attempts.count else 0)
+        | (_FLAG_ASCII if ascii_only else 0)
+    )
+    parts = [_U8U8.pack(flags, _ROLE_CODES.get(state.role, 0))]
+    if state.rng_state is not None:
+        parts.append(_U64.pack(state.rng_state))
+    if state.history_cursor is not None:
+        parts.append(_U64.pack(state.history_cursor))
+    parts.append(
+        _SECTIONS.pack(2 * len(state.turns), len(state.learning_gaps), len(state.recent_phrases), 2 * len(acts), len(served))
+    )
+    if ascii_only:
+        parts.append(array("I", map(len, texts)).tobytes())
+        parts.append(joined.encode("ascii"))
+    else:
+        encoded = [text.encode("utf-8") for text in texts]
+        parts.append(array("I", map(len, encoded)).tobytes())
+        parts.append(b"".join(encoded))
+    bits = [bitset.bits for bitset in served.values()]
+    parts.append(array("I", map(len, bits)).tobytes())
+    parts.extend(bits)
+    if state.attempts.count:
+        _encode_attempts(state.attempts, parts)
+    return b"".join(parts)
+
+
+def _encode_attempts(log: AttemptLog, parts: List[bytes]) -> None:
+    """Appends the attempt log: topic table, running totals, then each stored attempt.
+
+    Attempts refer to topics by their u32 position in the table, which lists
+    every topic the totals cover, so stored gap vectors never repeat topic ids.
+    """
+    topics = list(log.gap_totals)
+    codes = {topic_id: code for code, topic_id in enumerate(topics)}
+    table = "\n".join(topics).encode("utf-8")
+    width = len(log.metric_totals) if log.metric_totals is not None else 0
+    parts.append(_ATTEMPTS_HEAD.pack(log.count, log.metric_count, len(log), width, len(topics), len(table)))
+    parts.append(table)
+    parts.append(array("d", log.gap_totals.values()).tobytes())
+    parts.append(array("I", (log.gap_hits.get(topic_id, 0) for topic_id in topics)).tobytes())
+    if width:
+        parts.append(array("d", log.metric_totals).tobytes())
+    for attempt in log:
+        measured = attempt.metrics is not None and len(attempt.metrics) == width
+        parts.append(_U8U8.pack(len(attempt.gap_ids), 1 if measured else 0))
+        parts.append(array("I", (codes[topic_id] for topic_id in attempt.gap_ids)).tobytes())
+        parts.append(attempt.gap_scores.tobytes())
+        if measured:
+            parts.append(attempt.metrics.tobytes())
+
+
+def _decode_attempts(buffer: memoryview, position: int) -> AttemptLog:
+    count, metric_count, stored, width, topic_count, table_size = _ATTEMPTS_HEAD.unpack_from(buffer, position)
+    position += _ATTEMPTS_HEAD.size
+    table = str(buffer[position : position + table_size], "utf-8")
+    topics = [sys.intern(topic_id) for topic_id in table.split("\n")] if topic_count else []
+    position += table_size
+    totals = array("d")
+    totals.frombytes(buffer[position : position + 8 * topic_count])
+    position += 8 * topic_count
+    hits = array("I")
+    hits.frombytes(buffer[position : position + 4 * topic_count])
+    position += 4 * topic_count
+    log = AttemptLog()
+    log.count = count
+    log.gap_totals = dict(zip(topics, totals))
+    log.gap_hits = dict(zip(topics, hits))
+    log.gap_mass = sum(totals)
+    if width:
+        metric_totals = array("d")
+        metric_totals.frombytes(buffer[position : position + 8 * width])
+        position += 8 * width
+        log.metric_totals = metric_totals.tolist()
+    log.metric_count = metric_count
+    for _ in range(stored):
+        size, measured = _U8U8.unpack_from(buffer, position)
+        position += 2
+        codes = array("I")
+        codes.frombytes(buffer[position : position + 4 * size])
+        position += 4 * size
+        scores = array("f")
+        scores.frombytes(buffer[position : position + 4 * size])
+        position += 4 * size
+        metrics = None
+        if measured:
+            metrics = array("f")
+            metrics.frombytes(buffer[position : position + 4 * width])
+            position += 4 * width
+        log._store(Attempt(tuple(topics[code] for code in codes), scores, metrics))
+    return log
+
+
+def decode_state(buffer: memoryview) -> SessionState:
+    flags, role_code = _U8U8.unpack_from(buffer, 0)
+    position = 2
+    rng_state = None
+    if flags & _FLAG_RNG:
+        (rng_state,) = _U64.unpack_from(buffer, position)
+        position += 8
+    history_cursor = None
+    if flags & _FLAG_CURSOR:
+        (history_cursor,) = _U64.unpack_from(buffer, position)
+        position += 8
+    turn_count, gap_count, phrase_count, act_count, served_count = _SECTIONS.unpack_from(buffer, position)
+    position += _SECTIONS.size
+    total = turn_count + gap_count + phrase_count + act_count + served_count
+    lengths = array("I")
+    lengths.frombytes(buffer[position : position + 4 * total])
+    position += 4 * total
+    size = sum(lengths)
+    texts: List[str] = []
+    if flags & _FLAG_ASCII:
+        # One decode, then slicing by character offsets, which equal byte offsets for ASCII.
+        joined = str(buffer[position : position + size], "ascii")
+        start = 0
+        for length in lengths:
+            texts.append(joined[start : start + length])
+            start += length
+    else:
+        start = position
+        for length in lengths:
+            texts.append(str(buffer[start : start + length], "utf-8"))
+            start += length
+    position += size
+    bit_lengths = array("I")
+    bit_lengths.frombytes(buffer[position : position + 4 * served_count])
+    position += 4 * served_count
+    bitsets = []
+    for length in bit_lengths:
+        bitsets.append(SlotBitset(length * 8, bytearray(buffer[position : position + length])))
+        position += length
+    attempts = _decode_attempts(buffer, position) if flags & _FLAG_ATTEMPTS else AttemptLog()
+
+    cursor = turn_count
+    gaps = texts[cursor : cursor + gap_count]
+    cursor += gap_count
+    phrases = texts[cursor : cursor + phrase_count]
+    cursor += phrase_count
+    acts = map(sys.intern, texts[cursor : cursor + act_count])
+    cursor += act_count
+    return SessionState(
+        role=_ROLES[role_code] if role_code < len(_ROLES) else "UNKNOWN",  # type: ignore[arg-type]
+        asked_role_clarification=bool(flags & _FLAG_ASKED),
+        turns=TurnHistory(zip(texts[0:turn_count:2], texts[1:turn_count:2])),
+        learning_gaps=list(map(sys.intern, gaps)),
+        recent_phrases=PhraseHistory(phrases),
+        # Act names, structures and bank keys come from small vocabularies, so restored copies are shared.
+        last_structure_by_act=dict(zip(acts, acts)),
+        rng_state=rng_state,
+        history_cursor=history_cursor,
+        attempts=attempts,
+        served_questions={sys.intern(key): bitset for key, bitset in zip(texts[cursor:], bitsets)},
+    )
+
+
+def encode_record(session_id: str, last_seen: float, payload: bytes) -> bytes:
+    raw_id = session_id.encode("utf-8")
+    return _RECORD_HEAD.pack(len(raw_id), last_seen, len(payload)) + raw_id + payload
+
+
+class SnapshotReader:
+    """Read-only, memory-mapped view of a snapshot file.
+
+    The index is two sorted arrays (session-id hashes, then record offsets)
+    read in place, so opening a file of any size costs one header read and a
+    lookup is a binary search plus one record decode.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size < HEADER_SIZE:
+                raise SnapshotError(f"{path} is too short to be a session snapshot.")
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size, _, count, index_offset, written_at = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a session snapshot.")
+        if version not in READABLE_VERSIONS:
+            raise SnapshotError(f"{path} has snapshot format {version}; this engine reads {READABLE_VERSIONS}.")
+        if header_size != HEADER_SIZE or index_offset + 16 * count != size:
+            raise SnapshotError(f"{path} is truncated or corrupt.")
+        view = memoryview(self._map)
+        self.count = count
+        self.written_at = written_at
+        self.hashes = view[index_offset : index_offset + 8 * count].cast("Q")
+        self.offsets = view[index_offset + 8 * count : index_offset + 16 * count].cast("Q")
+        self._view = view
+
+    def find(self, session_id: str) -> Optional[int]:
+        """Returns the index position of ``session_id``, or None."""
+        target = key_hash(session_id)
+        position = bisect_left(self.hashes, target)
+        while position < self.count and self.hashes[position] == target:
+            if self.session_id_at(position) == session_id:
+                return position
+            position += 1
+        return None
+
+    def _head(self, position: int) -> Tuple[int, int, float, int]:
+        offset = self.offsets[position]
+        id_length, last_seen, payload_length = _RECORD_HEAD.unpack_from(self._view, offset)
+        return offset, id_length, last_seen, payload_length
+
+    def session_id_at(self, position: int) -> str:
+        offset, id_length, _, _ = self._head(position)
+        start = offset + _RECORD_HEAD.size
+        return str(self._view[start : start + id_length], "utf-8")
+
+    def last_seen_at(self, position: int) -> float:
+        return self._head(position)[2]
+
+    def state_at(self, position: int) -> SessionState:
+        offset, id_length, _, payload_length = self._head(position)
+        start = offset + _RECORD_HEAD.size + id_length
+        return decode_state(self._view[start : start + payload_length])
+
+    def raw_at(self, position: int) -> memoryview:
+        """The whole record, for copying into the next snapshot without decoding it."""
+        offset, id_length, _, payload_length = self._head(position)
+        return self._view[offset : offset + _RECORD_HEAD.size + id_length + payload_length]
+
+
+def write_snapshot(path: str, records: Iterable[Tuple[int, bytes]]) -> np.ndarray:
+    """Writes ``(key hash, record)`` pairs atomically and returns each record's index position."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    hashes = array("Q")
+    offsets = array("Q")
+    descriptor, temp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(descriptor, "wb", buffering=1 << 20) as handle:
+            handle.write(bytes(HEADER_SIZE))
+            offset = HEADER_SIZE
+            for record_hash, record in records:
+                hashes.append(record_hash)
+                offsets.append(offset)
+                handle.write(record)
+                offset += len(record)
+            hash_array = np.frombuffer(hashes, dtype=np.uint64)
+            order = np.argsort(hash_array, kind="stable")
+            handle.write(hash_array[order].tobytes())
+            handle.write(np.frombuffer(offsets, dtype=np.uint64)[order].tobytes())
+            handle.seek(0)
+            handle.write(_HEADER.pack(MAGIC, FORMAT_VERSION, HEADER_SIZE, 0, len(hashes), offset, time.time()))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    positions = np.empty(len(order), dtype=np.int64)
+    positions[order] = np.arange(len(order), dtype=np.int64)
+    return positions
+
+
+class SnapshotSessionMemory(SessionMemory):
+    """In-process session store that survives restarts through a snapshot file.
+
+    On startup the previous snapshot is mapped but not decoded; a cache miss
+    looks the session up there and restores it. Snapshots are rewritten every
+    ``interval_seconds`` and at shutdown. Sessions unchanged since the last
+    write are copied as raw bytes, so only changed sessions are re-encoded.
+    Restored sessions that were never touched again are carried forward.
+    """
+
+    def __init__(self, path: str, interval_seconds: float = 0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self.interval_seconds = interval_seconds
+        # Guards the reader, its restore bitmap and the generation; taken after the index lock.
+        self._snapshot_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._generation = 1
+        self._reader: Optional[SnapshotReader] = None
+        # One bit per snapshot record whose session is in memory, or whose copy went stale on eviction.
+        self._claimed = bytearray()
+        self._closed = False
+        self._stop = threading.Event()
+        self.restored_total = 0
+        self.snapshot_writes_total = 0
+        self.snapshot_records = 0
+        self.last_write_seconds = 0.0
+        if os.path.exists(path):
+            try:
+                self._install(SnapshotReader(path), bytearray())
+            except (OSError, SnapshotError):
+                logger.exception("session_snapshot_unreadable")
+        if interval_seconds > 0:
+            threading.Thread(target=self._write_loop, name="eduvane-session-snapshot", daemon=True).start()
+        atexit.register(self.close)
+
+    def _install(self, reader: SnapshotReader, claimed: bytearray) -> None:
+        if len(claimed) < (reader.count + 7) // 8:
+            claimed.extend(bytes((reader.count + 7) // 8 - len(claimed)))
+        self._reader = reader
+        self._claimed = claimed
+        self.snapshot_records = reader.count
+
+    def _tag(self, position: int) -> int:
+        return (self._generation << _POSITION_BITS) | position
+
+    def _current(self, tag: Optional[int]) -> Optional[int]:
+        """Position in the current snapshot for a clean entry's tag, else None."""
+        if tag is None or tag >> _POSITION_BITS != self._generation:
+            return None
+        return tag & _POSITION_MASK
+
+    def _load(self, session_id: str) -> Optional[Tuple[SessionState, int]]:
+        with self._snapshot_lock:
+            reader = self._reader
+            if reader is None:
+                return None
+            position = reader.find(session_id)
+            if position is None or self._claimed[position >> 3] & (1 << (position & 7)):
+                return None
+        if self.idle_ttl_seconds > 0 and time.time() - reader.last_seen_at(position) > self.idle_ttl_seconds:
+            return None
+        return reader.state_at(position), 0
+
+    def _loaded(self, session_id: str, entry: _Entry) -> None:
+        with self._snapshot_lock:
+            if self._reader is None:
+                return
+            position = self._reader.find(session_id)
+            if position is None:
+                return
+            self._claimed[position >> 3] |= 1 << (position & 7)
+            entry.fingerprint = self._tag(position)
+            self.restored_total += 1
+
+    def _evicted(self, session_id: str, entry: _Entry) -> None:
+        with self._snapshot_lock:
+            position = self._current(entry.fingerprint)
+            if position is not None:
+                # The snapshot copy is still exact, so the session can be restored from it again.
+                self._claimed[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+
+    def _commit(self, session_id: str) -> None:
+        with self._index_lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.version += 1
+                entry.fingerprint = None
+
+    def _account(self, session_id: str) -> None:
+        super()._account(session_id)
+        self._commit(session_id)
+
+    def write(self) -> int:
+        """Writes a full snapshot and returns the number of sessions in it."""
+        with self._write_lock:
+            started = time.perf_counter()
+            wall_offset = time.time() - self._clock()
+            with self._index_lock:
+                live = [(session_id, entry, entry.version, entry.last_seen) for session_id, entry in self._sessions.items()]
+            with self._snapshot_lock:
+                reader = self._reader
+                claimed = bytes(self._claimed)
+                generation = self._generation
+            live_ids = set()
+            versions: List[int] = []
+            carried: List[str] = []
+
+            def records() -> Iterable[Tuple[int, bytes]]:
+                for session_id, entry, version, last_seen in live:
+                    live_ids.add(session_id)
+                    tag = entry.fingerprint
+                    if reader is not None and tag is not None and tag >> _POSITION_BITS == generation and entry.version == version:
+                        position = tag & _POSITION_MASK
+                        versions.append(version)
+                        yield reader.hashes[position], reader.raw_at(position)
+                        continue
+                    with self._hold(session_id):
+                        # Encode under the session lock so an in-flight request cannot change it mid-write.
+                        versions.append(entry.version)
+                        payload = encode_state(entry.state)
+                    yield key_hash(session_id), encode_record(session_id, last_seen + wall_offset, payload)
+                if reader is None:
+                    return
+                cutoff = time.time() - self.idle_ttl_seconds if self.idle_ttl_seconds > 0 else None
+                for position in range(reader.count):
+                    if claimed[position >> 3] & (1 << (position & 7)):
+                        continue
+                    session_id = reader.session_id_at(position)
+                    if session_id in live_ids or (cutoff is not None and reader.last_seen_at(position) < cutoff):
+                        continue
+                    carried.append(session_id)
+                    yield reader.hashes[position], reader.raw_at(position)
+
+            positions = write_snapshot(self.path, records())
+            new_reader = SnapshotReader(self.path)
+            new_claimed = bytearray((new_reader.count + 7) // 8)
+            with self._index_lock, self._snapshot_lock:
+                self._generation += 1
+                for index, (session_id, entry, _, _) in enumerate(live):
+                    position = int(positions[index])
+                    exact = entry.version == versions[index]
+                    if self._sessions.get(session_id) is entry:
+                        new_claimed[position >> 3] |= 1 << (position & 7)
+                        entry.fingerprint = self._tag(position) if exact else None
+                    elif not exact:
+                        # Evicted after changing past what was written; never restore the older copy.
+                        new_claimed[position >> 3] |= 1 << (position & 7)
+                for index, session_id in enumerate(carried, start=len(live)):
+                    position = int(positions[index])
+                    entry = self._sessions.get(session_id)
+                    if entry is not None:
+                        # Restored while this write ran; memory is authoritative from here on.
+                        new_claimed[position >> 3] |= 1 << (position & 7)
+                        was_clean = entry.fingerprint is not None and entry.fingerprint >> _POSITION_BITS == generation
+                        entry.fingerprint = self._tag(position) if was_clean else None
+                self._install(new_reader, new_claimed)
+            self.snapshot_writes_total += 1
+            self.last_write_seconds = time.perf_counter() - started
+            return new_reader.count
+
+    def _write_loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.write()
+            except Exception:
+                logger.exception("session_snapshot_write_failed")
+
+    def close(self) -> None:
+        """Writes a final snapshot; registered to run at interpreter shutdown."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        try:
+            self.write()
+        except Exception:
+            logger.exception("session_snapshot_write_failed")
+
+    def stats(self) -> Dict[str, int]:
+        result = super().stats()
+        result.update(
+            {
+                "snapshotRecords": self.snapshot_records,
+                "snapshotRestoredTotal": self.restored_total,
+                "snapshotWritesTotal": self.snapshot_writes_total,
+                "snapshotLastWriteMs": round(self.last_write_seconds * 1000, 1),
+            }
+        )
+        return result
@@ -0,0 +1,505 @@
+"""
+Overview: sharding.py
+Purpose: Runs orchestration in worker processes that each own the sessions hashed to them.
+Notes: Enabled with AI_ENGINE_SHARDS > 0; the front end routes by sessionId over one duplex pipe per shard.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .memory import _env_int
+
+logger = logging.getLogger(__name__)
+
+# Operations sent to a worker.
+OP_RESPOND = 1
+OP_CLASSIFY = 2
+OP_STREAM = 3
+OP_STATS = 4
+OP_PING = 5
+OP_STOP = 6
+# Replies sent back; events precede the final result of a stream.
+_READY = 0
+_RESULT = 1
+_EVENT = 2
+_ERROR = 3
+
+# Consecutive missed pings after which a worker is treated as hung and restarted.
+_MISSED_PINGS_LIMIT = 3
+# Delay before retrying a failed restart; doubles per failure up to the cap.
+_RESTART_BACKOFF_SECONDS = 1.0
+_RESTART_BACKOFF_CAP_SECONDS = 60.0
+# Spawning re-imports the app, so environment overrides for a child are applied under this lock.
+_spawn_lock = threading.Lock()
+
+
+class ShardUnavailable(Exception):
+    """Raised when the shard owning a session is down or restarting."""
+
+
+class ShardError(Exception):
+    """A request failed inside a shard worker; carries the HTTP status to return."""
+
+    def __init__(self, status: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashRing:
+    """Consistent-hash ring mapping session ids to shard indexes.
+
+    Each shard owns ``replicas`` points on the ring, so changing the shard
+    count moves about 1/N of sessions rather than nearly all of them.
+    """
+
+    def __init__(self, shards: int, replicas: int = 128) -> None:
+        points = sorted(
+            (_hash(f"shard-{shard}-{replica}"), shard) for shard in range(shards) for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def route(self, key: str) -> int:
+        position = bisect_right(self._points, _hash(key))
+        return self._owners[position % len(self._owners)]
+
+
+class _Shard:
+    """Front-end handle for one worker process and the requests waiting on it."""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn: Optional[Connection] = None
+        self.send_lock = threading.Lock()
+        # request id -> (future for the final reply, callback for stream events)
+        self.pending: Dict[int, Tuple[Future, Optional[Callable[[Any], None]]]] = {}
+        self.healthy = False
+        self.pid = 0
+        self.restarts = 0
+        # Monotonic time of the next restart attempt while the worker is down; None when up or closed.
+        self.restart_at: Optional[float] = None
+        self.restart_backoff = 0.0
+        self.spawn_lock = threading.Lock()
+        self.missed_pings = 0
+        self.ping_ms = 0.0
+        self.busy_ms = 0.0
+
+    def send(self, message: tuple) -> None:
+        conn = self.conn
+        if conn is None or not self.healthy:
+            raise ShardUnavailable(f"Shard {self.index} is unavailable.")
+        try:
+            with self.send_lock:
+                conn.send(message)
+        except (OSError, ValueError) as exc:
+            raise ShardUnavailable(f"Shard {self.index} is unavailable.") from exc
+
+
+class ShardPool:
+    """Routes orchestration to ``shards`` worker processes by consistent hash of sessionId.
+
+    Every worker holds its own session store and runs requests on a small
+    thread pool, serialized per session by the store's session lock, so a
+    session's state lives in exactly one process and needs no cross-process
+    locking. A reader thread per shard resolves replies; a monitor thread pings
+    each worker, restarts any that hung, and retries failed restarts with
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        shards: int,
+        ping_interval: float = 5.0,
+        ping_timeout: float = 2.0,
+        start_timeout: float = 60.0,
+    ) -> None:
+        self.ring = HashRing(shards)
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.start_timeout = start_timeout
+        self._shards = [_Shard(index) for index in range(shards)]
+        self._ids = itertools.count(1)
+        self._context = multiprocessing.get_context("spawn")
+        self._start_lock = threading.Lock()
+        # Guards shard connection state; never held while a worker starts.
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._stop = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def start(self) -> None:
+        """Spawns every worker and waits until each has imported the app; idempotent."""
+        with self._start_lock:
+            if self._started:
+                return
+            for shard in self._shards:
+                self._spawn(shard)
+            self._started = True
+        # Registered after multiprocessing's own hook, so it runs first and workers exit cleanly.
+        atexit.register(self.close)
+        threading.Thread(target=self._monitor, name="eduvane-shard-monitor", daemon=True).start()
+
+    async def ready(self) -> None:
+        if not self._started:
+            await asyncio.get_running_loop().run_in_executor(None, self.start)
+
+    def _spawn(self, shard: _Shard) -> None:
+        parent, child = self._context.Pipe(duplex=True)
+        overrides = {"AI_ENGINE_SHARD_INDEX": str(shard.index), "AI_ENGINE_SHARDS": "0"}
+        with _spawn_lock:
+            saved = {name: os.environ.get(name) for name in overrides}
+            os.environ.update(overrides)
+            try:
+                process = self._context.Process(
+                    target=_serve, args=(child,), name=f"eduvane-shard-{shard.index}", daemon=True
+                )
+                process.start()
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+        child.close()
+        try:
+            if not parent.poll(self.start_timeout):
+                raise RuntimeError(f"Shard {shard.index} did not start within {self.start_timeout:.0f}s.")
+            try:
+                _, kind, pid = parent.recv()
+            except EOFError:
+                raise RuntimeError(f"Shard {shard.index} exited during startup; see its log output.") from None
+            if kind != _READY:
+                raise RuntimeError(f"Shard {shard.index} sent an unexpected first message.")
+        except BaseException:
+            process.kill()
+            parent.close()
+            raise
+        with self._lock:
+            if self._closed:
+                process.kill()
+                parent.close()
+                return
+            shard.process, shard.conn, shard.pid = process, parent, pid
+            shard.missed_pings = 0
+            shard.restart_at = None
+            shard.restart_backoff = 0.0
+            shard.healthy = True
+        threading.Thread(
+            target=self._read, args=(shard, parent), name=f"eduvane-shard-{shard.index}-reader", daemon=True
+        ).start()
+
+    def _read(self, shard: _Shard, conn: Connection) -> None:
+        while True:
+            try:
+                request_id, kind, payload = conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == _EVENT:
+                waiter = shard.pending.get(request_id)
+                if waiter is not None and waiter[1] is not None:
+                    waiter[1](payload)
+                continue
+            waiter = shard.pending.pop(request_id, None)
+            if waiter is None:
+                continue
+            if kind == _ERROR:
+                waiter[0].set_exception(ShardError(*payload))
+            else:
+                waiter[0].set_result(payload)
+        self._lost(shard, conn)
+
+    def _lost(self, shard: _Shard, conn: Connection) -> None:
+        """Fails the dead worker's requests and starts a replacement with an empty session store."""
+        with self._lock:
+            if shard.conn is not conn:
+                return
+            shard.healthy = False
+            shard.conn = None
+            pending, shard.pending = shard.pending, {}
+            conn.close()
+            restart = not self._closed
+            if restart:
+                shard.restart_at = time.monotonic()
+                shard.restarts += 1
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(ShardUnavailable(f"Shard {shard.index} stopped while handling the request."))
+        if not restart:
+            return
+        if shard.process is not None and shard.process.is_alive():
+            shard.process.kill()
+        logger.error("shard_worker_lost", extra={"shard": shard.index, "pid": shard.pid})
+        self._restart(shard)
+
+    def _restart(self, shard: _Shard) -> None:
+        """Starts a replacement worker; on failure the monitor retries after a growing delay."""
+        if not shard.spawn_lock.acquire(blocking=False):
+            return
+        try:
+            if self._closed or shard.restart_at is None:
+                return
+            try:
+                self._spawn(shard)
+            except Exception:
+                shard.restart_backoff = min(
+                    max(shard.restart_backoff * 2, _RESTART_BACKOFF_SECONDS), _RESTART_BACKOFF_CAP_SECONDS
+                )
+                shard.restart_at = time.monotonic() + shard.restart_backoff
+                logger.exception(
+                    "shard_worker_restart_failed",
+                    extra={"shard": shard.index, "retryInSeconds": shard.restart_backoff},
+                )
+        finally:
+            shard.spawn_lock.release()
+
+    def _restart_due(self) -> None:
+        now = time.monotonic()
+        for shard in self._shards:
+            restart_at = shard.restart_at
+            if restart_at is not None and restart_at <= now and not self._stop.is_set():
+                self._restart(shard)
+
+    def _submit(self, shard: _Shard, op: int, payload: Any, on_event: Optional[Callable[[Any], None]] = None) -> Future:
+        request_id = next(self._ids)
+        future: Future = Future()
+        shard.pending[request_id] = (future, on_event)
+        try:
+            shard.send((request_id, op, payload))
+        except ShardUnavailable:
+            shard.pending.pop(request_id, None)
+            raise
+        return future
+
+    async def call(
+        self,
+        session_id: str,
+        op: int,
+        payload: Any,
+        on_event: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """Sends one request to the shard owning ``session_id`` and awaits its reply.
+
+        Like a thread, a worker cannot be interrupted, so a cancelled caller
+        still waits for the reply; admission slots are then held until the
+        shard has actually finished the work.
+        """
+        await self.ready()
+        future = asyncio.wrap_future(self._submit(self._shards[self.ring.route(session_id)], op, payload, on_event))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait([future])
+            raise
+
+    def _monitor(self) -> None:
+        # Without pings the monitor still wakes up to retry failed restarts.
+        while not self._stop.wait(self.ping_interval if self.ping_interval > 0 else _RESTART_BACKOFF_SECONDS):
+            self._restart_due()
+            if self.ping_interval <= 0:
+                continue
+            for shard in self._shards:
+                if self._stop.is_set() or not shard.healthy:
+                    continue
+                started = time.perf_counter()
+                try:
+                    _, busy_seconds = self._submit(shard, OP_PING, None).result(self.ping_timeout)
+                except ShardUnavailable:
+                    continue
+                except FutureTimeout:
+                    shard.missed_pings += 1
+                    logger.warning("shard_ping_missed", extra={"shard": shard.index, "missed": shard.missed_pings})
+                    if shard.missed_pings >= _MISSED_PINGS_LIMIT and shard.process is not None:
+                        # The worker answers pings even mid-request, so silence means the process is wedged;
+                        # killing it closes the pipe and the reader thread starts a replacement.
+                        shard.process.kill()
+                    continue
+                shard.missed_pings = 0
+                shard.ping_ms = (time.perf_counter() - started) * 1000
+                shard.busy_ms = busy_seconds * 1000
+
+    def health(self) -> List[Dict[str, Any]]:
+        """Per-shard liveness from the last ping; makes no IPC calls."""
+        return [
+            {
+                "shard": shard.index,
+                "pid": shard.pid,
+                "healthy": shard.healthy and shard.missed_pings == 0,
+                "pending": len(shard.pending),
+                "pingMs": round(shard.ping_ms, 3),
+                "busyMs": round(shard.busy_ms, 1),
+                "restarts": shard.restarts,
+            }
+            for shard in self._shards
+        ]
+
+    async def stats(self) -> List[Dict[str, Any]]:
+        """Health plus each worker's session store and upload cache counters."""
+        await self.ready()
+        results = []
+        for entry, shard in zip(self.health(), self._shards):
+            try:
+                entry.update(await asyncio.wrap_future(self._submit(shard, OP_STATS, None)))
+            except ShardUnavailable:
+                pass
+            results.append(entry)
+        return results
+
+    def close(self) -> None:
+        """Asks workers to finish queued requests and exit, so their stores run shutdown hooks."""
+        with self._lock:
+            self._closed = True
+            for shard in self._shards:
+                shard.restart_at = None
+        self._stop.set()
+        for shard in self._shards:
+            try:
+                shard.send((0, OP_STOP, None))
+            except ShardUnavailable:
+                pass
+            shard.healthy = False
+        for shard in self._shards:
+            if shard.process is not None:
+                shard.process.join(timeout=5)
+                if shard.process.is_alive():
+                    shard.process.kill()
+
+
+def _serve(conn: Connection) -> None:
+    """Worker entry point: owns a session store and runs requests on a small thread pool.
+
+    Requests for one session still run one at a time through ``memory.session()``,
+    so a slow request only delays its own session.
+    """
+    # The parent handles Ctrl-C and shuts workers down by closing their pipes.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from pydantic import BaseModel
+
+    from .memory import memory
+    from .models import AIEngineRequest, ClassifyRequest
+    from .orchestrator import run_classification, run_orchestration, stream_orchestration
+    from .profiling import profiler
+    from .upload_cache import upload_cache
+    from .uploads import BufferedUpload, UploadSource, UploadTooLarge
+
+    inbox: "queue.Queue[Optional[tuple]]" = queue.Queue()
+    send_lock = threading.Lock()
+    # request id -> monotonic start time, for the busy time reported with pings.
+    running: Dict[int, float] = {}
+    running_lock = threading.Lock()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, _env_int("AI_ENGINE_SHARD_THREADS", 4)), thread_name_prefix="eduvane-shard-worker"
+    )
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    def read() -> None:
+        # Draining the pipe on its own thread keeps the parent's sends from blocking and answers pings mid-request.
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                inbox.put(None)
+                return
+            if message[1] == OP_STOP:
+                inbox.put(None)
+                return
+            if message[1] == OP_PING:
+                with running_lock:
+                    oldest = min(running.values(), default=0.0)
+                send((message[0], _RESULT, (os.getpid(), time.monotonic() - oldest if oldest else 0.0)))
+            else:
+                inbox.put(message)
+
+    def sources(uploads: Optional[Sequence[Tuple[str, str, bytes]]]) -> Optional[List[UploadSource]]:
+        if uploads is None:
+            return None
+        return [BufferedUpload(file_name, mime_type, data) for file_name, mime_type, data in uploads]
+
+    def handle(request_id: int, op: int, payload: Any) -> Any:
+        if op == OP_RESPOND:
+            body, uploads, route, profile = payload
+            request = AIEngineRequest.model_validate_json(body)
+            with profiler.maybe_capture(request.sessionId, route, profile):
+                return run_orchestration(request, sources(uploads)).model_dump_json()
+        if op == OP_CLASSIFY:
+            return run_classification(ClassifyRequest.model_validate_json(payload)).model_dump_json()
+        if op == OP_STREAM:
+            request = AIEngineRequest.model_validate_json(payload)
+            for event, data in stream_orchestration(request):
+                data = data.model_dump(mode="json") if isinstance(data, BaseModel) else data
+                send((request_id, _EVENT, (event, data)))
+            return None
+        if op == OP_STATS:
+            return {"sessions": memory.stats(), "uploadCache": upload_cache.stats()}
+        raise ValueError(f"Unknown shard operation {op}.")
+
+    def run(request_id: int, op: int, payload: Any) -> None:
+        with running_lock:
+            running[request_id] = time.monotonic()
+        try:
+            reply = (request_id, _RESULT, handle(request_id, op, payload))
+        except UploadTooLarge as exc:
+            reply = (request_id, _ERROR, (413, str(exc)))
+        except Exception:
+            logger.exception("shard_request_failed", extra={"op": op})
+            reply = (request_id, _ERROR, (500, "Unable to complete orchestration."))
+        finally:
+            with running_lock:
+                running.pop(request_id, None)
+        try:
+            send(reply)
+        except (OSError, ValueError):
+            # The parent is gone; its reader thread fails the request.
+            pass
+
+    threading.Thread(target=read, name="eduvane-shard-reader", daemon=True).start()
+    send((0, _READY, os.getpid()))
+    while True:
+        message = inbox.get()
+        if message is None:
+            # Finish what was accepted so the store's shutdown hooks see every change.
+            executor.shutdown(wait=True)
+            return
+        executor.submit(run, *message)
+
+
+def create_shard_pool() -> Optional[ShardPool]:
+    """Builds the pool when ``AI_ENGINE_SHARDS`` is above 0; workers start with the app."""
+    shards = _env_int("AI_ENGINE_SHARDS", 0)
+    if shards <= 0:
+        return None
+    return ShardPool(
+        shards,
+        ping_interval=_env_int("AI_ENGINE_SHARD_PING_INTERVAL_MS", 5000) / 1000,
+        ping_timeout=_env_int("AI_ENGINE_SHARD_PING_TIMEOUT_MS", 2000) / 1000,
+    )
+
+
+shard_pool = create_shard_pool()
@@ -0,0 +1,351 @@
+"""
+Overview: sqlite_store.py
+Purpose: Persists session state in a node-local SQLite database shared by every engine worker.
+Notes: WAL mode lets workers read while one writes; each worker keeps a read-through LRU cache.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no POSIX record locks.
+    fcntl = None
+
+from .memory import (
+    SessionMemory,
+    SessionState,
+    _env_int,
+    state_from_dict,
+    state_to_dict,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    payload TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+# Only overwrite rows this worker has seen; a concurrent newer write wins.
+_UPSERT = """
+INSERT INTO sessions (session_id, version, payload) VALUES (?, ?, ?)
+ON CONFLICT(session_id) DO UPDATE SET version = excluded.version, payload = excluded.payload
+WHERE sessions.version < excluded.version
+"""
+
+_IDEMPOTENCY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    created REAL NOT NULL,
+    state INTEGER NOT NULL,
+    result TEXT
+) WITHOUT ROWID
+"""
+
+# Idempotency record states.
+RUNNING = 0
+DONE = 1
+FAILED = 2
+# Expired idempotency records are purged every this many claims.
+_IDEMPOTENCY_PURGE_INTERVAL = 256
+
+# Sessions hash onto byte-range locks in a sidecar file; collisions only serialize unrelated sessions.
+_LOCK_STRIPES = 1024
+
+
+def _encode(state: SessionState) -> str:
+    return json.dumps(state_to_dict(state), separators=(",", ":"))
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SqliteSessionStore(SessionMemory):
+    """Session store backed by SQLite with a per-worker read-through cache.
+
+    A session scope holds a record lock on ``<path>-locks`` as well as the
+    in-process session lock, so one request at a time reads, changes and writes
+    a session across every worker on the node. Under that lock the cached copy
+    is revalidated with a single primary-key lookup that only returns a payload
+    when another worker has written a newer version, and the changes are
+    written back before the lock is released.
+
+    With ``AI_ENGINE_SQLITE_FLUSH_MS`` above zero, writes are buffered and
+    committed together in one transaction per interval instead. Buffered
+    changes are invisible to other workers until flushed, so that mode is only
+    safe with a single worker; a write that loses to a newer version is counted
+    and logged, and the stale cached copy is dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval_ms: int | None = None,
+        max_batch: int | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self.flush_interval_ms = (
+            flush_interval_ms
+            if flush_interval_ms is not None
+            else _env_int("AI_ENGINE_SQLITE_FLUSH_MS", 0)
+        )
+        self.max_batch = (
+            max_batch if max_batch is not None else _env_int("AI_ENGINE_SQLITE_MAX_BATCH", 256)
+        )
+        self._local = threading.local()
+        self._pending: Dict[str, Tuple[int, str]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_wakeup = threading.Event()
+        self._closed = False
+        self._lock_fd = (
+            os.open(path + "-locks", os.O_RDWR | os.O_CREAT, 0o600) if fcntl is not None else None
+        )
+        self._stripe_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self.reads_total = 0
+        self.writes_total = 0
+        self.write_conflicts_total = 0
+        self.flushes_total = 0
+
+        self._connection().execute(_SCHEMA)
+        if self.flush_interval_ms > 0:
+            logger.warning("sqlite_buffered_writes_single_worker", extra={"flushMs": self.flush_interval_ms})
+            threading.Thread(
+                target=self._flush_loop, name="eduvane-sqlite-flush", daemon=True
+            ).start()
+        atexit.register(self.close)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _connect(self.path)
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _hold(self, session_id: str) -> Iterator[None]:
+        with super()._hold(session_id):
+            if self._lock_fd is None:
+                yield
+                return
+            # crc32 rather than hash(): every worker must pick the same stripe.
+            stripe = zlib.crc32(session_id.encode()) % _LOCK_STRIPES
+            # Record locks belong to the process, so threads sharing a stripe take turns first.
+            with self._stripe_locks[stripe]:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+                try:
+                    yield
+                finally:
+                    fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _load(self, session_id: str) -> Optional[Tuple[SessionState, int]]:
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+        if pending is not None:
+            return state_from_dict(json.loads(pending[1])), pending[0]
+        self.reads_total += 1
+        row = self._connection().execute(
+            "SELECT version, payload FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return state_from_dict(json.loads(row[1])), row[0]
+
+    def _refresh(self, session_id: str) -> None:
+        with self._pending_lock:
+            if session_id in self._pending:
+                # This worker holds the newest copy until it is flushed.
+                return
+        with self._index_lock:
+            entry = self._sessions.get(session_id)
+            cached_version = entry.version if entry is not None else None
+        if cached_version is None:
+            return
+        self.reads_total += 1
+        row = self._connection().execute(
+            "SELECT version, payload FROM sessions WHERE session_id = ? AND version > ?",
+            (session_id, cached_version),
+        ).fetchone()
+        if row is None:
+            return
+        state = state_from_dict(json.loads(row[1]))
+        with self._index_lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.state = state
+                entry.version = row[0]
+                entry.fingerprint = None
+        self._account(session_id)
+
+    def _commit(self, session_id: str) -> None:
+        with self._index_lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            payload = _encode(entry.state)
+            fingerprint = hash(payload)
+            if fingerprint == entry.fingerprint:
+                return
+            entry.version += 1
+            entry.fingerprint = fingerprint
+            version = entry.version
+
+        if self.flush_interval_ms <= 0:
+            self._write([(session_id, version, payload)])
+            return
+        with self._pending_lock:
+            self._pending[session_id] = (version, payload)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._flush_wakeup.set()
+
+    def flush(self) -> None:
+        """Writes every buffered session change in a single transaction."""
+        with self._pending_lock:
+            if not self._pending:
+                return
+            batch = [(session_id, version, payload) for session_id, (version, payload) in self._pending.items()]
+            self._pending.clear()
+        self._write(batch)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_wakeup.set()
+        self.flush()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> Dict[str, int]:
+        result = super().stats()
+        with self._pending_lock:
+            pending = len(self._pending)
+        result.update(
+            {
+                "sqliteReadsTotal": self.reads_total,
+                "sqliteWritesTotal": self.writes_total,
+                "sqliteWriteConflictsTotal": self.write_conflicts_total,
+                "sqliteFlushesTotal": self.flushes_total,
+                "sqlitePendingWrites": pending,
+            }
+        )
+        return result
+
+    def _write(self, batch: list) -> None:
+        connection = self._connection()
+        conflicts = []
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for session_id, version, payload in batch:
+                cursor = connection.execute(_UPSERT, (session_id, version, payload))
+                if cursor.rowcount == 0:
+                    conflicts.append(session_id)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self.writes_total += len(batch) - len(conflicts)
+        self.flushes_total += 1
+        if conflicts:
+            self.write_conflicts_total += len(conflicts)
+            logger.warning("session_write_conflict", extra={"sessions": len(conflicts)})
+            # Drop stale copies so the next request reloads the winning version.
+            for session_id in conflicts:
+                self.discard(session_id)
+
+    def _flush_loop(self) -> None:
+        interval = self.flush_interval_ms / 1000
+        while not self._closed:
+            self._flush_wakeup.wait(interval)
+            self._flush_wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("session_flush_failed")
+
+
+class SqliteIdempotencyStore:
+    """Idempotency records shared by every worker through the session database.
+
+    A claim inserts a ``RUNNING`` record, or returns the existing one so the
+    caller can replay it, wait for it, or reject a different body. Records use
+    wall-clock time, since workers do not share a monotonic clock, and expire
+    ``ttl`` seconds after the first claim.
+    """
+
+    def __init__(self, path: str, ttl: float) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._claims = 0
+        self._connection().execute(_IDEMPOTENCY_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _connect(self.path)
+            self._local.connection = connection
+        return connection
+
+    def claim(self, key: str, fingerprint: str) -> Optional[Tuple[str, int, Optional[str]]]:
+        """Returns None when this caller now owns ``key``, else ``(fingerprint, state, result)``."""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM idempotency WHERE key = ? AND created < ?", (key, now - self.ttl))
+            cursor = connection.execute(
+                "INSERT INTO idempotency (key, fingerprint, created, state) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO NOTHING",
+                (key, fingerprint, now, RUNNING),
+            )
+            row = None
+            if cursor.rowcount == 0:
+                row = connection.execute(
+                    "SELECT fingerprint, state, result FROM idempotency WHERE key = ?", (key,)
+                ).fetchone()
+            self._claims += 1
+            if self._claims % _IDEMPOTENCY_PURGE_INTERVAL == 0:
+                connection.execute("DELETE FROM idempotency WHERE created < ?", (now - self.ttl,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return row
+
+    def lookup(self, key: str) -> Optional[Tuple[str, int, Optional[str]]]:
+        return self._connection().execute(
+            "SELECT fingerprint, state, result FROM idempotency WHERE key = ? AND created >= ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+
+    def finish(self, key: str, state: int, result: Optional[str] = None) -> None:
+        self._connection().execute(
+            "UPDATE idempotency SET state = ?, result = ? WHERE key = ? AND state = ?", (state, result, key, RUNNING)
+        )
+
+    def forget(self, key: str) -> None:
+        """Drops a running record so a retry runs afresh."""
+        self._connection().execute("DELETE FROM idempotency WHERE key = ? AND state = ?", (key, RUNNING))
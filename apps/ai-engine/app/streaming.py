@@ -0,0 +1,109 @@
+"""
+Overview: streaming.py
+Purpose: Encodes orchestration stages as NDJSON or server-sent events for the streaming respond endpoint.
+Notes: Orchestration runs to completion on one admitted worker thread even if the client disconnects early.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import logging
+from typing import Any, AsyncIterator, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from .admission import Overloaded, admission
+from .models import AIEngineRequest
+from .orchestrator import stream_orchestration
+from .sharding import OP_STREAM, ShardError, ShardPool, ShardUnavailable
+from .uploads import UploadSource
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def encode_event(event: str, payload: Any, sse: bool) -> bytes:
+    data = payload.model_dump(mode="json") if isinstance(payload, BaseModel) else payload
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+    return (json.dumps({"event": event, "data": data}, separators=(",", ":")) + "\n").encode()
+
+
+async def stream_events(
+    request: AIEngineRequest,
+    uploads: Sequence[UploadSource],
+    sse: bool,
+    pool: Optional[ShardPool] = None,
+) -> AsyncIterator[bytes]:
+    """Relays orchestration events from a worker thread as soon as each one is ready."""
+    if pool is not None:
+        async for chunk in _shard_stream_events(pool, request, sse):
+            yield chunk
+        return
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Optional[Tuple[str, Any]]]" = asyncio.Queue()
+
+    def produce() -> None:
+        # The generator holds the session lock, so it is drained on this one thread.
+        try:
+            for item in stream_orchestration(request, uploads):
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception:
+            logger.exception("stream_orchestration_failed")
+            loop.call_soon_threadsafe(
+                queue.put_nowait,
+                ("error", {"detail": "Unable to complete orchestration."}),
+            )
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    try:
+        async with admission.slot():
+            producer = loop.run_in_executor(admission.executor(), contextvars.copy_context().run, produce)
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    yield encode_event(item[0], item[1], sse)
+            finally:
+                await producer
+    except Overloaded as exc:
+        # Headers are already sent, so a request that timed out in the queue ends with an error event.
+        yield encode_event("error", {"detail": str(exc), "retryAfter": exc.retry_after}, sse)
+
+
+async def _shard_stream_events(pool: ShardPool, request: AIEngineRequest, sse: bool) -> AsyncIterator[bytes]:
+    """Relays events from the shard owning the session; inline uploads travel inside the request."""
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Optional[Tuple[str, Any]]]" = asyncio.Queue()
+
+    def relay(item: Tuple[str, Any]) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, tuple(item))
+
+    try:
+        async with admission.slot():
+            call = asyncio.ensure_future(pool.call(request.sessionId, OP_STREAM, request.model_dump_json(), relay))
+            # Events and the final reply arrive in order on one reader thread, so this sentinel comes last.
+            call.add_done_callback(lambda _: queue.put_nowait(None))
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    yield encode_event(item[0], item[1], sse)
+            finally:
+                await asyncio.wait([call])
+        failure = call.exception()
+        if isinstance(failure, ShardError):
+            yield encode_event("error", {"detail": failure.detail}, sse)
+        elif isinstance(failure, ShardUnavailable):
+            yield encode_event("error", {"detail": str(failure), "retryAfter": 1}, sse)
+        elif failure is not None:
+            raise failure
+    except Overloaded as exc:
+        yield encode_event("error", {"detail": str(exc), "retryAfter": exc.retry_after}, sse)
@@ -6,7 +6,10 @@ Notes: Keep logic cohesive and update docstrings/comments when behavior changes.
 
 from __future__ import annotations
 
-from typing import List, Literal
+from typing import List, Literal, Optional
+
+from .models import ProgressReport
+from .template_catalog import render
 
 Role = Literal["TEACHER", "STUDENT", "UNKNOWN"]
 
@@ -19,69 +22,53 @@ def role_prefix(role: Role) -> str:
     return "This work"
 
 
-def build_analysis_response(role: Role, gaps: List[str]) -> str:
-    subject_focus = ", ".join(gaps[:2]) if gaps else "core concepts in this submission"
-
-    if role == "TEACHER":
-        return (
-            f"The student shows partial understanding in {subject_focus}. "
-            "Reasoning steps are present, but there are consistency gaps in execution. "
-            "Targeted reteaching with one worked example and one independent check should improve retention."
-        )
-
-    if role == "STUDENT":
-        return (
-            f"You show partial understanding in {subject_focus}. "
-            "Your reasoning steps are visible, and a few checkpoints need tighter consistency. "
-            "One guided example followed by one independent retry will strengthen this skill."
-        )
-
-    return (
-        f"This work shows partial understanding in {subject_focus}. "
-        "Reasoning is visible with a few consistency gaps that can be addressed through guided practice."
-    )
-
-
-def build_question_prompt(role: Role, questions: List[str]) -> str:
-    lines = [f"{idx + 1}. {question}" for idx, question in enumerate(questions)]
-    joined = "\n".join(lines)
-
-    if role == "TEACHER":
-        return (
-            "Generated practice set aligned to observed gaps:\n"
-            f"{joined}\n"
-            "Please ask the student to attempt these and upload the response for feedback."
-        )
-
-    if role == "STUDENT":
-        return (
-            "Here are focused practice questions linked to your current gaps:\n"
-            f"{joined}\n"
-            "Try these first, then upload your work and I will review it."
-        )
-
-    return (
-        "Here are focused practice questions linked to this conversation:\n"
-        f"{joined}\n"
-        "Attempt them and upload the results for feedback."
-    )
-
-
-def build_conversational_response(role: Role, text: str) -> str:
-    clean = text.strip()
-    if not clean:
-        if role == "TEACHER":
-            return (
-                "Please share the student task or upload work, and I will provide targeted feedback."
-            )
-        return "Share your question or upload your work, and I will guide the next step."
-
-    if role == "TEACHER":
-        return (
-            "The request is understood. Please share the student work artifact or target skill, "
-            "and I will return analysis or question generation aligned to that need."
-        )
-
-    return (
-        "I can help with feedback or guided practice. Share your work or ask for focused questions on a topic."
-    )
+def build_analysis_response(
+    role: Role,
+    gaps: List[str],
+    locale: Optional[str] = None,
+    variant: Optional[str] = None,
+) -> str:
+    # Only the first two gaps are shown.
+    return render(role, "ANALYSIS", {"focus": ", ".join(gaps[:2])}, locale, variant)
+
+
+def _join(items: List[str], singular: str, plural: str) -> str:
+    shown = items[:2]
+    return f"{' and '.join(shown)} {singular if len(shown) == 1 else plural}"
+
+
+def build_progress_note(report: ProgressReport) -> str:
+    """Summarizes an attempt comparison in one or two sentences for the analysis response."""
+    parts = []
+    if report.resolvedGaps:
+        parts.append(_join(report.resolvedGaps, "no longer shows up as a gap", "no longer show up as gaps"))
+    if report.persistentGaps:
+        parts.append(_join(report.persistentGaps, "still needs work", "still need work"))
+    if report.newGaps:
+        parts.append(_join(report.newGaps, "is new this time", "are new this time"))
+    note = f"Since the last attempt, {'; '.join(parts)}." if parts else ""
+    legibility = (report.handwritingChange or {}).get("legibility", 0.0)
+    if legibility >= 0.05:
+        note = f"{note} Legibility improved.".strip()
+    elif legibility <= -0.05:
+        note = f"{note} Legibility dropped.".strip()
+    return note
+
+
+def build_question_prompt(
+    role: Role,
+    questions: List[str],
+    locale: Optional[str] = None,
+    variant: Optional[str] = None,
+) -> str:
+    return render(role, "QUESTION_GENERATION", {"questions": questions}, locale, variant)
+
+
+def build_conversational_response(
+    role: Role,
+    text: str,
+    locale: Optional[str] = None,
+    variant: Optional[str] = None,
+) -> str:
+    intent = "CONVERSATIONAL" if text.strip() else "CONVERSATIONAL_EMPTY"
+    return render(role, intent, None, locale, variant)
@@ -0,0 +1,165 @@
+"""
+Overview: taxonomy.py
+Purpose: Loads the curriculum taxonomy and matches learning gaps against it in one pass.
+Notes: The index is compiled lazily on first use; point AI_ENGINE_TAXONOMY_PATH at a larger file to extend it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_TAXONOMY_PATH = Path(__file__).with_name("data") / "curriculum_taxonomy.json"
+
+# Ancestors of a matched topic share this fraction of its score per level.
+_PARENT_ROLLUP = 0.5
+
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize_token(token: str) -> str:
+    """Folds case and simple English plurals so 'Equations' matches 'equation'."""
+    word = token.lower()
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "shes", "ches", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [normalize_token(token) for token in _TOKEN.findall(text)]
+
+
+@dataclass(frozen=True)
+class Topic:
+    id: str
+    label: str
+    subject: str
+    parent: Optional[str] = None
+
+
+class _TrieNode:
+    __slots__ = ("children", "topic_id")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.topic_id: Optional[str] = None
+
+
+class TaxonomyIndex:
+    """Token trie over every topic label and synonym.
+
+    Matching walks the trie from each token position, so cost depends on the
+    message length and the longest phrase, not on the number of topics.
+    """
+
+    def __init__(self, topics: List[Topic], phrases: List[Tuple[str, str]]) -> None:
+        self.topics: Dict[str, Topic] = {topic.id: topic for topic in topics}
+        self._by_label: Dict[str, str] = {topic.label.lower(): topic.id for topic in topics}
+        self._root = _TrieNode()
+        for topic_id, phrase in phrases:
+            tokens = tokenize(phrase)
+            if not tokens:
+                continue
+            node = self._root
+            for token in tokens:
+                child = node.children.get(token)
+                if child is None:
+                    child = _TrieNode()
+                    node.children[token] = child
+                node = child
+            # The first topic to claim a phrase keeps it.
+            if node.topic_id is None:
+                node.topic_id = topic_id
+
+    @classmethod
+    def from_file(cls, path: Path) -> "TaxonomyIndex":
+        with open(path, "r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        topics: List[Topic] = []
+        phrases: List[Tuple[str, str]] = []
+        for item in payload.get("topics", []):
+            topic = Topic(
+                id=item["id"],
+                label=item["label"],
+                subject=item.get("subject", ""),
+                parent=item.get("parent"),
+            )
+            topics.append(topic)
+            phrases.append((topic.id, topic.label))
+            phrases.extend((topic.id, synonym) for synonym in item.get("synonyms", []))
+        return cls(topics, phrases)
+
+    def id_for_label(self, label: str) -> Optional[str]:
+        return self._by_label.get(label.lower())
+
+    def label(self, topic_id: str) -> str:
+        return self.topics[topic_id].label
+
+    def rank(self, text: str, limit: int = 3) -> List[str]:
+        """Returns canonical topic ids ranked by evidence, strongest first."""
+        return [topic_id for topic_id, _ in self.rank_scored(text, limit)]
+
+    def rank_scored(self, text: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """Returns ``(topic_id, evidence)`` pairs ranked strongest first, with parent roll-ups."""
+        tokens = tokenize(text)
+        scores: Dict[str, float] = {}
+        first_seen: Dict[str, int] = {}
+        root = self._root
+        start = 0
+        while start < len(tokens):
+            node = root.children.get(tokens[start])
+            position = start
+            matched: Optional[str] = None
+            matched_length = 0
+            # Keep the longest phrase starting at this token, then skip past it.
+            while node is not None:
+                if node.topic_id is not None:
+                    matched = node.topic_id
+                    matched_length = position - start + 1
+                position += 1
+                if position >= len(tokens):
+                    break
+                node = node.children.get(tokens[position])
+            if matched is None:
+                start += 1
+                continue
+            weight = 1.0 + 0.25 * (matched_length - 1)
+            scores[matched] = scores.get(matched, 0.0) + weight
+            first_seen.setdefault(matched, start)
+            start += matched_length
+
+        for topic_id, score in list(scores.items()):
+            parent = self.topics[topic_id].parent
+            share = score * _PARENT_ROLLUP
+            while parent is not None and parent in self.topics:
+                scores[parent] = scores.get(parent, 0.0) + share
+                first_seen.setdefault(parent, first_seen[topic_id])
+                share *= _PARENT_ROLLUP
+                parent = self.topics[parent].parent
+
+        ranked = sorted(scores, key=lambda topic_id: (-scores[topic_id], first_seen[topic_id]))
+        return [(topic_id, scores[topic_id]) for topic_id in ranked[:limit]]
+
+
+_index: Optional[TaxonomyIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_taxonomy_index() -> TaxonomyIndex:
+    """Loads and compiles the taxonomy once per process on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = Path(os.getenv("AI_ENGINE_TAXONOMY_PATH", "") or DEFAULT_TAXONOMY_PATH)
+                _index = TaxonomyIndex.from_file(path)
+    return _index
@@ -0,0 +1,204 @@
+"""
+Overview: template_catalog.py
+Purpose: Loads response templates keyed by (role, intent, locale, variant) and renders them from compiled segments.
+Notes: The catalog file is compiled once and re-read when its modification time changes; a broken edit keeps the last good catalog.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import string
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .memory import _env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATES_PATH = Path(__file__).with_name("data") / "response_templates.json"
+
+# Role used when a catalog has no entry for the requested role.
+FALLBACK_ROLE = "DEFAULT"
+DEFAULT_VARIANT = "default"
+
+template_locale = os.getenv("AI_ENGINE_TEMPLATE_LOCALE", "").strip() or None
+template_variant = os.getenv("AI_ENGINE_TEMPLATE_VARIANT", "").strip() or DEFAULT_VARIANT
+# How often the catalog file's mtime is checked; 0 disables hot reload.
+template_reload_seconds = _env_int("AI_ENGINE_TEMPLATE_RELOAD_SECONDS", 5)
+
+TemplateKey = Tuple[str, str, str, str]
+ParamValue = Union[str, Sequence[str]]
+
+
+class CatalogError(ValueError):
+    """Raised when a template catalog cannot be parsed or compiled."""
+
+
+class CompiledTemplate:
+    """Template text pre-split into literal and field segments."""
+
+    __slots__ = ("key", "segments", "defaults")
+
+    def __init__(self, key: TemplateKey, text: str, defaults: Dict[str, str]) -> None:
+        segments: List[Tuple[str, Optional[str]]] = []
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError as exc:
+            raise CatalogError(f"Template {key} is malformed: {exc}") from exc
+        for literal, field_name, format_spec, conversion in parsed:
+            if field_name is not None and (not field_name.isidentifier() or format_spec or conversion):
+                raise CatalogError(f"Template {key} may only use plain {{name}} fields.")
+            segments.append((literal, field_name))
+        self.key = key
+        self.segments = tuple(segments)
+        self.defaults = dict(defaults)
+
+    def render(self, params: Dict[str, ParamValue]) -> str:
+        parts: List[str] = []
+        for literal, field_name in self.segments:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            value = params.get(field_name)
+            if isinstance(value, (list, tuple)):
+                # Sequence parameters render as numbered lines.
+                value = "\n".join(f"{index + 1}. {item}" for index, item in enumerate(value))
+            parts.append(value or self.defaults.get(field_name, ""))
+        return "".join(parts)
+
+
+class TemplateCatalog:
+    """Immutable set of compiled templates with a resolved-key cache for fallbacks."""
+
+    def __init__(self, templates: Dict[TemplateKey, CompiledTemplate], default_locale: str) -> None:
+        self.templates = templates
+        self.default_locale = default_locale
+        self._resolved: Dict[TemplateKey, CompiledTemplate] = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "TemplateCatalog":
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CatalogError(f"Cannot read template catalog {path}: {exc}") from exc
+        default_locale = payload.get("defaultLocale", "en")
+        templates: Dict[TemplateKey, CompiledTemplate] = {}
+        for item in payload.get("templates", []):
+            try:
+                key = (
+                    item["role"],
+                    item["intent"],
+                    item.get("locale", default_locale),
+                    item.get("variant", DEFAULT_VARIANT),
+                )
+                templates[key] = CompiledTemplate(key, item["text"], item.get("defaults", {}))
+            except KeyError as exc:
+                raise CatalogError(f"Template entry is missing {exc}.") from exc
+        return cls(templates, default_locale)
+
+    def resolve(self, role: str, intent: str, locale: Optional[str], variant: Optional[str]) -> CompiledTemplate:
+        """Finds the closest template, relaxing variant, then locale, then role."""
+        requested = (role, intent, locale or self.default_locale, variant or DEFAULT_VARIANT)
+        template = self._resolved.get(requested)
+        if template is not None:
+            return template
+        _, _, want_locale, want_variant = requested
+        for candidate_role in (role, FALLBACK_ROLE):
+            for candidate_locale in (want_locale, self.default_locale):
+                for candidate_variant in (want_variant, DEFAULT_VARIANT):
+                    template = self.templates.get((candidate_role, intent, candidate_locale, candidate_variant))
+                    if template is not None:
+                        # Racing threads store the same value, so no lock is needed.
+                        self._resolved[requested] = template
+                        return template
+        raise KeyError(f"No template for {requested}.")
+
+
+_catalog: Optional[TemplateCatalog] = None
+_catalog_mtime: Optional[float] = None
+_next_check = 0.0
+_catalog_lock = threading.Lock()
+reloads_total = 0
+
+
+def _catalog_path() -> Path:
+    return Path(os.getenv("AI_ENGINE_TEMPLATE_PATH", "") or DEFAULT_TEMPLATES_PATH)
+
+
+def _mtime(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _load_locked(force: bool) -> TemplateCatalog:
+    global _catalog, _catalog_mtime, reloads_total
+    path = _catalog_path()
+    mtime = _mtime(path)
+    if _catalog is not None and not force and mtime == _catalog_mtime:
+        return _catalog
+    try:
+        catalog = TemplateCatalog.from_file(path)
+    except CatalogError:
+        if _catalog is None:
+            raise
+        logger.warning("template_catalog_reload_failed", exc_info=True)
+        # Remember the broken mtime so it is not re-parsed on every check.
+        _catalog_mtime = mtime
+        return _catalog
+    if _catalog is not None:
+        reloads_total += 1
+        logger.info("template_catalog_reloaded", extra={"templates": len(catalog.templates)})
+    _catalog = catalog
+    _catalog_mtime = mtime
+    return catalog
+
+
+def get_catalog() -> TemplateCatalog:
+    """Returns the compiled catalog, reloading it if the file changed since the last check."""
+    global _next_check
+    now = time.monotonic()
+    catalog = _catalog
+    if catalog is not None and (template_reload_seconds <= 0 or now < _next_check):
+        return catalog
+    with _catalog_lock:
+        if _catalog is not None and (template_reload_seconds <= 0 or now < _next_check):
+            return _catalog
+        _next_check = now + template_reload_seconds
+        return _load_locked(force=False)
+
+
+def reload_catalog() -> TemplateCatalog:
+    """Re-reads the catalog file now, whatever the polling interval."""
+    with _catalog_lock:
+        return _load_locked(force=True)
+
+
+def render(
+    role: str,
+    intent: str,
+    params: Optional[Dict[str, ParamValue]] = None,
+    locale: Optional[str] = None,
+    variant: Optional[str] = None,
+) -> str:
+    """Renders a template with ``params``.
+
+    Values are strings or lists of strings; lists render as numbered lines.
+    Only the compiled template is cached: rendered text depends on per-request
+    values such as the generated questions, so it is formatted on every call.
+    """
+    template = get_catalog().resolve(role, intent, locale or template_locale, variant or template_variant)
+    return template.render(params or {})
+
+
+def stats() -> Dict[str, int]:
+    return {
+        "templates": len(_catalog.templates) if _catalog is not None else 0,
+        "reloadsTotal": reloads_total,
+    }
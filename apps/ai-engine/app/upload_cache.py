@@ -0,0 +1,223 @@
+"""
+Overview: upload_cache.py
+Purpose: Content-addressed cache of upload analysis results so repeated uploads skip analysis.
+Notes: Keys combine a digest of the decoded bytes with the analyzer version; an optional disk tier survives restarts.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .handwriting_metrics import ANALYZER_VERSION, HandwritingMetrics
+from .memory import _env_int
+from .models import HandwritingFeedback
+
+logger = logging.getLogger(__name__)
+
+# Rough resident size of one cached record, used for the byte bound.
+_ENTRY_OVERHEAD_BYTES = 1_200
+# The disk tier is pruned back to its bound every this many writes, on a background thread.
+_DISK_PRUNE_INTERVAL = 256
+
+
+def content_key(data: bytes, analyzer_version: str = ANALYZER_VERSION) -> str:
+    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+    return f"{analyzer_version}:{digest}"
+
+
+@dataclass(frozen=True)
+class CachedAnalysis:
+    """Analysis of one upload; ``metrics`` is None when the page had no readable text."""
+
+    metrics: Optional[HandwritingMetrics]
+    feedback: Optional[HandwritingFeedback]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "metrics": self.metrics.as_dict() if self.metrics is not None else None,
+            "feedback": self.feedback.model_dump() if self.feedback is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "CachedAnalysis":
+        metrics = payload.get("metrics")
+        feedback = payload.get("feedback")
+        return cls(
+            metrics=HandwritingMetrics(**metrics) if metrics is not None else None,
+            feedback=HandwritingFeedback(**feedback) if feedback is not None else None,
+        )
+
+
+def _record_bytes(record: CachedAnalysis) -> int:
+    size = _ENTRY_OVERHEAD_BYTES
+    if record.feedback is not None:
+        feedback = record.feedback
+        size += len(feedback.legibility) + len(feedback.lineConsistency)
+        size += len(feedback.characterSpacing) + len(feedback.meaningImpact)
+        size += sum(len(text) for text in feedback.suggestions)
+    return size
+
+
+class UploadAnalysisCache:
+    """Bounded LRU of analysis results with an optional on-disk second tier."""
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        disk_dir: str | None = None,
+        disk_max_entries: int | None = None,
+    ) -> None:
+        self.max_entries = (
+            max_entries if max_entries is not None else _env_int("AI_ENGINE_UPLOAD_CACHE_MAX_ENTRIES", 10_000)
+        )
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else _env_int("AI_ENGINE_UPLOAD_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        )
+        directory = disk_dir if disk_dir is not None else os.getenv("AI_ENGINE_UPLOAD_CACHE_DIR", "")
+        self.disk_dir: Optional[Path] = Path(directory) if directory else None
+        self.disk_max_entries = (
+            disk_max_entries
+            if disk_max_entries is not None
+            else _env_int("AI_ENGINE_UPLOAD_CACHE_DISK_MAX_ENTRIES", 200_000)
+        )
+        self._entries: "OrderedDict[str, tuple[CachedAnalysis, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self._pruning = False
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CachedAnalysis]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries.move_to_end(key)
+                self.hits_memory += 1
+                return item[0]
+        record = self._read_disk(key)
+        with self._lock:
+            if record is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+            self._insert(key, record)
+        return record
+
+    def put(self, key: str, record: CachedAnalysis) -> None:
+        with self._lock:
+            self._insert(key, record)
+        self._write_disk(key, record)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "approxBytes": self._bytes,
+                "hitsMemory": self.hits_memory,
+                "hitsDisk": self.hits_disk,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _insert(self, key: str, record: CachedAnalysis) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
+        size = _record_bytes(record)
+        self._entries[key] = (record, size)
+        self._bytes += size
+        while self._entries and (
+            (self.max_entries > 0 and len(self._entries) > self.max_entries)
+            or (self.max_bytes > 0 and self._bytes > self.max_bytes)
+        ):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.disk_dir is None:
+            return None
+        version, _, digest = key.partition(":")
+        return self.disk_dir / version / digest[:2] / f"{digest}.json"
+
+    def _read_disk(self, key: str) -> Optional[CachedAnalysis]:
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                return CachedAnalysis.from_dict(json.load(handle))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError):
+            logger.warning("upload_cache_disk_read_failed", extra={"key": key})
+            return None
+
+    def _write_disk(self, key: str, record: CachedAnalysis) -> None:
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file.
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=path.parent, delete=False, suffix=".tmp"
+            ) as handle:
+                json.dump(record.to_dict(), handle, separators=(",", ":"))
+            os.replace(handle.name, path)
+        except OSError:
+            logger.warning("upload_cache_disk_write_failed", extra={"key": key})
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % _DISK_PRUNE_INTERVAL == 0 and not self._pruning
+            if prune:
+                self._pruning = True
+        if prune:
+            # Walking the tier costs one stat per file, so requests never wait for it.
+            threading.Thread(target=self._prune_in_background, name="eduvane-upload-cache-prune", daemon=True).start()
+
+    def _prune_in_background(self) -> None:
+        try:
+            self._prune_disk()
+        except OSError:
+            logger.warning("upload_cache_disk_prune_failed", exc_info=True)
+        finally:
+            with self._lock:
+                self._pruning = False
+
+    def _prune_disk(self) -> None:
+        if self.disk_dir is None or self.disk_max_entries <= 0:
+            return
+        files = []
+        for entry in self.disk_dir.glob("*/*/*.json"):
+            try:
+                files.append((entry.stat().st_mtime, entry))
+            except OSError:
+                # Another worker pruned or replaced it since the listing.
+                continue
+        excess = len(files) - self.disk_max_entries
+        if excess <= 0:
+            return
+        files.sort()
+        for _, entry in files[:excess]:
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+
+
+upload_cache = UploadAnalysisCache()
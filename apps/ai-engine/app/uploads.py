@@ -0,0 +1,249 @@
+"""
+Overview: uploads.py
+Purpose: Gives orchestration lazy access to upload bytes from inline base64 or streamed multipart bodies.
+Notes: Bytes are decoded only when a stage reads them; multipart bodies are spooled with size limits enforced while streaming.
+"""
+
+from __future__ import annotations
+
+import base64
+import tempfile
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from .memory import _env_int
+from .models import AIEngineRequest, UploadArtifact
+
+upload_max_bytes = _env_int("AI_ENGINE_UPLOAD_MAX_BYTES", 25 * 1024 * 1024)
+upload_total_max_bytes = _env_int("AI_ENGINE_UPLOAD_TOTAL_MAX_BYTES", 64 * 1024 * 1024)
+upload_max_files = _env_int("AI_ENGINE_UPLOAD_MAX_FILES", 20)
+# Multipart bodies stay in memory up to this size, then spill to a temp file.
+upload_spool_bytes = _env_int("AI_ENGINE_UPLOAD_SPOOL_BYTES", 1024 * 1024)
+
+_REQUEST_PART_MAX_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size or count limits."""
+
+
+class InvalidUpload(ValueError):
+    """Raised when a multipart body cannot be interpreted as an engine request."""
+
+
+class UploadSource(ABC):
+    """One uploaded file whose bytes are materialized only on demand."""
+
+    __slots__ = ("file_name", "mime_type")
+
+    def __init__(self, file_name: str, mime_type: str) -> None:
+        self.file_name = file_name
+        self.mime_type = mime_type
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.mime_type.lower() == "application/pdf"
+
+    @property
+    @abstractmethod
+    def size(self) -> int:
+        """Decoded size in bytes, known without reading the upload."""
+
+    @abstractmethod
+    def read(self) -> bytes:
+        """Returns the decoded bytes."""
+
+    def close(self) -> None:
+        """Releases any spooled storage held by the upload."""
+
+
+class InlineUpload(UploadSource):
+    """Upload carried as base64 in the JSON contract; decoded on first read."""
+
+    __slots__ = ("_encoded",)
+
+    def __init__(self, artifact: UploadArtifact) -> None:
+        super().__init__(artifact.fileName, artifact.mimeType)
+        self._encoded = artifact.base64Data
+
+    @property
+    def size(self) -> int:
+        # Decoded size without decoding: 3 bytes per 4 characters, minus padding.
+        encoded = self._encoded
+        return len(encoded) * 3 // 4 - encoded[-2:].count("=")
+
+    def read(self) -> bytes:
+        return base64.b64decode(self._encoded)
+
+
+class SpooledUpload(UploadSource):
+    """Upload streamed from a multipart body into a spooled temporary file."""
+
+    __slots__ = ("_file", "_size")
+
+    def __init__(self, file_name: str, mime_type: str) -> None:
+        super().__init__(file_name, mime_type)
+        self._file = tempfile.SpooledTemporaryFile(max_size=upload_spool_bytes)
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._size += len(data)
+
+    def read(self) -> bytes:
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BufferedUpload(UploadSource):
+    """Upload whose bytes are already in memory, such as one forwarded to a shard worker."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, file_name: str, mime_type: str, data: bytes) -> None:
+        super().__init__(file_name, mime_type)
+        self._data = data
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    def read(self) -> bytes:
+        return self._data
+
+
+def _check_limits(sources: Sequence[UploadSource]) -> None:
+    if upload_max_files > 0 and len(sources) > upload_max_files:
+        raise UploadTooLarge(f"At most {upload_max_files} uploads are accepted per request.")
+    total = 0
+    for source in sources:
+        if upload_max_bytes > 0 and source.size > upload_max_bytes:
+            raise UploadTooLarge(f"Upload {source.file_name} exceeds {upload_max_bytes} bytes.")
+        total += source.size
+    if upload_total_max_bytes > 0 and total > upload_total_max_bytes:
+        raise UploadTooLarge(f"Uploads exceed {upload_total_max_bytes} bytes in total.")
+
+
+def sources_from_request(request: AIEngineRequest) -> List[UploadSource]:
+    """Wraps inline JSON uploads without decoding them."""
+    sources: List[UploadSource] = [InlineUpload(artifact) for artifact in request.uploads]
+    _check_limits(sources)
+    return sources
+
+
+def close_sources(sources: Sequence[UploadSource]) -> None:
+    for source in sources:
+        source.close()
+
+
+def _disposition(headers: dict) -> Tuple[str, Optional[str]]:
+    _, params = parse_options_header(headers.get(b"content-disposition", b""))
+    name = params.get(b"name", b"").decode("utf-8", "replace")
+    file_name = params.get(b"filename")
+    return name, file_name.decode("utf-8", "replace") if file_name is not None else None
+
+
+async def read_multipart_request(request: Request) -> Tuple[AIEngineRequest, List[UploadSource]]:
+    """Parses a multipart engine request while streaming the body.
+
+    The ``request`` part carries the JSON request (its ``uploads`` may be empty);
+    every part with a filename becomes a spooled upload. Limits are enforced as
+    bytes arrive, so oversized bodies are rejected without being buffered.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidUpload("Expected a multipart/form-data body.")
+
+    spooled: List[SpooledUpload] = []
+    request_part = bytearray()
+    total = 0
+    header_field = bytearray()
+    header_value = bytearray()
+    headers: dict = {}
+    target: dict = {"kind": None, "upload": None}
+
+    def on_part_begin() -> None:
+        headers.clear()
+        target["kind"] = None
+        target["upload"] = None
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        name, file_name = _disposition(headers)
+        if file_name is not None:
+            if upload_max_files > 0 and len(spooled) >= upload_max_files:
+                raise UploadTooLarge(f"At most {upload_max_files} uploads are accepted per request.")
+            mime_type = headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+            upload = SpooledUpload(file_name, mime_type)
+            spooled.append(upload)
+            target["kind"] = "upload"
+            target["upload"] = upload
+        elif name == "request":
+            target["kind"] = "request"
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        nonlocal total
+        chunk = data[start:end]
+        if target["kind"] == "upload":
+            upload: SpooledUpload = target["upload"]
+            if upload_max_bytes > 0 and upload.size + len(chunk) > upload_max_bytes:
+                raise UploadTooLarge(f"Upload {upload.file_name} exceeds {upload_max_bytes} bytes.")
+            total += len(chunk)
+            if upload_total_max_bytes > 0 and total > upload_total_max_bytes:
+                raise UploadTooLarge(f"Uploads exceed {upload_total_max_bytes} bytes in total.")
+            upload.write(chunk)
+        elif target["kind"] == "request":
+            if len(request_part) + len(chunk) > _REQUEST_PART_MAX_BYTES:
+                raise UploadTooLarge("The request part is too large.")
+            request_part.extend(chunk)
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+        },
+    )
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+            parser.finalize()
+        except MultipartParseError as exc:
+            raise InvalidUpload("Malformed multipart body.") from exc
+        if not request_part:
+            raise InvalidUpload("Missing the 'request' part.")
+        engine_request = AIEngineRequest.model_validate_json(bytes(request_part))
+        sources: List[UploadSource] = [InlineUpload(artifact) for artifact in engine_request.uploads]
+        sources.extend(spooled)
+        _check_limits(sources)
+    except Exception:
+        close_sources(spooled)
+        raise
+    return engine_request, sources
@@ -0,0 +1,5 @@
+"""
+Overview: __init__.py
+Purpose: Marks the AI engine benchmark scripts as a runnable package.
+Notes: Keep scripts self-contained and runnable with `python -m benchmarks.<name>`.
+"""
@@ -0,0 +1,100 @@
+"""
+Overview: admission_overload.py
+Purpose: Offers traffic above capacity and compares latency with and without the admission queue.
+Notes: Run with `python -m benchmarks.admission_overload [overload_factor] [seconds]`; limits are set on the live controller.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "bench-secret")
+
+from app.admission import admission  # noqa: E402
+from app.main import app  # noqa: E402
+
+from .asgi_client import call  # noqa: E402
+
+MESSAGE = "please review my algebra attempt on fractions, ratios and linear equations " * 4
+
+
+HEADERS = [("content-type", "application/json"), ("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"])]
+# Arrivals are released in small groups at this interval to approximate open-loop traffic.
+TICK_SECONDS = 0.005
+
+
+async def _one(index: int, scheduled: Optional[float] = None) -> tuple[float, int, dict]:
+    payload = {"userId": "bench", "role": "STUDENT", "sessionId": f"overload-{index % 500}", "message": MESSAGE}
+    # Timing from the scheduled arrival counts time the request spent waiting for the event loop.
+    started = time.perf_counter() if scheduled is None else scheduled
+    status, response_headers, _ = await call(app, "POST", "/v1/intelligence/respond", json.dumps(payload).encode(), HEADERS)
+    return time.perf_counter() - started, status, {key.decode(): value.decode() for key, value in response_headers}
+
+
+async def _capacity(samples: int = 300) -> float:
+    """Sequential requests per second, which the open-loop run then exceeds."""
+    started = time.perf_counter()
+    for index in range(samples):
+        await _one(index)
+    return samples / (time.perf_counter() - started)
+
+
+async def _open_loop(rate: float, seconds: float) -> tuple[list[float], list[tuple[int, dict]]]:
+    tasks = []
+    per_tick = rate * TICK_SECONDS
+    owed = 0.0
+    started = time.perf_counter()
+    tick = 0
+    while tick * TICK_SECONDS < seconds:
+        scheduled = started + tick * TICK_SECONDS
+        owed += per_tick
+        while owed >= 1:
+            owed -= 1
+            tasks.append(asyncio.ensure_future(_one(len(tasks), scheduled)))
+        tick += 1
+        await asyncio.sleep(max(0.0, started + tick * TICK_SECONDS - time.perf_counter()))
+    results = await asyncio.gather(*tasks)
+    latencies = sorted(elapsed for elapsed, status, _ in results if status == 200)
+    rejected = [(status, response_headers) for _, status, response_headers in results if status != 200]
+    return latencies, rejected
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000 if values else 0.0
+
+
+def main() -> int:
+    overload = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    failures = []
+    admission.limit = 0
+    capacity = asyncio.run(_capacity())
+    print(f"capacity ~{capacity:.0f} req/s; offering {overload:.1f}x for {seconds:.0f}s")
+    for label, limit, queue_limit in (("unbounded", 0, 0), ("admission 8+32", 8, 32)):
+        admission.limit, admission.queue_limit, admission._executor = limit, queue_limit, None
+        latencies, rejected = asyncio.run(_open_loop(capacity * overload, seconds))
+        print(
+            f"{label:<15} ok {len(latencies):5d}  rejected {len(rejected):5d}  "
+            f"p50 {_percentile(latencies, 0.5):8.1f} ms  p99 {_percentile(latencies, 0.99):8.1f} ms  "
+            f"max {_percentile(latencies, 1.0):8.1f} ms"
+        )
+        for status, response_headers in rejected:
+            if status != 429 or "retry-after" not in response_headers:
+                failures.append(f"{label}: got {status} without Retry-After")
+                break
+        if admission.in_flight or admission.queued:
+            failures.append(f"{label}: {admission.in_flight} in flight and {admission.queued} queued after the burst")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
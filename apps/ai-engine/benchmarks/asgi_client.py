@@ -0,0 +1,76 @@
+"""
+Overview: asgi_client.py
+Purpose: Drives the FastAPI app in-process through raw ASGI calls for benchmarks.
+Notes: Avoids an HTTP client dependency so scripts measure the engine, not the transport.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Iterable, List, Tuple
+
+
+async def call(
+    app: Any,
+    method: str,
+    path: str,
+    body: bytes = b"",
+    headers: Iterable[Tuple[str, str]] = (),
+) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Sends one request through the ASGI app and returns status, headers and body."""
+    finished = asyncio.Event()
+    delivered = False
+
+    async def receive() -> dict:
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    status = 0
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.extend(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": raw_path,
+        "raw_path": raw_path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    await app(scope, receive, send)
+    finished.set()
+    return status, response_headers, b"".join(chunks)
+
+
+async def post_json(app: Any, path: str, payload: Any, headers: Iterable[Tuple[str, str]] = ()) -> Tuple[int, Any]:
+    """Posts a JSON payload and decodes the JSON response body."""
+    status, _, raw = await call(
+        app,
+        "POST",
+        path,
+        json.dumps(payload).encode(),
+        [("content-type", "application/json"), *headers],
+    )
+    return status, json.loads(raw) if raw else None
@@ -0,0 +1,147 @@
+"""
+Overview: attempt_progress.py
+Purpose: Measures attempt comparison cost as attempts accumulate and checks progress reports end to end.
+Notes: Run with `python -m benchmarks.attempt_progress [attempts]`; the rescan baseline re-aggregates every earlier attempt.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "bench-secret")
+
+from app.main import app  # noqa: E402
+from app.memory import AttemptLog, memory, state_from_dict, state_to_dict  # noqa: E402
+from app.progress import METRIC_FIELDS, compare_attempt  # noqa: E402
+from app.session_snapshot import decode_state, encode_state  # noqa: E402
+from app.taxonomy import get_taxonomy_index  # noqa: E402
+
+from .asgi_client import call  # noqa: E402
+from .handwriting_metrics import synthetic_page  # noqa: E402
+
+HEADERS = [("content-type", "application/json"), ("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"])]
+CHECKPOINTS = (10, 100, 1_000, 10_000)
+COMPARISONS = 2_000
+
+
+def _attempt(rng: random.Random, topics: List[str]) -> Tuple[List[Tuple[str, float]], List[float]]:
+    gaps = [(topic_id, rng.choice((0.5, 1.0, 1.25, 2.0))) for topic_id in rng.sample(topics, rng.randint(1, 8))]
+    return gaps, [rng.random() for _ in METRIC_FIELDS]
+
+
+def _rescan(
+    history: Sequence[Tuple[List[Tuple[str, float]], List[float]]],
+    gaps: Sequence[Tuple[str, float]],
+    metrics: Sequence[float],
+) -> Tuple[float, Dict[str, int], List[float]]:
+    """What comparison costs without running totals: every earlier attempt is aggregated again."""
+    hits: Dict[str, int] = {}
+    mass = 0.0
+    totals = [0.0] * len(metrics)
+    for earlier, earlier_metrics in history:
+        for topic_id, score in earlier:
+            hits[topic_id] = hits.get(topic_id, 0) + 1
+            mass += score
+        for position, value in enumerate(earlier_metrics):
+            totals[position] += value
+    return sum(score for _, score in gaps) - mass / len(history), hits, totals
+
+
+def _scaling(attempts: int) -> List[str]:
+    failures = []
+    rng = random.Random(7)
+    topics = list(get_taxonomy_index().topics)
+    log = AttemptLog(capacity=20)
+    history: List[Tuple[List[Tuple[str, float]], List[float]]] = []
+    probes = [_attempt(rng, topics) for _ in range(COMPARISONS)]
+    for checkpoint in (point for point in CHECKPOINTS if point <= attempts):
+        while log.count < checkpoint:
+            gaps, metrics = _attempt(rng, topics)
+            log.append(gaps, metrics)
+            history.append((gaps, metrics))
+        started = time.perf_counter()
+        for gaps, metrics in probes:
+            compare_attempt(log, gaps, metrics)
+        incremental = (time.perf_counter() - started) / len(probes)
+        rounds = max(1, COMPARISONS // checkpoint)
+        started = time.perf_counter()
+        for gaps, metrics in probes[:rounds]:
+            expected_vs_average, hits, totals = _rescan(history, gaps, metrics)
+        rescan = (time.perf_counter() - started) / rounds
+        report = compare_attempt(log, *probes[rounds - 1])
+        print(
+            f"{checkpoint:6d} earlier attempts  compare {incremental * 1e6:7.1f} us  "
+            f"rescan {rescan * 1e6:10.1f} us  ({rescan / incremental:7.1f}x)"
+        )
+        # The running totals must equal a full re-aggregation, even after the ring evicted old attempts.
+        if hits != log.gap_hits or any(abs(a - b) > 1e-3 * max(1.0, abs(b)) for a, b in zip(log.metric_totals, totals)):
+            failures.append(f"{checkpoint} attempts: running totals differ from a rescan")
+        if abs(report.gapLoadVsAverage - round(expected_vs_average, 4)) > 1e-3:
+            failures.append(f"{checkpoint} attempts: gapLoadVsAverage {report.gapLoadVsAverage}, rescan {expected_vs_average:.4f}")
+    if len(log) != 20:
+        failures.append(f"attempt ring holds {len(log)} attempts, expected 20")
+    return failures
+
+
+async def _respond(session_id: str, message: str, page: Optional[bytes]) -> dict:
+    payload = {"userId": "bench", "role": "STUDENT", "sessionId": session_id, "message": message}
+    if page is not None:
+        payload["uploads"] = [
+            {"fileName": "page.png", "mimeType": "image/png", "base64Data": base64.b64encode(page).decode("ascii")}
+        ]
+    status, _, raw = await call(app, "POST", "/v1/intelligence/respond", json.dumps(payload).encode(), HEADERS)
+    if status != 200:
+        raise RuntimeError(f"respond returned {status}: {raw[:200]!r}")
+    return json.loads(raw)
+
+
+async def _end_to_end() -> List[str]:
+    failures = []
+    session_id = "progress-e2e"
+    messy, clean = synthetic_page(1, messy=True), synthetic_page(2, messy=False)
+    first = await _respond(session_id, "please review my fractions and linear equations attempt", messy)
+    second = await _respond(session_id, "here is my next attempt on linear equations", clean)
+    third = await _respond(session_id, "review my linear equations again", clean)
+    report = second.get("progress")
+    if first.get("progress") is not None:
+        failures.append("a first attempt reported progress")
+    if report is None or report["attempt"] != 2:
+        failures.append(f"second attempt reported {report}")
+    else:
+        if "fractions" not in report["resolvedGaps"] or "linear equations" not in report["persistentGaps"]:
+            failures.append(f"second attempt gaps: {report}")
+        if not report["handwritingChange"] or report["handwritingChange"]["legibility"] == 0:
+            failures.append("second attempt did not compare handwriting metrics")
+        text = second["responseText"]
+        print(f"second attempt: {text[text.find('Since the last attempt'):]}")
+    if "linear equations" not in (third.get("progress") or {}).get("recurringGaps", []):
+        failures.append(f"third attempt recurring gaps: {third.get('progress')}")
+
+    state = memory.peek(session_id)
+    payload = state_to_dict(state)
+    if state_to_dict(state_from_dict(payload)) != payload:
+        failures.append("attempt log did not round-trip through state_to_dict")
+    if state_to_dict(decode_state(memoryview(encode_state(state)))) != payload:
+        failures.append("attempt log did not round-trip through the snapshot encoding")
+    return failures
+
+
+def main() -> int:
+    attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    failures = _scaling(attempts)
+    failures += asyncio.run(_end_to_end())
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
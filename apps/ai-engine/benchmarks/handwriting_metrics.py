@@ -0,0 +1,90 @@
+"""
+Overview: handwriting_metrics.py
+Purpose: Reports handwriting metric throughput in pages per second per core, in-process and through the pool.
+Notes: Run with `python -m benchmarks.handwriting_metrics [pages]`; pages are synthetic handwriting-like scans.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from app import handwriting
+from app.handwriting_metrics import compute_metrics
+from app.uploads import UploadSource
+
+
+def synthetic_page(seed: int, messy: bool, width: int = 1654, height: int = 2339) -> bytes:
+    """Draws an A4-at-200dpi page of pseudo-handwritten lines of words."""
+    rng = random.Random(seed)
+    image = Image.new("L", (width, height), 245)
+    draw = ImageDraw.Draw(image)
+    line_height = 70
+    for line in range(28):
+        baseline = 150 + line * line_height
+        x = 120
+        tilt = rng.uniform(-0.04, 0.04) if messy else 0.0
+        while x < width - 200:
+            word_width = rng.randint(60, 220)
+            for letter_x in range(x, x + word_width, 18):
+                wobble = rng.randint(-14, 14) if messy else rng.randint(-2, 2)
+                y = baseline + wobble + tilt * (letter_x - 120)
+                draw.line((letter_x, y, letter_x + 12, y - rng.randint(20, 34)), fill=30, width=4)
+                draw.ellipse((letter_x, y - 16, letter_x + 14, y), outline=30, width=3)
+            gap = rng.randint(8, 90) if messy else rng.randint(34, 44)
+            x += word_width + gap
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class _BytesUpload(UploadSource):
+    __slots__ = ("_data",)
+
+    def __init__(self, data: bytes) -> None:
+        super().__init__("page.png", "image/png")
+        self._data = data
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    def read(self) -> bytes:
+        return self._data
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    pages = [synthetic_page(seed, messy=seed % 2 == 1) for seed in range(count)]
+    print(f"{count} synthetic pages, {sum(map(len, pages)) / count / 1024:.0f} KiB PNG each")
+
+    print(" neat page:", compute_metrics(pages[0]))
+    print(" messy page:", compute_metrics(pages[1]))
+
+    started = time.perf_counter()
+    for data in pages:
+        compute_metrics(data)
+    elapsed = time.perf_counter() - started
+    print(f" in-process: {count / elapsed:.1f} pages/s on 1 core")
+
+    workers = handwriting.handwriting_workers
+    handwriting.measure_uploads([_BytesUpload(pages[0])])  # warm up spawned workers
+    started = time.perf_counter()
+    futures = [handwriting._executor().submit(compute_metrics, data) for data in pages]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - started
+    cores = min(workers, os.cpu_count() or 1)
+    print(
+        f" process pool ({workers} workers, {cores} cores): {count / elapsed:.1f} pages/s, "
+        f"{count / elapsed / cores:.1f} pages/s per core"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Overview: history_sync.py
+Purpose: Compares request size and respond latency for resent history versus the history delta protocol.
+Notes: Run with `python -m benchmarks.history_sync [exchanges]`; a small in-file gateway keeps the transcript and cursor.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Optional
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "bench-secret")
+
+from app.main import app  # noqa: E402
+from app.memory import TURN_LIMIT, TurnHistory, memory  # noqa: E402
+
+from .asgi_client import call  # noqa: E402
+
+HEADERS = [("content-type", "application/json"), ("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"])]
+LEGACY_TURNS = 12
+
+
+class _Gateway:
+    """Mirrors the gateway: keeps the transcript, shapes requests and tracks the engine's cursor."""
+
+    def __init__(self, session_id: str, protocol: int) -> None:
+        self.session_id = session_id
+        self.protocol = protocol
+        self.transcript: list[dict] = []
+        self.cursor: Optional[int] = None
+
+    def body(self, message: str) -> bytes:
+        payload = {"userId": "bench", "role": "STUDENT", "sessionId": self.session_id, "message": message}
+        if self.protocol == 0:
+            payload["history"] = self.transcript[-LEGACY_TURNS:]
+        else:
+            length = len(self.transcript)
+            base = max(0, length - TURN_LIMIT) if self.cursor is None else min(self.cursor, length)
+            payload.update(history=self.transcript[base:], historyProtocol=1, historyBase=base)
+        return json.dumps(payload).encode()
+
+    async def exchange(self, message: str) -> tuple[float, int, dict]:
+        body = self.body(message)
+        started = time.perf_counter()
+        status, _, raw = await call(app, "POST", "/v1/intelligence/respond", body, HEADERS)
+        elapsed = time.perf_counter() - started
+        if status != 200:
+            raise RuntimeError(f"respond returned {status}: {raw[:200]!r}")
+        response = json.loads(raw)
+        self.cursor = response.get("historyCursor")
+        now = "2026-01-01T00:00:00Z"
+        self.transcript.append({"role": "user", "content": message, "timestamp": now})
+        self.transcript.append({"role": "assistant", "content": response["responseText"], "timestamp": now})
+        return elapsed, len(body), response
+
+
+def _message(index: int) -> str:
+    return f"please review attempt {index} of my fractions and linear equations homework and explain each step"
+
+
+async def _run(exchanges: int) -> list[str]:
+    failures = []
+    for protocol, label in ((0, "resend last 12"), (1, "delta protocol")):
+        gateway = _Gateway(f"history-{protocol}", protocol)
+        latencies, sizes = [], []
+        for index in range(exchanges):
+            elapsed, size, response = await gateway.exchange(_message(index))
+            latencies.append(elapsed)
+            sizes.append(size)
+            if protocol == 1 and response.get("historyCursor") != len(gateway.transcript):
+                failures.append(f"exchange {index}: cursor {response.get('historyCursor')}, transcript {len(gateway.transcript)}")
+                break
+        tail = sorted(latencies[exchanges // 2 :])
+        print(
+            f"{label:<15} body {statistics.mean(sizes[exchanges // 2 :]):7.0f} B  "
+            f"respond p50 {statistics.median(tail) * 1e6:7.1f} us  p99 {tail[int(len(tail) * 0.99)] * 1e6:7.1f} us"
+        )
+
+    # An engine that lost the session answers null, and the gateway's next window rebuilds it.
+    gateway = _Gateway("history-restart", 1)
+    for index in range(30):
+        await gateway.exchange(_message(index))
+    # Reset in place rather than discard, so durable backends cannot reload the session.
+    with memory.session(gateway.session_id) as state:
+        state.turns = TurnHistory()
+        state.history_cursor = None
+    _, _, response = await gateway.exchange("after restart, with only a cursor")
+    if response.get("historyCursor") is not None:
+        failures.append("an engine without the session did not ask for a resync")
+    _, size, response = await gateway.exchange("first request after resync")
+    turns = [turn["content"] for turn in memory.peek(gateway.session_id).turns]
+    expected = [turn["content"] for turn in gateway.transcript[-TURN_LIMIT:]]
+    if response.get("historyCursor") != len(gateway.transcript):
+        failures.append(f"resync left cursor {response.get('historyCursor')} for a {len(gateway.transcript)}-turn transcript")
+    # The engine stores its own assistant text, which this gateway also saves verbatim.
+    if turns != expected:
+        failures.append("resynced session turns do not match the transcript tail")
+    print(f"resync window   body {size:7d} B  ({len(expected)} turns, once per lost session)")
+    return failures
+
+
+def main() -> int:
+    exchanges = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    failures = asyncio.run(_run(exchanges))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Overview: idempotent_replay.py
+Purpose: Compares fresh respond calls with Idempotency-Key replays and checks duplicates never write memory twice.
+Notes: Run with `python -m benchmarks.idempotent_replay [calls]`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "bench-secret")
+
+from app.main import app  # noqa: E402
+from app.memory import memory  # noqa: E402
+
+from .asgi_client import call  # noqa: E402
+
+MESSAGE = "please review my algebra attempt on fractions and give me practice questions"
+DUPLICATES = 8
+
+
+def _body(session_id: str) -> bytes:
+    return json.dumps({"userId": "bench", "role": "STUDENT", "sessionId": session_id, "message": MESSAGE}).encode()
+
+
+def _headers(key: str) -> list[tuple[str, str]]:
+    return [
+        ("content-type", "application/json"),
+        ("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"]),
+        ("idempotency-key", key),
+    ]
+
+
+async def _timed(body: bytes, key: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    status, _, _ = await call(app, "POST", "/v1/intelligence/respond", body, _headers(key))
+    return time.perf_counter() - started, status
+
+
+async def _run(calls: int) -> list[str]:
+    failures = []
+    fresh, replay = [], []
+    for index in range(calls):
+        body = _body(f"replay-{index}")
+        elapsed, status = await _timed(body, f"key-{index}")
+        fresh.append(elapsed)
+        elapsed, replay_status = await _timed(body, f"key-{index}")
+        replay.append(elapsed)
+        if status != 200 or replay_status != 200:
+            failures.append(f"call {index}: statuses {status}/{replay_status}")
+            break
+
+    # Duplicates fired together, as a gateway retrying on timeout would, must run once.
+    for index in range(min(calls, 50)):
+        session_id = f"burst-{index}"
+        await asyncio.gather(*(_timed(_body(session_id), "burst") for _ in range(DUPLICATES)))
+        turns = len(memory.peek(session_id).turns)
+        if turns != 2:
+            failures.append(f"{session_id}: {turns} turns after {DUPLICATES} duplicates, expected 2")
+            break
+
+    print(f"fresh   p50 {statistics.median(fresh) * 1e6:8.1f} us")
+    print(f"replay  p50 {statistics.median(replay) * 1e6:8.1f} us")
+    return failures
+
+
+def main() -> int:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    failures = asyncio.run(_run(calls))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Overview: intent_classifier.py
+Purpose: Compares the compiled intent classifier with the original per-hint substring scan.
+Notes: Run with `python -m benchmarks.intent_classifier`; reports microseconds per call.
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+from app.intent import ANALYSIS_HINTS, INTENT_HINTS, QUESTION_HINTS, IntentClassifier
+
+FILLER = (
+    "the student wrote a long explanation about photosynthesis and energy transfer "
+    "in plants and then described how the results changed across each trial "
+)
+
+
+def legacy_detect(text: str, question_hints, analysis_hints) -> str:
+    text = text.lower().strip()
+    if any(token in text for token in question_hints):
+        return "QUESTION_GENERATION"
+    if any(token in text for token in analysis_hints):
+        return "ANALYSIS"
+    return "CONVERSATIONAL"
+
+
+def _message(length: int) -> str:
+    body = (FILLER * (length // len(FILLER) + 1))[:length]
+    # Worst case for the legacy scan: no hint present, so every hint is searched.
+    return body
+
+
+def _large_vocabulary(size: int) -> dict:
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    hints = {intent: dict(phrases) for intent, phrases in INTENT_HINTS.items()}
+    for index in range(size):
+        word = "".join(rng.choice(letters) for _ in range(rng.randint(5, 11)))
+        intent = "QUESTION_GENERATION" if index % 2 else "ANALYSIS"
+        hints[intent][word if index % 3 else f"{word} {word[::-1]}"] = 1.0
+    return hints
+
+
+def _bench(label: str, func, number: int) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    micros = seconds / number * 1e6
+    print(f"  {label:<10} {micros:10.2f} us/call")
+    return micros
+
+
+def main() -> None:
+    for vocabulary_size in (0, 500):
+        hints = _large_vocabulary(vocabulary_size) if vocabulary_size else INTENT_HINTS
+        question_hints = set(hints["QUESTION_GENERATION"]) if vocabulary_size else QUESTION_HINTS
+        analysis_hints = set(hints["ANALYSIS"]) if vocabulary_size else ANALYSIS_HINTS
+        classifier = IntentClassifier(hints)
+        print(f"vocabulary: {len(question_hints) + len(analysis_hints)} phrases")
+        for length in (40, 400, 4_000, 40_000):
+            text = _message(length)
+            number = max(10, 200_000 // length)
+            print(f" message length {length}")
+            legacy = _bench("legacy", lambda: legacy_detect(text, question_hints, analysis_hints), number)
+            compiled = _bench("compiled", lambda: classifier.classify(text), number)
+            print(f"  speedup    {legacy / compiled:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Overview: metrics_overhead.py
+Purpose: Measures the cost of stage instrumentation and the HTTP timing middleware on respond calls.
+Notes: Run with `python -m benchmarks.metrics_overhead [rounds]`; enabled and disabled runs are interleaved to cancel drift.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "bench-secret")
+
+from app import metrics  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import AIEngineRequest  # noqa: E402
+from app.orchestrator import run_orchestration  # noqa: E402
+
+from .asgi_client import post_json  # noqa: E402
+
+MESSAGES = (
+    "please review my algebra attempt",
+    "give me practice questions on fractions",
+    "hello",
+)
+CALLS_PER_ROUND = 300
+
+
+def _direct_round(tag: str) -> float:
+    requests = [
+        AIEngineRequest(userId="bench", role="STUDENT", sessionId=f"direct-{tag}-{index % 30}", message=message)
+        for index, message in enumerate(MESSAGES * (CALLS_PER_ROUND // len(MESSAGES)))
+    ]
+    started = time.perf_counter()
+    for request in requests:
+        run_orchestration(request)
+    return (time.perf_counter() - started) / len(requests)
+
+
+async def _http_round(tag: str) -> float:
+    headers = [("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"])]
+    started = time.perf_counter()
+    for index in range(CALLS_PER_ROUND):
+        payload = {
+            "userId": "bench",
+            "role": "STUDENT",
+            "sessionId": f"http-{tag}-{index % 30}",
+            "message": MESSAGES[index % len(MESSAGES)],
+        }
+        await post_json(app, "/v1/intelligence/respond", payload, headers)
+    return (time.perf_counter() - started) / CALLS_PER_ROUND
+
+
+def main() -> int:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    results = {"direct": {True: [], False: []}, "http": {True: [], False: []}}
+    for round_index in range(rounds):
+        for enabled in (True, False) if round_index % 2 else (False, True):
+            metrics.metrics_enabled = enabled
+            tag = f"{round_index}-{enabled}"
+            results["direct"][enabled].append(_direct_round(tag))
+            results["http"][enabled].append(asyncio.run(_http_round(tag)))
+    metrics.metrics_enabled = True
+
+    for path, samples in results.items():
+        on = statistics.median(samples[True]) * 1e6
+        off = statistics.median(samples[False]) * 1e6
+        print(f"{path:<7} disabled {off:8.1f} us  enabled {on:8.1f} us  overhead {on - off:6.1f} us ({(on - off) / off:+.1%})")
+    print(f"stage series recorded: {len(metrics.stage_seconds._series)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Overview: question_bank.py
+Purpose: Measures question-bank build time and per-request sampling latency for banks of 1k to 1M items.
+Notes: Run with `python -m benchmarks.question_bank [max_items]`; banks are synthetic and written to a temp directory.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from app import session_rng
+from app.memory import SessionState
+from app.question_bank import QuestionBank, build_bank
+
+TOPICS = 20
+DIFFICULTIES = (1, 2, 3)
+AUDIENCES = ("ANY", "ANY", "ANY", "STUDENT", "TEACHER")
+SAMPLES = 2_000
+
+
+def _items(count: int):
+    for index in range(count):
+        yield {
+            "topic": f"topic.{index % TOPICS}",
+            "difficulty": DIFFICULTIES[(index // TOPICS) % len(DIFFICULTIES)],
+            "audience": AUDIENCES[index % len(AUDIENCES)],
+            "text": f"Practice item {index}: solve the problem and explain each step you used.",
+        }
+
+
+def _sample_latency(bank: QuestionBank, sessions: int) -> list[float]:
+    timings = []
+    states = [SessionState() for _ in range(sessions)]
+    for index in range(SAMPLES):
+        session = index % sessions
+        topics = (f"topic.{index % TOPICS}", f"topic.{(index * 7) % TOPICS}")
+        started = time.perf_counter()
+        bank.sample(states[session], f"bench-{session}", topics, "STUDENT", 3)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+def _no_repeat_check(bank: QuestionBank) -> list[str]:
+    """Drains one topic for a single session and checks every item is served exactly once."""
+    failures = []
+    state = SessionState()
+    topic = "topic.0"
+    eligible = sum(
+        size for (bucket_topic, _, audience), size in bank.sizes.items()
+        if bucket_topic == topic and audience in ("ANY", "STUDENT")
+    )
+    served: list[str] = []
+    while True:
+        batch = bank.sample(state, "drain", [topic], "STUDENT", 3)
+        if not batch:
+            break
+        served.extend(batch)
+    if len(served) != eligible:
+        failures.append(f"served {len(served)} of {eligible} eligible items")
+    if len(set(served)) != len(served):
+        failures.append("an item was served twice to one session")
+    return failures
+
+
+def main() -> int:
+    max_items = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    session_rng.configure("deterministic")
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        size = 1_000
+        while size <= max_items:
+            path = os.path.join(directory, f"bank-{size}.sqlite")
+            connection = sqlite3.connect(path, isolation_level=None)
+            started = time.perf_counter()
+            build_bank(connection, _items(size))
+            connection.close()
+            build_seconds = time.perf_counter() - started
+            bank = QuestionBank.open(path)
+            timings = _sample_latency(bank, sessions=50)
+            timings.sort()
+            print(
+                f"{size:>9} items  build {build_seconds:7.2f}s  file {os.path.getsize(path) / 1e6:7.1f} MB  "
+                f"sample p50 {statistics.median(timings):7.1f} us  p99 {timings[int(len(timings) * 0.99)]:7.1f} us"
+            )
+            if size <= 10_000:
+                failures.extend(f"{size} items: {failure}" for failure in _no_repeat_check(bank))
+            size *= 10
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Overview: raw_respond.py
+Purpose: Compares respond and respond:raw latency and peak allocation for small and large request bodies.
+Notes: Run with `python -m benchmarks.raw_respond [rounds]`; routes are interleaved, and a codec-only pass replays a fixed response.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "bench-secret")
+
+import app.main as engine  # noqa: E402
+from app.memory import TURN_LIMIT, memory  # noqa: E402
+from app.models import AIEngineResponse  # noqa: E402
+
+from .asgi_client import call  # noqa: E402
+
+HEADERS = [("content-type", "application/json"), ("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"])]
+ROUTES = (("respond", "/v1/intelligence/respond"), ("respond:raw", "/v1/intelligence/respond:raw"))
+CALLS_PER_ROUND = 200
+SESSIONS = 20
+
+
+def _payload(session_id: str, large: bool) -> bytes:
+    payload = {
+        "userId": "bench",
+        "role": "STUDENT",
+        "sessionId": session_id,
+        "message": "please review my algebra attempt on fractions and linear equations",
+    }
+    if large:
+        # A full engine window of long turns, as the gateway sends after a resync.
+        step = "First isolate x, then divide both sides by the coefficient and check the result. " * 12
+        payload["history"] = [
+            {
+                "role": "user" if index % 2 == 0 else "assistant",
+                "content": f"turn {index}: {step}",
+                "timestamp": "2026-01-01T00:00:00Z",
+            }
+            for index in range(TURN_LIMIT)
+        ]
+    return json.dumps(payload).encode()
+
+
+async def _round(path: str, bodies: list[bytes]) -> float:
+    started = time.perf_counter()
+    for body in bodies:
+        status, _, raw = await call(engine.app, "POST", path, body, HEADERS)
+        if status != 200:
+            raise RuntimeError(f"{path} returned {status}: {raw[:200]!r}")
+    return (time.perf_counter() - started) / len(bodies)
+
+
+async def _peak(path: str, body: bytes) -> int:
+    """Returns the traced peak above the starting level for one warm request."""
+    await call(engine.app, "POST", path, body, HEADERS)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await call(engine.app, "POST", path, body, HEADERS)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+async def _same_response(large: bool) -> bool:
+    """Both routes must return byte-identical bodies for the same request and session state."""
+    bodies = []
+    for _, path in ROUTES:
+        session_id = f"raw-equal-{large}"
+        memory.discard(session_id)
+        _, _, raw = await call(engine.app, "POST", path, _payload(session_id, large), HEADERS)
+        bodies.append(raw)
+    return bodies[0] == bodies[1]
+
+
+async def _compare(label: str, bodies: list[bytes], rounds: int) -> None:
+    samples: dict[str, list[float]] = {name: [] for name, _ in ROUTES}
+    for round_index in range(rounds):
+        for name, path in ROUTES if round_index % 2 else ROUTES[::-1]:
+            samples[name].append(await _round(path, bodies))
+    base = statistics.median(samples["respond"])
+    for name, path in ROUTES:
+        median = statistics.median(samples[name])
+        peak = await _peak(path, bodies[0])
+        print(
+            f"{label:<21} {name:<12} {median * 1e6:8.1f} us/request "
+            f"({median / base - 1:+6.1%})  peak alloc {peak / 1024:7.1f} KiB"
+        )
+
+
+async def _run(rounds: int) -> list[str]:
+    failures = []
+    cases = []
+    for large in (False, True):
+        size = "large" if large else "small"
+        bodies = [_payload(f"raw-{size}-{index % SESSIONS}", large) for index in range(CALLS_PER_ROUND)]
+        cases.append((f"{size} ({len(bodies[0])} B)", bodies))
+        await _compare(f"{size} ({len(bodies[0])} B)", bodies, rounds)
+        if not await _same_response(large):
+            failures.append(f"{size}: respond and respond:raw returned different bodies")
+
+    # Codec only: orchestration returns a stored response, leaving decode, encode and routing.
+    _, _, raw = await call(engine.app, "POST", ROUTES[0][1], cases[1][1][0], HEADERS)
+    stored = AIEngineResponse.model_validate_json(raw)
+
+    async def replay(*_: object) -> AIEngineResponse:
+        return stored
+
+    orchestrate, engine._orchestrate = engine._orchestrate, replay
+    try:
+        for label, bodies in cases:
+            await _compare(f"codec {label.split()[0]}", bodies, rounds)
+    finally:
+        engine._orchestrate = orchestrate
+    return failures
+
+
+def main() -> int:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+    failures = asyncio.run(_run(rounds))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
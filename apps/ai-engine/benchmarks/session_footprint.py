@@ -0,0 +1,79 @@
+"""
+Overview: session_footprint.py
+Purpose: Reports resident bytes per session and turn/phrase append throughput for the in-process session store.
+Notes: Run with `python -m benchmarks.session_footprint [sessions]`; sessions are filled past their turn and phrase limits.
+"""
+
+from __future__ import annotations
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.memory import RECENT_PHRASE_LIMIT, SessionMemory, state_from_dict, state_to_dict
+
+TURNS = 60
+PHRASES = 45
+APPENDS = 200_000
+PHRASE_POOL = [f"Here is a focused next step, variant {index}." for index in range(120)]
+ACTS = ("greeting", "analysis_intro", "next_step", "closing")
+
+
+def _fill(store: SessionMemory, sessions: int) -> None:
+    for index in range(sessions):
+        session_id = f"footprint-{index}"
+        store.set_role(session_id, "STUDENT")
+        store.remember_gaps(session_id, ["algebra.linear_equations", "fractions.equivalence"])
+        for turn in range(TURNS // 2):
+            store.append_turn(session_id, "user", f"please review attempt {turn} for session {index}")
+            store.append_turn(session_id, "assistant", f"Attempt {turn}: isolate x first, then check session {index}.")
+        for phrase in range(PHRASES):
+            store.remember_phrase(session_id, PHRASE_POOL[(index + phrase) % len(PHRASE_POOL)])
+        state = store.get(session_id)
+        for act in ACTS:
+            state.last_structure_by_act[act] = "lead_with_praise"
+
+
+def main() -> int:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    failures = []
+    store = SessionMemory(max_sessions=0, idle_ttl_seconds=0)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    _fill(store, sessions)
+    gc.collect()
+    resident = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{sessions} sessions  {resident / sessions:8.0f} B/session  (estimate {store.stats()['approxBytes'] / sessions:.0f})")
+
+    session_id = "footprint-0"
+    started = time.perf_counter()
+    for index in range(APPENDS):
+        store.append_turn(session_id, "user", "steady state turn")
+    turn_rate = APPENDS / (time.perf_counter() - started)
+    started = time.perf_counter()
+    for index in range(APPENDS):
+        store.remember_phrase(session_id, PHRASE_POOL[index % len(PHRASE_POOL)])
+    phrase_rate = APPENDS / (time.perf_counter() - started)
+    print(f"append_turn {turn_rate:10.0f}/s  remember_phrase {phrase_rate:10.0f}/s  (at capacity)")
+
+    state = store.get("footprint-1")
+    turns = list(state.turns)
+    if len(turns) != 40 or turns[-1]["role"] != "assistant" or not turns[-1]["content"].startswith(f"Attempt {TURNS // 2 - 1}:"):
+        failures.append("turn history did not keep the newest 40 turns in order")
+    phrases = list(state.recent_phrases)
+    if len(phrases) != RECENT_PHRASE_LIMIT or phrases[-1] != PHRASE_POOL[(1 + PHRASES - 1) % len(PHRASE_POOL)]:
+        failures.append("phrase history did not keep the newest phrases in order")
+    if state_to_dict(state_from_dict(state_to_dict(state))) != state_to_dict(state):
+        failures.append("session did not round-trip through state_to_dict")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Overview: session_rng.py
+Purpose: Measures per-draw cost of the session PRNG against SystemRandom and checks variety and reproducibility.
+Notes: Run with `python -m benchmarks.session_rng`; exits non-zero if first picks are skewed or deterministic mode drifts.
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import timeit
+
+from app import session_rng
+from app.memory import SessionState
+
+SESSIONS = 20_000
+OPTIONS = 4
+
+
+def _first_picks(seed: int) -> list:
+    session_rng.configure("session", seed)
+    return [session_rng.draw_below(SessionState(), f"session-{index}", OPTIONS) for index in range(SESSIONS)]
+
+
+def main() -> int:
+    failures = []
+    number = 500_000
+    system = random.SystemRandom()
+    mersenne = random.Random(3)
+    state = SessionState()
+    session_rng.configure("session", 1)
+    timings = {
+        "SystemRandom": min(timeit.repeat(lambda: system.randrange(OPTIONS), number=number, repeat=5)),
+        "Random": min(timeit.repeat(lambda: mersenne.randrange(OPTIONS), number=number, repeat=5)),
+        "session": min(
+            timeit.repeat(lambda: session_rng.draw_below(state, "bench", OPTIONS), number=number, repeat=5)
+        ),
+    }
+    for label, seconds in timings.items():
+        print(f"  {label:<13} {seconds / number * 1e9:8.1f} ns/draw")
+
+    # Variety: first picks across sessions should be close to uniform.
+    picks = _first_picks(seed=12345)
+    expected = SESSIONS / OPTIONS
+    chi_square = sum((picks.count(option) - expected) ** 2 / expected for option in range(OPTIONS))
+    print(f"  first-pick chi-square over {SESSIONS} sessions: {chi_square:.2f} (df={OPTIONS - 1})")
+    # 16.27 is the 0.1% critical value for three degrees of freedom.
+    if chi_square > 16.27:
+        failures.append("first picks across sessions are skewed")
+    if _first_picks(seed=12345) != picks:
+        failures.append("a fixed seed did not reproduce the same picks")
+    if _first_picks(seed=54321) == picks:
+        failures.append("different server seeds produced identical picks")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Overview: session_snapshot.py
+Purpose: Measures session snapshot write, incremental rewrite, restart and lazy restore costs at scale.
+Notes: Run with `python -m benchmarks.session_snapshot [sessions]`; files go to a temp directory.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from app.memory import SlotBitset, state_to_dict
+from app.session_snapshot import SnapshotSessionMemory
+
+PHRASES = ("Let's take this one step at a time.", "Good question.", "Here is a focused next step.")
+CHECKED = 500
+RESTORES = 5_000
+
+
+def _populate(store: SnapshotSessionMemory, sessions: int) -> None:
+    for index in range(sessions):
+        session_id = f"snap-{index}"
+        state = store.get(session_id)
+        state.role = "STUDENT" if index % 3 else "TEACHER"
+        state.rng_state = random.getrandbits(64)
+        state.learning_gaps = ["algebra.linear_equations", "fractions.equivalence"]
+        for turn in range(4):
+            state.turns.append("user", f"please review attempt {turn} for session {index}")
+            state.turns.append("assistant", "You are working on linear equations. Next step: isolate x.")
+        for phrase in PHRASES:
+            state.recent_phrases.append(phrase)
+        state.last_structure_by_act["greeting"] = "warm"
+        bitset = state.served_questions["bank/algebra/2/ANY"] = SlotBitset(64)
+        bitset.add(index % 64)
+
+
+def main() -> int:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    failures = []
+    random.seed(7)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.snapshot")
+        store = SnapshotSessionMemory(path, max_sessions=0, idle_ttl_seconds=0)
+        _populate(store, sessions)
+        sample = random.sample(range(sessions), min(CHECKED, sessions))
+        expected = {index: state_to_dict(store.get(f"snap-{index}")) for index in sample}
+        json_bytes = sum(len(json.dumps(state)) for state in expected.values()) / len(expected)
+
+        started = time.perf_counter()
+        store.write()
+        full_seconds = time.perf_counter() - started
+        size = os.path.getsize(path)
+        print(f"{sessions} sessions  full write {full_seconds:6.2f}s  file {size / 1e6:7.1f} MB  "
+              f"{size / sessions:6.0f} B/session (JSON {json_bytes:.0f} B)")
+
+        for index in range(0, sessions, 100):
+            with store.session(f"snap-{index}") as state:
+                state.recent_phrases.append("Changed since the last snapshot.")
+        started = time.perf_counter()
+        store.write()
+        print(f"incremental write after 1% changed {time.perf_counter() - started:6.2f}s")
+        store._closed = True
+
+        started = time.perf_counter()
+        restarted = SnapshotSessionMemory(path, max_sessions=0, idle_ttl_seconds=0)
+        restarted._closed = True
+        print(f"restart (open snapshot) {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+        timings = []
+        for index in random.sample(range(sessions), min(RESTORES, sessions)):
+            started = time.perf_counter()
+            restarted.get(f"snap-{index}")
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        print(f"first-request restore p50 {statistics.median(timings):6.1f} us  p99 {timings[int(len(timings) * 0.99)]:6.1f} us")
+
+        for index, state in expected.items():
+            restored = state_to_dict(restarted.get(f"snap-{index}"))
+            if index % 100 == 0:
+                state["recentPhrases"] = (state["recentPhrases"] + ["Changed since the last snapshot."])[-30:]
+            if restored != state:
+                failures.append(f"snap-{index} did not round-trip")
+                break
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Overview: shard_scaling.py
+Purpose: Measures respond throughput in-process and with 1, 2, 4 and 8 shard workers, and checks shard restarts.
+Notes: Run with `python -m benchmarks.shard_scaling [seconds] [clients]`; scaling is bounded by the cores available.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "bench-secret")
+
+import app.main as engine  # noqa: E402
+from app.admission import admission  # noqa: E402
+from app.sharding import ShardPool  # noqa: E402
+
+from .asgi_client import call  # noqa: E402
+
+MESSAGE = "please review my algebra attempt on fractions, ratios and linear equations and give me practice questions"
+SESSIONS = 2_000
+HEADERS = [("content-type", "application/json"), ("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"])]
+
+
+async def _respond(session_id: str) -> int:
+    body = json.dumps({"userId": "bench", "role": "STUDENT", "sessionId": session_id, "message": MESSAGE}).encode()
+    status, _, _ = await call(engine.app, "POST", "/v1/intelligence/respond", body, HEADERS)
+    return status
+
+
+async def _load(seconds: float, clients: int) -> tuple[int, int, set]:
+    deadline = time.perf_counter() + seconds
+    done = failed = 0
+    seen: set = set()
+
+    async def client(index: int) -> None:
+        nonlocal done, failed
+        sent = 0
+        while time.perf_counter() < deadline:
+            session_id = f"shard-bench-{(index * 7919 + sent) % SESSIONS}"
+            seen.add(session_id)
+            if await _respond(session_id) == 200:
+                done += 1
+            else:
+                failed += 1
+            sent += 1
+
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    return done, failed, seen
+
+
+async def _check_placement(pool: ShardPool, seen: set) -> list[str]:
+    expected = [0] * len(pool)
+    for session_id in seen:
+        expected[pool.ring.route(session_id)] += 1
+    stats = await pool.stats()
+    actual = [entry["sessions"]["sessions"] for entry in stats]
+    if actual != expected:
+        return [f"{len(pool)} shards: sessions per shard {actual}, routing expects {expected}"]
+    return []
+
+
+async def _check_restart(pool: ShardPool) -> list[str]:
+    """Kills one worker and expects 503s for its sessions only until the replacement is healthy."""
+    victim = pool.health()[0]
+    os.kill(victim["pid"], signal.SIGKILL)
+    owned = next(f"restart-{index}" for index in range(10_000) if pool.ring.route(f"restart-{index}") == 0)
+    other = next(f"restart-{index}" for index in range(10_000) if pool.ring.route(f"restart-{index}") != 0)
+    statuses = set()
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        status = await _respond(owned)
+        statuses.add(status)
+        if status == 200 and pool.health()[0]["restarts"] == 1:
+            break
+        if await _respond(other) != 200:
+            return ["a healthy shard failed while another restarted"]
+        await asyncio.sleep(0.05)
+    entry = pool.health()[0]
+    if entry["restarts"] != 1 or not entry["healthy"] or entry["pid"] == victim["pid"]:
+        return [f"killed shard was not replaced: {entry}"]
+    if not statuses <= {200, 503}:
+        return [f"unexpected statuses while restarting: {sorted(statuses)}"]
+    print(f"  restart: killed pid {victim['pid']}, replaced by {entry['pid']}; statuses seen {sorted(statuses)}")
+    return []
+
+
+def main() -> int:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    failures: list[str] = []
+    admission.limit = 0
+    print(f"{os.cpu_count()} cores, {clients} concurrent clients, {seconds:.0f}s per run")
+    baseline = None
+    for shards in (0, 1, 2, 4, 8):
+        pool = ShardPool(shards, ping_interval=0.5, ping_timeout=2.0) if shards else None
+        if pool is not None:
+            pool.start()
+        engine.shard_pool = pool
+        try:
+            asyncio.run(_load(0.5, clients))
+            done, failed, seen = asyncio.run(_load(seconds, clients))
+            rate = done / seconds
+            baseline = baseline or rate
+            label = "in-process" if pool is None else f"{shards} shard{'s' if shards > 1 else ''}"
+            print(f"{label:<11} {rate:8.0f} req/s  ({rate / baseline:4.2f}x in-process)  failed {failed}")
+            if failed:
+                failures.append(f"{label}: {failed} requests failed")
+            if pool is not None:
+                failures += asyncio.run(_check_placement(pool, seen))
+                if shards == 2:
+                    failures += asyncio.run(_check_restart(pool))
+        finally:
+            if pool is not None:
+                pool.close()
+    engine.shard_pool = None
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Overview: stress_sessions.py
+Purpose: Fires thousands of overlapping respond calls and verifies no session state is lost.
+Notes: Run with `python -m benchmarks.stress_sessions [sessions] [requests_per_session]`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "stress-secret")
+# Every call is fired at once; queue them all so the check covers ordering, not admission.
+os.environ.setdefault("AI_ENGINE_MAX_QUEUE", "1000000")
+os.environ.setdefault("AI_ENGINE_QUEUE_TIMEOUT_MS", "0")
+
+from app import orchestrator  # noqa: E402
+from app.main import app  # noqa: E402
+from app.memory import memory  # noqa: E402
+
+from .asgi_client import post_json  # noqa: E402
+
+MESSAGES = (
+    "give me practice questions on fractions",
+    "please review my algebra attempt",
+    "hello",
+    "what should I do next",
+)
+
+
+async def _run(sessions: int, per_session: int) -> int:
+    headers = [("x-eduvane-shared-secret", os.environ["AI_ENGINE_SHARED_SECRET"])]
+    calls = []
+    for session_index in range(sessions):
+        for turn_index in range(per_session):
+            payload = {
+                "userId": f"user-{session_index}",
+                "role": "STUDENT",
+                "sessionId": f"stress-{session_index}",
+                "message": f"{MESSAGES[turn_index % len(MESSAGES)]} #{turn_index}",
+            }
+            calls.append(post_json(app, "/v1/intelligence/respond", payload, headers))
+    random.shuffle(calls)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - started
+    print(f"{len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.0f} req/s)")
+    return sum(1 for status, _ in results if status != 200)
+
+
+def _check_sessions(sessions: int, per_session: int) -> list[str]:
+    failures = []
+    for session_index in range(sessions):
+        session_id = f"stress-{session_index}"
+        state = memory.get(session_id)
+        turns = list(state.turns)
+        expected_turns = min(per_session * 2, 40)
+        if len(turns) != expected_turns:
+            failures.append(f"{session_id}: {len(turns)} turns, expected {expected_turns}")
+            continue
+        roles = [turn["role"] for turn in turns]
+        if roles != ["user", "assistant"] * (expected_turns // 2):
+            failures.append(f"{session_id}: turns are interleaved out of order")
+        user_messages = [turn["content"] for turn in turns if turn["role"] == "user"]
+        if len(set(user_messages)) != len(user_messages):
+            failures.append(f"{session_id}: duplicated user turn")
+        phrases = list(state.recent_phrases)
+        if len(phrases) > 30 or not all(isinstance(text, str) and text for text in phrases):
+            failures.append(f"{session_id}: recent phrase history is corrupted")
+    return failures
+
+
+def main() -> int:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    orchestrator.legacy_linguistic_enabled = True
+    memory.max_sessions = 0
+    memory.idle_ttl_seconds = 0
+    # Force frequent thread switches so unguarded read-modify-write races surface.
+    sys.setswitchinterval(1e-6)
+
+    errors = asyncio.run(_run(sessions, per_session))
+    failures = _check_sessions(sessions, per_session)
+    if errors:
+        failures.append(f"{errors} requests returned a non-200 status")
+    for failure in failures[:20]:
+        print("FAIL", failure)
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
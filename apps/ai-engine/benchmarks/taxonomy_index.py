@@ -0,0 +1,71 @@
+"""
+Overview: taxonomy_index.py
+Purpose: Measures taxonomy index build time and gap matching against a substring scan at 10k topics.
+Notes: Run with `python -m benchmarks.taxonomy_index [topics]`; the taxonomy is synthetic.
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+import timeit
+
+from app.taxonomy import TaxonomyIndex, Topic
+
+FILLER = (
+    "I tried the homework again but I still get confused when the steps change "
+    "and I am not sure which method the teacher expects for this kind of problem "
+)
+
+
+def _synthetic(count: int) -> tuple[list[Topic], list[tuple[str, str]], list[str]]:
+    rng = random.Random(11)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    def word() -> str:
+        return "".join(rng.choice(letters) for _ in range(rng.randint(5, 10)))
+
+    topics: list[Topic] = []
+    phrases: list[tuple[str, str]] = []
+    for index in range(count):
+        label = f"{word()} {word()}" if index % 2 else word()
+        parent = topics[index // 10].id if index >= 10 and index % 4 == 0 else None
+        topic = Topic(id=f"topic.{index}", label=label, subject=f"subject.{index % 12}", parent=parent)
+        topics.append(topic)
+        phrases.append((topic.id, label))
+        phrases.append((topic.id, f"{label}s"))
+        phrases.append((topic.id, word()))
+    return topics, phrases, [phrase for _, phrase in phrases]
+
+
+def legacy_extract(message: str, vocabulary: list[str]) -> list[str]:
+    lowered = message.lower()
+    return [token for token in vocabulary if token in lowered][:3]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    topics, phrases, vocabulary = _synthetic(count)
+
+    started = time.perf_counter()
+    index = TaxonomyIndex(topics, phrases)
+    print(f"{count} topics / {len(phrases)} phrases compiled in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    mentioned = " and ".join(topic.label for topic in topics[::997][:4])
+    for length in (80, 800, 8_000):
+        filler = (FILLER * (length // len(FILLER) + 1))[:length]
+        message = f"{filler} {mentioned}"
+        number = max(20, 40_000 // length)
+        indexed = min(timeit.repeat(lambda: index.rank(message), number=number, repeat=3)) / number
+        legacy_number = max(3, number // 20)
+        legacy = min(timeit.repeat(lambda: legacy_extract(message, vocabulary), number=legacy_number, repeat=3)) / legacy_number
+        print(
+            f" message {len(message):>5} chars: index {indexed * 1e6:9.1f} us, "
+            f"substring scan {legacy * 1e6:9.1f} us ({legacy / indexed:.0f}x)"
+        )
+    print(" sample ranking:", index.rank(mentioned))
+
+
+if __name__ == "__main__":
+    main()
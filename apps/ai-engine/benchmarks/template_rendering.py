@@ -0,0 +1,92 @@
+"""
+Overview: template_rendering.py
+Purpose: Compares catalog rendering from compiled templates with the original hardcoded synthesis builders.
+Notes: Run with `python -m benchmarks.template_rendering`; exits non-zero if any rendered text differs.
+"""
+
+from __future__ import annotations
+
+import sys
+import timeit
+
+from app import synthesis, template_catalog
+
+ROLES = ("TEACHER", "STUDENT", "UNKNOWN")
+
+
+def legacy_analysis(role: str, gaps: list) -> str:
+    subject_focus = ", ".join(gaps[:2]) if gaps else "core concepts in this submission"
+    if role == "TEACHER":
+        return (
+            f"The student shows partial understanding in {subject_focus}. "
+            "Reasoning steps are present, but there are consistency gaps in execution. "
+            "Targeted reteaching with one worked example and one independent check should improve retention."
+        )
+    if role == "STUDENT":
+        return (
+            f"You show partial understanding in {subject_focus}. "
+            "Your reasoning steps are visible, and a few checkpoints need tighter consistency. "
+            "One guided example followed by one independent retry will strengthen this skill."
+        )
+    return (
+        f"This work shows partial understanding in {subject_focus}. "
+        "Reasoning is visible with a few consistency gaps that can be addressed through guided practice."
+    )
+
+
+def legacy_questions(role: str, questions: list) -> str:
+    joined = "\n".join(f"{idx + 1}. {question}" for idx, question in enumerate(questions))
+    if role == "TEACHER":
+        return (
+            "Generated practice set aligned to observed gaps:\n"
+            f"{joined}\n"
+            "Please ask the student to attempt these and upload the response for feedback."
+        )
+    if role == "STUDENT":
+        return (
+            "Here are focused practice questions linked to your current gaps:\n"
+            f"{joined}\n"
+            "Try these first, then upload your work and I will review it."
+        )
+    return (
+        "Here are focused practice questions linked to this conversation:\n"
+        f"{joined}\n"
+        "Attempt them and upload the results for feedback."
+    )
+
+
+def main() -> int:
+    failures = []
+    gap_sets = [[], ["fractions"], ["fractions", "algebra", "ratios"]]
+    question_sets = [[f"Question {index} about fractions?" for index in range(count)] for count in (1, 3)]
+    for role in ROLES:
+        for gaps in gap_sets:
+            if synthesis.build_analysis_response(role, gaps) != legacy_analysis(role, gaps):
+                failures.append(f"analysis text differs for {role} {gaps}")
+        for questions in question_sets:
+            if synthesis.build_question_prompt(role, questions) != legacy_questions(role, questions):
+                failures.append(f"question prompt differs for {role}")
+
+    number = 100_000
+    gaps = ["fractions", "algebra"]
+    questions = question_sets[1]
+    cases = (
+        ("analysis", lambda: legacy_analysis("STUDENT", gaps), lambda: synthesis.build_analysis_response("STUDENT", gaps)),
+        ("questions", lambda: legacy_questions("TEACHER", questions), lambda: synthesis.build_question_prompt("TEACHER", questions)),
+    )
+    for label, legacy, catalog in cases:
+        legacy_seconds = min(timeit.repeat(legacy, number=number, repeat=5))
+        catalog_seconds = min(timeit.repeat(catalog, number=number, repeat=5))
+        print(f"{label}")
+        print(f"  legacy       {legacy_seconds / number * 1e6:8.3f} us/render")
+        print(f"  catalog      {catalog_seconds / number * 1e6:8.3f} us/render")
+    print(f"catalog: {template_catalog.stats()}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Overview: variant_selection.py
+Purpose: Compares compiled variant selection with the original list-filtering picker.
+Notes: Run with `python -m benchmarks.variant_selection`; reports microseconds per pick with a warm phrase history.
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+from app import session_rng
+from app.linguistic import VARIANT_POOLS, _select_variant
+from app.memory import SessionState
+
+_rng = random.Random(11)
+
+
+def legacy_pick(state: SessionState, act: str, options, recent_list) -> str:
+    last_structure = state.last_structure_by_act.get(act)
+    filtered = [
+        (structure, text)
+        for structure, text in options
+        if text not in recent_list and structure != last_structure
+    ]
+    if not filtered:
+        filtered = [(structure, text) for structure, text in options if text not in recent_list]
+    if not filtered:
+        filtered = list(options)
+    structure, text = _rng.choice(filtered)
+    state.last_structure_by_act[act] = structure
+    return text
+
+
+def _warm_state() -> tuple[SessionState, list]:
+    state = SessionState()
+    recent: list = []
+    # Fill the history with realized sentences, as a long session would.
+    for index in range(30):
+        phrase = f"Understood. Base response number {index} for this session."
+        state.recent_phrases.append(phrase)
+        recent.append(phrase)
+    return state, recent
+
+
+def main() -> None:
+    session_rng.configure("deterministic")
+    number = 200_000
+    for act in ("greeting_student", "followup_analysis_teacher", "uniqueness_tail"):
+        pool = VARIANT_POOLS[act]
+        options = tuple(zip(pool.structures, pool.texts))
+        legacy_state, recent_list = _warm_state()
+        compiled_state, _ = _warm_state()
+        legacy = min(
+            timeit.repeat(lambda: legacy_pick(legacy_state, act, options, recent_list), number=number, repeat=5)
+        )
+        compiled = min(timeit.repeat(lambda: _select_variant("bench", compiled_state, pool), number=number, repeat=5))
+        print(f"{act}")
+        print(f"  legacy     {legacy / number * 1e6:10.3f} us/pick")
+        print(f"  compiled   {compiled / number * 1e6:10.3f} us/pick")
+        print(f"  speedup    {legacy / compiled:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Overview: conftest.py
+Purpose: Shared fixtures for the AI engine test suite.
+Notes: Environment defaults are set before any app module is imported, since several read them at import time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from typing import Any, Iterable, Tuple
+
+os.environ.setdefault("AI_ENGINE_SHARED_SECRET", "test-secret")
+os.environ.setdefault("AI_ENGINE_SESSION_BACKEND", "memory")
+
+import pytest  # noqa: E402
+
+from benchmarks.asgi_client import call  # noqa: E402
+
+SECRET = os.environ["AI_ENGINE_SHARED_SECRET"]
+HEADERS = [("content-type", "application/json"), ("x-eduvane-shared-secret", SECRET)]
+
+
+class FakeClock:
+    """Monotonic clock the test advances by hand."""
+
+    def __init__(self, now: float = 1_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def post(path: str, payload: Any, headers: Iterable[Tuple[str, str]] = ()) -> Tuple[int, dict, Any]:
+    """Sends one JSON request through the engine app and returns status, headers and decoded body."""
+    from app.main import app
+
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    status, raw_headers, raw = asyncio.run(call(app, "POST", path, body, [*HEADERS, *headers]))
+    decoded_headers = {key.decode(): value.decode() for key, value in raw_headers}
+    return status, decoded_headers, json.loads(raw) if raw else None
+
+
+def respond_payload(session_id: str, message: str = "please review my fractions attempt", **extra: Any) -> dict:
+    return {"userId": "test", "role": "STUDENT", "sessionId": session_id, "message": message, **extra}
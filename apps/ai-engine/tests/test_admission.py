@@ -0,0 +1,43 @@
+"""
+Overview: test_admission.py
+Purpose: Covers 429 responses with Retry-After when every slot is taken, both before parsing and in the queue.
+Notes: Slots are "held" by raising in_flight to the limit, so no request has to block inside the engine.
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from app.admission import admission
+
+from .conftest import post, respond_payload
+
+
+@pytest.fixture
+def saturated(monkeypatch):
+    monkeypatch.setattr(admission, "limit", 1)
+    monkeypatch.setattr(admission, "in_flight", 1)
+    return admission
+
+
+def test_full_queue_is_rejected_before_parsing(saturated, monkeypatch) -> None:
+    monkeypatch.setattr(saturated, "queue_limit", 0)
+    before = saturated.rejected_queue_full
+    # The body is not even valid JSON: the middleware rejects without reading it.
+    status, headers, body = post("/v1/intelligence/respond", b"not json")
+    assert status == 429
+    assert int(headers["retry-after"]) >= 1
+    assert "queue full" in body["detail"]
+    assert saturated.rejected_queue_full == before + 1
+
+
+def test_queue_timeout_is_rejected_by_the_handler(saturated, monkeypatch) -> None:
+    monkeypatch.setattr(saturated, "queue_limit", 1)
+    monkeypatch.setattr(saturated, "queue_timeout", 0.01)
+    before = saturated.rejected_timeout
+    status, headers, body = post("/v1/intelligence/respond", respond_payload("admission-timeout"))
+    assert status == 429
+    assert int(headers["retry-after"]) >= 1
+    assert "queue timeout" in body["detail"]
+    assert saturated.rejected_timeout == before + 1
+    assert saturated.queued == 0
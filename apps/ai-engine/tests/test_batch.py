@@ -0,0 +1,39 @@
+"""
+Overview: test_batch.py
+Purpose: Covers per-item error reporting for batches run on shards.
+Notes: A stub stands in for ShardPool, so no worker processes are spawned.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.batch import run_batch_on_shards
+from app.models import AIEngineRequest
+from app.sharding import ShardError, ShardUnavailable
+
+from .conftest import respond_payload
+
+
+class StubPool:
+    """Fails each session the way its name says."""
+
+    async def call(self, session_id: str, op: str, payload, relay=None):
+        if session_id == "shard-error":
+            raise ShardError(413, "Upload too large.")
+        if session_id == "shard-down":
+            raise ShardUnavailable("shard 0 is restarting")
+        if session_id == "bad-reply":
+            return "{not json"
+        raise RuntimeError("connection reset")
+
+
+def test_item_failures_do_not_fail_the_batch() -> None:
+    sessions = ["shard-error", "shard-down", "bad-reply", "crash"]
+    requests = [AIEngineRequest.model_validate(respond_payload(session_id)) for session_id in sessions]
+    results = asyncio.run(run_batch_on_shards(StubPool(), requests))
+    assert [item.index for item in results] == [0, 1, 2, 3]
+    assert [item.status for item in results] == [413, 503, 500, 500]
+    assert results[0].error == "Upload too large."
+    assert results[3].error == "Unable to complete orchestration."
+    assert all(item.response is None for item in results)
@@ -0,0 +1,34 @@
+"""
+Overview: test_handwriting.py
+Purpose: Covers handwriting assessment of uploads that cannot be decoded or measured.
+Notes: Such pages fall back to the heuristic feedback instead of failing the request.
+"""
+
+from __future__ import annotations
+
+import base64
+
+import pytest
+
+from app.handwriting import _analyze_pages, evaluate_handwriting
+from app.models import UploadArtifact
+from app.uploads import InlineUpload
+
+from .conftest import post, respond_payload
+
+PNG_HEADER = base64.b64encode(b"\x89PNG\r\n\x1a\n").decode("ascii")
+
+
+@pytest.mark.parametrize("encoded", ["abc", f"data:image/png;base64,{PNG_HEADER}"])
+def test_bad_base64_falls_back_to_heuristic_feedback(encoded: str) -> None:
+    upload = {"fileName": "page.png", "mimeType": "image/png", "base64Data": encoded}
+    status, _, body = post(
+        "/v1/intelligence/respond", respond_payload("handwriting-bad-base64", uploads=[upload])
+    )
+    assert status == 200
+    assert body["handwritingFeedback"] == evaluate_handwriting(True, False).model_dump()
+
+
+def test_undecodable_page_is_skipped() -> None:
+    bad = InlineUpload(UploadArtifact(fileName="page.png", mimeType="image/png", base64Data="abc"))
+    assert _analyze_pages([bad]) == []
@@ -0,0 +1,67 @@
+"""
+Overview: test_history_sync.py
+Purpose: Covers the history cursor the gateway stores, including a failed transcript save and a lost engine session.
+Notes: A small gateway stand-in keeps the transcript and cursor the way chatRoutes.ts does.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from app.memory import TURN_LIMIT, memory
+
+from .conftest import post, respond_payload
+
+
+class Gateway:
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self.transcript: List[dict] = []
+        self.cursor: Optional[int] = None
+
+    def exchange(self, message: str, save: bool = True) -> dict:
+        length = len(self.transcript)
+        base = max(0, length - TURN_LIMIT) if self.cursor is None else min(self.cursor, length)
+        payload = respond_payload(
+            self.session_id, message, history=self.transcript[base:], historyProtocol=1, historyBase=base
+        )
+        status, _, response = post("/v1/intelligence/respond", payload)
+        assert status == 200
+        # The cursor is only kept once the exchange is saved, as chatRoutes.ts does.
+        self.cursor = None
+        if save:
+            stamp = "2026-01-01T00:00:00Z"
+            self.transcript.append({"role": "user", "content": message, "timestamp": stamp})
+            self.transcript.append({"role": "assistant", "content": response["responseText"], "timestamp": stamp})
+            self.cursor = response["historyCursor"]
+        return response
+
+    def engine_turns(self) -> List[str]:
+        return [turn["content"] for turn in memory.peek(self.session_id).turns]
+
+
+def test_cursor_tracks_the_saved_transcript() -> None:
+    gateway = Gateway("history-cursor")
+    for index in range(3):
+        response = gateway.exchange(f"please review my fractions attempt {index}")
+        assert response["historyCursor"] == len(gateway.transcript)
+    assert gateway.engine_turns() == [turn["content"] for turn in gateway.transcript]
+
+
+def test_failed_save_resends_a_full_window() -> None:
+    gateway = Gateway("history-unsaved")
+    gateway.exchange("please review my fractions attempt")
+    gateway.exchange("this exchange is never saved", save=False)
+    response = gateway.exchange("please review my ratios attempt")
+    assert response["historyCursor"] == len(gateway.transcript)
+    # The unsaved exchange is gone from the engine too, since the transcript never had it.
+    assert gateway.engine_turns() == [turn["content"] for turn in gateway.transcript]
+
+
+def test_lost_engine_session_is_rebuilt() -> None:
+    gateway = Gateway("history-lost")
+    gateway.exchange("please review my fractions attempt")
+    memory.discard(gateway.session_id)
+    gateway.cursor = None
+    gateway.exchange("please review my ratios attempt")
+    assert gateway.engine_turns() == [turn["content"] for turn in gateway.transcript]
@@ -0,0 +1,129 @@
+"""
+Overview: test_idempotency.py
+Purpose: Covers Idempotency-Key replay: failed and abandoned runs, and records shared between workers.
+Notes: Two caches over one SQLite file stand in for two workers; results are plain strings.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.admission import Overloaded
+from app.idempotency import IdempotencyCache, IdempotencyConflict, IdempotencyFailed
+from app.sqlite_store import SqliteIdempotencyStore
+
+
+class Work:
+    """Counts runs, the way a session write would."""
+
+    def __init__(self, fail: BaseException | None = None) -> None:
+        self.runs = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self) -> str:
+        self.runs += 1
+        await self.release.wait()
+        if self.fail is not None:
+            raise self.fail
+        return f"result {self.runs}"
+
+
+def _cache(shared: SqliteIdempotencyStore | None = None) -> IdempotencyCache[str]:
+    return IdempotencyCache(max_entries=100, ttl=600, retryable=(Overloaded,), shared=shared)
+
+
+def test_failed_run_is_replayed_not_rerun() -> None:
+    cache, work = _cache(), Work(fail=RuntimeError("boom"))
+
+    async def scenario() -> None:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await cache.run("key", "body", work)
+
+    asyncio.run(scenario())
+    assert work.runs == 1
+    assert cache.stats()["failed"] == 1
+
+
+def test_retryable_failure_runs_again() -> None:
+    cache, work = _cache(), Work(fail=Overloaded("queue full", 1))
+
+    async def scenario() -> None:
+        with pytest.raises(Overloaded):
+            await cache.run("key", "body", work)
+        work.fail = None
+        assert await cache.run("key", "body", work) == ("result 2", False)
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_run_finishes_and_is_replayed() -> None:
+    cache, work = _cache(), Work()
+
+    async def scenario() -> None:
+        work.release.clear()
+        leader = asyncio.ensure_future(cache.run("key", "body", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        work.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await cache.run("key", "body", work) == ("result 1", True)
+
+    asyncio.run(scenario())
+    assert work.runs == 1
+
+
+def test_workers_share_results(tmp_path) -> None:
+    path = str(tmp_path / "sessions.sqlite3")
+    first, second = _cache(SqliteIdempotencyStore(path, 600)), _cache(SqliteIdempotencyStore(path, 600))
+    work = Work()
+
+    async def scenario() -> None:
+        assert await first.run("key", "body", work) == ("result 1", False)
+        assert await second.run("key", "body", work) == ("result 1", True)
+        with pytest.raises(IdempotencyConflict):
+            await second.run("key", "other body", work)
+
+    asyncio.run(scenario())
+    assert work.runs == 1
+
+
+def test_worker_waits_for_a_run_in_flight_elsewhere(tmp_path) -> None:
+    path = str(tmp_path / "sessions.sqlite3")
+    first, second = _cache(SqliteIdempotencyStore(path, 600)), _cache(SqliteIdempotencyStore(path, 600))
+    work = Work()
+
+    async def scenario() -> None:
+        work.release.clear()
+        leader = asyncio.ensure_future(first.run("key", "body", work))
+        while work.runs == 0:
+            await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(second.run("key", "body", work))
+        await asyncio.sleep(0.05)
+        assert not follower.done()
+        work.release.set()
+        assert await leader == ("result 1", False)
+        assert await follower == ("result 1", True)
+
+    asyncio.run(scenario())
+    assert work.runs == 1
+
+
+def test_failure_is_replayed_on_another_worker(tmp_path) -> None:
+    path = str(tmp_path / "sessions.sqlite3")
+    first, second = _cache(SqliteIdempotencyStore(path, 600)), _cache(SqliteIdempotencyStore(path, 600))
+    work = Work(fail=RuntimeError("boom"))
+
+    async def scenario() -> None:
+        with pytest.raises(RuntimeError):
+            await first.run("key", "body", work)
+        with pytest.raises(IdempotencyFailed):
+            await second.run("key", "body", work)
+
+    asyncio.run(scenario())
+    assert work.runs == 1
@@ -0,0 +1,73 @@
+"""
+Overview: test_intent.py
+Purpose: Pins the intent classifier to the coverage of the original substring checks, including stem-changing inflections.
+Notes: ``_substring_intent`` is the pre-classifier rule, kept here as the reference for inflected hint words.
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from app.intent import ANALYSIS_HINTS, QUESTION_HINTS, classify_intent
+
+
+def _substring_intent(message: str) -> str:
+    text = message.lower().strip()
+    if any(token in text for token in QUESTION_HINTS):
+        return "QUESTION_GENERATION"
+    if any(token in text for token in ANALYSIS_HINTS):
+        return "ANALYSIS"
+    return "CONVERSATIONAL"
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "give me some quizzes",
+        "I quizzed myself yesterday",
+        "Can you make a quiz?",
+        "more practice questions please",
+        "practices for fractions",
+        "generated worksheets on ratios",
+        "Generate a WORKSHEET",
+        "analyze my essay",
+        "analyzed my working",
+        "please review this",
+        "reviewing my answers",
+        "reviews of my homework",
+        "checked my work",
+        "checking ratios",
+        "evaluated answers",
+        "marking my paper",
+        "some feedback please",
+        "question and feedback",
+        "hello there",
+        "tell me about photosynthesis",
+    ],
+)
+def test_matches_original_coverage(message: str) -> None:
+    assert classify_intent(message, False) == _substring_intent(message)
+
+
+@pytest.mark.parametrize(
+    ("message", "intent"),
+    [
+        # Stem changes the original substring checks missed.
+        ("analyzing my essay", "ANALYSIS"),
+        ("two analyses of the same essay", "ANALYSIS"),
+        ("evaluating my answers", "ANALYSIS"),
+        ("practicing fractions", "QUESTION_GENERATION"),
+        ("generating a worksheet", "QUESTION_GENERATION"),
+        ("quizzing me on ratios", "QUESTION_GENERATION"),
+    ],
+)
+def test_stem_changing_inflections(message: str, intent: str) -> None:
+    assert classify_intent(message, False) == intent
+
+
+def test_hints_match_whole_words_only() -> None:
+    assert classify_intent("my checkbook is missing", False) == "CONVERSATIONAL"
+
+
+def test_upload_forces_analysis() -> None:
+    assert classify_intent("give me some quizzes", True) == "ANALYSIS"
@@ -0,0 +1,46 @@
+"""
+Overview: test_metrics.py
+Purpose: Checks that stage histograms, including request decoding and admission wait, reach /metrics for admitted requests.
+Notes: Respond runs on the admission executor, so this also covers context propagation into worker threads.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+from app.main import app
+from benchmarks.asgi_client import call
+
+from .conftest import HEADERS, post, respond_payload
+
+
+def _stage_count(stage: str) -> float:
+    _, _, raw = asyncio.run(call(app, "GET", "/metrics", b"", HEADERS))
+    total = 0.0
+    for line in raw.decode().splitlines():
+        if line.startswith("eduvane_stage_duration_seconds_count{") and f'stage="{stage}"' in line:
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+def test_decode_stage_is_recorded_for_executor_requests() -> None:
+    before = _stage_count("decode")
+    status, _, _ = post("/v1/intelligence/respond", respond_payload("metrics-decode"))
+    assert status == 200
+    assert _stage_count("decode") == before + 1
+
+
+def test_decode_stage_is_recorded_for_streams() -> None:
+    before = _stage_count("decode")
+    body = json.dumps(respond_payload("metrics-stream")).encode()
+    status, _, _ = asyncio.run(call(app, "POST", "/v1/intelligence/respond:stream", body, HEADERS))
+    assert status == 200
+    assert _stage_count("decode") == before + 1
+
+
+def test_admission_wait_is_split_from_decode() -> None:
+    before = _stage_count("admission_wait")
+    status, _, _ = post("/v1/intelligence/respond", respond_payload("metrics-admission"))
+    assert status == 200
+    assert _stage_count("admission_wait") == before + 1
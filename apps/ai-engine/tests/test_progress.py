@@ -0,0 +1,89 @@
+"""
+Overview: test_progress.py
+Purpose: Covers attempt comparison: gap lists and deltas, the recurring-gap threshold and attempt logs across snapshots.
+Notes: Scores and metrics are exact in float32, which is how attempt logs store them.
+"""
+
+from __future__ import annotations
+
+from app.memory import AttemptLog, SessionState
+from app.progress import METRIC_NAMES, compare_attempt
+from app.session_snapshot import decode_state, encode_state
+
+from .conftest import post, respond_payload
+
+
+def _metrics(value: float) -> list:
+    return [value] * len(METRIC_NAMES)
+
+
+def test_second_attempt_reports_lists_and_deltas() -> None:
+    log = AttemptLog()
+    first = [("math.fractions", 1.25), ("math.decimals", 0.5)]
+    assert compare_attempt(log, first, _metrics(0.5)) is None
+    log.append(first, _metrics(0.5))
+
+    report = compare_attempt(log, [("math.fractions", 1.0), ("math.percentages", 1.5)], _metrics(0.75))
+    assert report.attempt == 2
+    assert report.resolvedGaps == ["decimals"]
+    assert report.newGaps == ["percentages"]
+    assert report.persistentGaps == ["fractions"]
+    assert report.recurringGaps == []
+    assert report.gapLoad == 2.5
+    assert report.gapLoadChange == 0.75
+    assert report.gapLoadVsAverage == 0.75
+    assert report.handwritingChange == {name: 0.25 for name in METRIC_NAMES}
+    assert report.handwritingVsAverage == {name: 0.25 for name in METRIC_NAMES}
+
+
+def test_handwriting_deltas_need_metrics_on_both_sides() -> None:
+    log = AttemptLog()
+    log.append([("math.fractions", 1.0)], None)
+    report = compare_attempt(log, [("math.fractions", 1.0)], _metrics(0.5))
+    assert report.handwritingChange is None
+    assert report.handwritingVsAverage is None
+    assert compare_attempt(log, [("math.fractions", 1.0)], None).handwritingChange is None
+
+
+def test_recurring_gaps_need_repeats() -> None:
+    log = AttemptLog()
+    attempts = [
+        [("math.fractions", 1.0)],
+        [("math.decimals", 1.0)],
+        [("math.decimals", 1.0)],
+    ]
+    recurring = []
+    for gaps in attempts:
+        report = compare_attempt(log, gaps, None)
+        recurring.append(report.recurringGaps if report is not None else None)
+        log.append(gaps, None)
+    # Decimals has been seen once before the third attempt, which is not yet a repeat.
+    assert recurring == [None, [], []]
+
+    report = compare_attempt(log, [("math.fractions", 1.0), ("math.decimals", 1.0)], None)
+    # Three earlier attempts: a gap needs two sightings; fractions had one, decimals two.
+    assert report.recurringGaps == ["decimals"]
+
+
+def test_snapshot_keeps_the_attempt_log() -> None:
+    state = SessionState()
+    state.attempts.append([("math.fractions", 1.25), ("math.decimals", 0.5)], _metrics(0.5))
+    state.attempts.append([("math.fractions", 1.0)], _metrics(0.25))
+    restored = decode_state(memoryview(encode_state(state)))
+
+    gaps, metrics = [("math.fractions", 0.5), ("math.percentages", 1.0)], _metrics(0.75)
+    before = compare_attempt(state.attempts, gaps, metrics)
+    after = compare_attempt(restored.attempts, gaps, metrics)
+    assert after.model_dump() == before.model_dump()
+    assert after.attempt == 3
+    assert after.recurringGaps == ["fractions"]
+
+
+def test_progress_is_reported_from_the_second_analysis() -> None:
+    path = "/v1/intelligence/respond"
+    status, _, first = post(path, respond_payload("progress-two-attempts", "please review my fractions attempt"))
+    assert status == 200 and first["progress"] is None
+    status, _, second = post(path, respond_payload("progress-two-attempts", "please review my fractions attempt again"))
+    assert status == 200
+    assert second["progress"]["attempt"] == 2
+    assert "fractions" in second["progress"]["persistentGaps"]
@@ -0,0 +1,36 @@
+"""
+Overview: test_question_bank.py
+Purpose: Checks bank ids are stable per content and that served items survive a rebuild of the same bank.
+Notes: Banks are built in memory from small item lists.
+"""
+
+from __future__ import annotations
+
+from app.memory import SessionState, state_from_dict, state_to_dict
+from app.question_bank import QuestionBank
+
+
+def _items(extra: str = "") -> list[dict]:
+    return [{"topic": "math.fractions", "difficulty": 1, "text": f"Question {index}{extra}"} for index in range(6)]
+
+
+def test_same_items_get_the_same_bank_id() -> None:
+    assert QuestionBank.from_items(_items()).bank_id == QuestionBank.from_items(_items()).bank_id
+    assert QuestionBank.from_items(_items()).bank_id != QuestionBank.from_items(_items("?")).bank_id
+
+
+def test_served_items_are_not_repeated_after_a_rebuild() -> None:
+    state = SessionState()
+    first = QuestionBank.from_items(_items()).sample(state, "bank-session", ["math.fractions"], "STUDENT", 3)
+    # A restart rebuilds the seed bank and restores the session from storage.
+    restored = state_from_dict(state_to_dict(state))
+    second = QuestionBank.from_items(_items()).sample(restored, "bank-session", ["math.fractions"], "STUDENT", 3)
+    assert len(first) == len(second) == 3
+    assert not set(first) & set(second)
+
+
+def test_changed_bank_resets_served_items() -> None:
+    state = SessionState()
+    QuestionBank.from_items(_items()).sample(state, "bank-reset", ["math.fractions"], "STUDENT", 6)
+    drawn = QuestionBank.from_items(_items("?")).sample(state, "bank-reset", ["math.fractions"], "STUDENT", 6)
+    assert len(drawn) == 6
@@ -0,0 +1,90 @@
+"""
+Overview: test_session_memory.py
+Purpose: Covers session store bounds (LRU, idle TTL) and per-session locking.
+Notes: Uses a fake clock so expiry is deterministic.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from app.memory import SessionMemory
+
+
+def test_lru_evicts_least_recently_used(clock) -> None:
+    store = SessionMemory(max_sessions=2, idle_ttl_seconds=0, clock=clock)
+    store.append_turn("a", "user", "one")
+    store.append_turn("b", "user", "two")
+    store.get("a")
+    store.append_turn("c", "user", "three")
+    assert "a" in store and "c" in store and "b" not in store
+    assert store.stats()["evictedLruTotal"] == 1
+
+
+def test_idle_sessions_expire(clock) -> None:
+    store = SessionMemory(max_sessions=0, idle_ttl_seconds=60, clock=clock)
+    store.append_turn("old", "user", "hello")
+    clock.advance(30)
+    store.append_turn("recent", "user", "hello")
+    clock.advance(31)
+    store.get("recent")
+    assert "old" not in store and "recent" in store
+    assert store.stats()["evictedIdleTotal"] == 1
+
+
+def test_held_session_is_not_evicted(clock) -> None:
+    store = SessionMemory(max_sessions=1, idle_ttl_seconds=10, clock=clock)
+    with store.session("held") as state:
+        state.turns.append("user", "in flight")
+        clock.advance(60)
+        store.get("other")
+        assert "held" in store
+        assert store.peek("held") is state
+
+
+def test_byte_accounting_returns_to_zero_after_eviction(clock) -> None:
+    store = SessionMemory(max_sessions=1, idle_ttl_seconds=0, clock=clock)
+    store.append_turn("a", "user", "x" * 500)
+    assert store.stats()["approxBytes"] > 500
+    store.discard("a")
+    assert store.stats()["approxBytes"] == 0
+
+
+def test_session_scope_serializes_read_modify_write() -> None:
+    store = SessionMemory(max_sessions=0, idle_ttl_seconds=0)
+    workers, rounds = 8, 200
+
+    def work() -> None:
+        for _ in range(rounds):
+            with store.session("shared") as state:
+                count = len(state.learning_gaps)
+                state.learning_gaps = ["gap"] * (count + 1)
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.get("shared").learning_gaps) == workers * rounds
+
+
+def test_distinct_sessions_do_not_block_each_other() -> None:
+    store = SessionMemory(max_sessions=0, idle_ttl_seconds=0)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold() -> None:
+        with store.session("slow"):
+            entered.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    entered.wait(5)
+    started = time.perf_counter()
+    with store.session("fast") as state:
+        state.role = "STUDENT"
+    assert time.perf_counter() - started < 1
+    release.set()
+    holder.join()
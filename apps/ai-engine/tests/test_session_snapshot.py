@@ -0,0 +1,87 @@
+"""
+Overview: test_session_snapshot.py
+Purpose: Covers snapshot encoding round-trips and warm restarts of the in-process session store.
+Notes: Each "restart" opens a new SnapshotSessionMemory on the file the previous one wrote.
+"""
+
+from __future__ import annotations
+
+from app.memory import SessionState, SlotBitset, state_to_dict
+from app.session_snapshot import SnapshotSessionMemory, decode_state, encode_state
+
+
+def _populated() -> SessionState:
+    state = SessionState(role="TEACHER", asked_role_clarification=True)
+    state.turns.append("user", "please review my fractions attempt")
+    state.turns.append("assistant", "Fractions still need work.")
+    state.learning_gaps = ["fractions", "ratios"]
+    state.recent_phrases.append("Let's take this step by step.")
+    state.last_structure_by_act = {"open": "question"}
+    state.rng_state = 2**63 + 12345
+    bitset = SlotBitset(64)
+    bitset.add(3)
+    state.served_questions = {"fractions:1:ANY": bitset}
+    state.history_cursor = 2
+    state.attempts.append([("fractions", 1.25), ("ratios", 0.5)], [0.5, 0.25, 0.75, 1.0])
+    state.attempts.append([("fractions", 1.0)], None)
+    return state
+
+
+def _store(path: str) -> SnapshotSessionMemory:
+    return SnapshotSessionMemory(path, interval_seconds=0, max_sessions=0, idle_ttl_seconds=0)
+
+
+def test_encoding_round_trips_every_field() -> None:
+    state = _populated()
+    assert state_to_dict(decode_state(memoryview(encode_state(state)))) == state_to_dict(state)
+    empty = SessionState()
+    assert state_to_dict(decode_state(memoryview(encode_state(empty)))) == state_to_dict(empty)
+
+
+def test_restart_restores_sessions(tmp_path) -> None:
+    path = str(tmp_path / "sessions.snapshot")
+    first = _store(path)
+    with first.session("a") as state:
+        populated = _populated()
+        for name in SessionState.__slots__:
+            setattr(state, name, getattr(populated, name))
+    first.append_turn("b", "user", "hello")
+    first.close()
+
+    second = _store(path)
+    assert state_to_dict(second.get("a")) == state_to_dict(_populated())
+    assert [turn["content"] for turn in second.get("b").turns] == ["hello"]
+    assert second.stats()["snapshotRestoredTotal"] == 2
+    second.close()
+
+
+def test_untouched_sessions_carry_forward_and_changes_are_kept(tmp_path) -> None:
+    path = str(tmp_path / "sessions.snapshot")
+    first = _store(path)
+    first.append_turn("idle", "user", "never touched again")
+    first.append_turn("busy", "user", "first")
+    first.close()
+
+    second = _store(path)
+    # Only "busy" is restored and changed; "idle" must survive the next write from the old snapshot.
+    second.append_turn("busy", "user", "second")
+    assert second.write() == 2
+    second.close()
+
+    third = _store(path)
+    assert [turn["content"] for turn in third.get("idle").turns] == ["never touched again"]
+    assert [turn["content"] for turn in third.get("busy").turns] == ["first", "second"]
+    third.close()
+
+
+def test_discarded_clean_session_is_restored_again(tmp_path) -> None:
+    path = str(tmp_path / "sessions.snapshot")
+    first = _store(path)
+    first.append_turn("s", "user", "kept")
+    first.close()
+
+    second = _store(path)
+    second.get("s")
+    second.discard("s")
+    assert [turn["content"] for turn in second.get("s").turns] == ["kept"]
+    second.close()
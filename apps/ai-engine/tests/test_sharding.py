@@ -0,0 +1,73 @@
+"""
+Overview: test_sharding.py
+Purpose: Covers session routing across shards and restart retries for workers that fail to start.
+Notes: No worker processes are spawned; restarts replace ``_spawn`` on the pool under test.
+"""
+
+from __future__ import annotations
+
+import time
+
+from app.sharding import HashRing, ShardPool
+
+
+def test_ring_routes_sessions_consistently() -> None:
+    sessions = [f"session-{index}" for index in range(4_000)]
+    ring = HashRing(4)
+    routes = [ring.route(session_id) for session_id in sessions]
+    assert routes == [HashRing(4).route(session_id) for session_id in sessions]
+    counts = [routes.count(shard) for shard in range(4)]
+    assert min(counts) > 0.5 * len(sessions) / 4
+
+
+def test_adding_a_shard_moves_few_sessions() -> None:
+    sessions = [f"session-{index}" for index in range(4_000)]
+    before, after = HashRing(4), HashRing(5)
+    moved = sum(before.route(session_id) != after.route(session_id) for session_id in sessions)
+    # Ideally 1/5 of sessions move, all of them onto the new shard.
+    assert moved < 0.3 * len(sessions)
+    assert all(after.route(s) == 4 for s in sessions if before.route(s) != after.route(s))
+
+
+def test_failed_restart_is_retried_with_backoff() -> None:
+    pool = ShardPool(2, ping_interval=0)
+    shard = pool._shards[0]
+    attempts = []
+
+    def spawn(target) -> None:
+        # The state lock must be free while a worker starts, so other shards keep routing.
+        assert pool._lock.acquire(blocking=False)
+        pool._lock.release()
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RuntimeError("worker did not start")
+        target.restart_at = None
+        target.restart_backoff = 0.0
+
+    pool._spawn = spawn
+    shard.restart_at = time.monotonic()
+    pool._restart(shard)
+    assert len(attempts) == 1 and shard.restart_backoff == 1.0
+    assert shard.restart_at > time.monotonic()
+
+    pool._restart_due()
+    assert len(attempts) == 1
+
+    shard.restart_at = time.monotonic()
+    pool._restart_due()
+    assert len(attempts) == 2 and shard.restart_backoff == 2.0
+
+    shard.restart_at = time.monotonic()
+    pool._restart_due()
+    assert len(attempts) == 3 and shard.restart_at is None
+
+
+def test_closed_pool_does_not_restart() -> None:
+    pool = ShardPool(1, ping_interval=0)
+    shard = pool._shards[0]
+    pool._spawn = lambda target: (_ for _ in ()).throw(AssertionError("spawned after close"))
+    shard.restart_at = time.monotonic()
+    pool.close()
+    pool._restart_due()
+    pool._restart(shard)
+    assert shard.restart_at is None
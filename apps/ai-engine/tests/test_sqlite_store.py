@@ -0,0 +1,61 @@
+"""
+Overview: test_sqlite_store.py
+Purpose: Covers the SQLite session backend shared by several workers on one node.
+Notes: Workers are separate processes because record locks only exclude other processes.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+
+from app.sqlite_store import SqliteSessionStore
+
+ROUNDS = 200
+
+
+def _increment(path: str, rounds: int) -> None:
+    store = SqliteSessionStore(path, flush_interval_ms=0)
+    for _ in range(rounds):
+        with store.session("shared") as state:
+            # A read-modify-write that loses updates unless scopes are serialized across workers.
+            state.rng_state = (state.rng_state or 0) + 1
+    store.close()
+
+
+def test_workers_do_not_lose_updates(tmp_path) -> None:
+    path = str(tmp_path / "sessions.sqlite3")
+    SqliteSessionStore(path).close()
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_increment, args=(path, ROUNDS)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    store = SqliteSessionStore(path)
+    assert store.peek("shared").rng_state == 3 * ROUNDS
+    assert store.stats()["sqliteWriteConflictsTotal"] == 0
+
+
+def test_scope_sees_other_worker_write(tmp_path) -> None:
+    path = str(tmp_path / "sessions.sqlite3")
+    first, second = SqliteSessionStore(path), SqliteSessionStore(path)
+    with first.session("s") as state:
+        state.role = "STUDENT"
+    with second.session("s") as state:
+        assert state.role == "STUDENT"
+        state.learning_gaps = ["fractions"]
+    with first.session("s") as state:
+        assert state.learning_gaps == ["fractions"]
+
+
+def test_buffered_write_is_flushed(tmp_path) -> None:
+    path = str(tmp_path / "sessions.sqlite3")
+    writer = SqliteSessionStore(path, flush_interval_ms=60_000)
+    with writer.session("s") as state:
+        state.role = "TEACHER"
+    assert writer.stats()["sqlitePendingWrites"] == 1
+    assert SqliteSessionStore(path).peek("s") is None
+    writer.close()
+    assert SqliteSessionStore(path).peek("s").role == "TEACHER"
+
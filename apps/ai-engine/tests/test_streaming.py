@@ -0,0 +1,49 @@
+"""
+Overview: test_streaming.py
+Purpose: Checks that streamed orchestration emits each structured result as soon as its stage finishes.
+Notes: Drives stream_orchestration directly, so event timing is observed without an HTTP client.
+"""
+
+from __future__ import annotations
+
+import base64
+
+from app import orchestrator
+from app.models import AIEngineRequest
+from benchmarks.handwriting_metrics import synthetic_page
+
+from .conftest import respond_payload
+
+
+def _events(request: AIEngineRequest, calls: list) -> list:
+    seen = []
+    for event, _ in orchestrator.stream_orchestration(request):
+        # Record how far synthesis had got when each event reached the consumer.
+        seen.append((event, len(calls)))
+    return seen
+
+
+def test_questions_stream_before_the_response_is_built(monkeypatch) -> None:
+    calls: list = []
+    build = orchestrator.build_question_prompt
+    monkeypatch.setattr(orchestrator, "build_question_prompt", lambda *args: calls.append(1) or build(*args))
+    request = AIEngineRequest(**respond_payload("stream-questions", "give me practice questions on fractions"))
+    events = _events(request, calls)
+    names = [event for event, _ in events]
+    assert names.index("questions") < names.index("response")
+    assert dict(events)["questions"] == 0
+
+
+def test_handwriting_streams_before_the_response_is_built(monkeypatch) -> None:
+    calls: list = []
+    build = orchestrator.build_analysis_response
+    monkeypatch.setattr(orchestrator, "build_analysis_response", lambda *args: calls.append(1) or build(*args))
+    upload = {"fileName": "page.png", "mimeType": "image/png", "base64Data": base64.b64encode(synthetic_page(1, messy=True, width=800, height=1100)).decode()}
+    request = AIEngineRequest(
+        **respond_payload("stream-handwriting", "please review my fractions attempt", uploads=[upload])
+    )
+    events = _events(request, calls)
+    names = [event for event, _ in events]
+    assert names.index("handwriting") < names.index("response")
+    assert dict(events)["handwriting"] == 0
+    assert names[-1] == "done"
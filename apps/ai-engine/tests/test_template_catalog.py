@@ -0,0 +1,116 @@
+"""
+Overview: test_template_catalog.py
+Purpose: Covers template resolution, its fallback chain, hot reload and rendering with per-request parameters.
+Notes: Uses the bundled catalog in app/data/response_templates.json unless a test points at its own file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from app import synthesis, template_catalog
+
+
+def _write(path, texts: dict) -> None:
+    templates = [
+        {"role": role, "intent": intent, "locale": locale, "variant": variant, "text": text}
+        for (role, intent, locale, variant), text in texts.items()
+    ]
+    path.write_text(json.dumps({"defaultLocale": "en", "templates": templates}), encoding="utf-8")
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    """Points the module at a temporary catalog; module state is restored afterwards."""
+    path = tmp_path / "templates.json"
+    _write(path, {("DEFAULT", "ANALYSIS", "en", "default"): "first"})
+    monkeypatch.setenv("AI_ENGINE_TEMPLATE_PATH", str(path))
+    for name, value in (("_catalog", None), ("_catalog_mtime", None), ("_next_check", 0.0), ("reloads_total", 0)):
+        monkeypatch.setattr(template_catalog, name, value)
+    monkeypatch.setattr(template_catalog, "template_reload_seconds", 60)
+    return path
+
+
+def _touch(path, seconds: float) -> None:
+    stamp = os.stat(path).st_mtime + seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_compiled_template_is_reused_per_key() -> None:
+    catalog = template_catalog.get_catalog()
+    first = catalog.resolve("TEACHER", "QUESTION_GENERATION", None, None)
+    assert catalog.resolve("TEACHER", "QUESTION_GENERATION", None, None) is first
+
+
+def test_each_question_set_renders_without_caching_text() -> None:
+    before = template_catalog.stats()
+    for index in range(50):
+        questions = [f"Question {index}a?", f"Question {index}b?"]
+        text = synthesis.build_question_prompt("STUDENT", questions)
+        assert f"1. Question {index}a?\n2. Question {index}b?" in text
+    assert template_catalog.stats() == before
+
+
+def test_missing_field_uses_template_default() -> None:
+    template = template_catalog.CompiledTemplate(("R", "I", "en", "default"), "Focus: {focus}.", {"focus": "basics"})
+    assert template.render({}) == "Focus: basics."
+    assert template.render({"focus": "fractions"}) == "Focus: fractions."
+
+
+def test_resolve_relaxes_variant_then_locale_then_role(tmp_path) -> None:
+    path = tmp_path / "templates.json"
+    _write(
+        path,
+        {
+            ("TEACHER", "ANALYSIS", "fr", "short"): "teacher fr short",
+            ("TEACHER", "ANALYSIS", "fr", "default"): "teacher fr",
+            ("TEACHER", "ANALYSIS", "en", "default"): "teacher en",
+            ("DEFAULT", "ANALYSIS", "en", "default"): "default en",
+            ("DEFAULT", "QUESTION_GENERATION", "en", "default"): "default questions",
+        },
+    )
+    catalog = template_catalog.TemplateCatalog.from_file(path)
+
+    def text(role, intent, locale=None, variant=None) -> str:
+        return catalog.resolve(role, intent, locale, variant).render({})
+
+    assert text("TEACHER", "ANALYSIS", "fr", "short") == "teacher fr short"
+    assert text("TEACHER", "ANALYSIS", "fr", "long") == "teacher fr"
+    assert text("TEACHER", "ANALYSIS", "de", "short") == "teacher en"
+    assert text("TEACHER", "ANALYSIS") == "teacher en"
+    assert text("STUDENT", "ANALYSIS", "fr") == "default en"
+    assert text("TEACHER", "QUESTION_GENERATION", "fr", "short") == "default questions"
+    with pytest.raises(KeyError):
+        catalog.resolve("TEACHER", "CONVERSATIONAL", None, None)
+
+
+def test_changed_file_is_reloaded_after_the_check_interval(catalog_file) -> None:
+    assert template_catalog.render("STUDENT", "ANALYSIS") == "first"
+    _write(catalog_file, {("DEFAULT", "ANALYSIS", "en", "default"): "second"})
+    _touch(catalog_file, 10)
+
+    # Within the interval the mtime is not checked.
+    assert template_catalog.render("STUDENT", "ANALYSIS") == "first"
+    template_catalog._next_check = 0.0
+    assert template_catalog.render("STUDENT", "ANALYSIS") == "second"
+    assert template_catalog.stats()["reloadsTotal"] == 1
+
+    # An unchanged mtime is not parsed again.
+    template_catalog._next_check = 0.0
+    template_catalog.get_catalog()
+    assert template_catalog.stats()["reloadsTotal"] == 1
+
+
+def test_broken_edit_keeps_the_last_good_catalog(catalog_file) -> None:
+    assert template_catalog.render("STUDENT", "ANALYSIS") == "first"
+    catalog_file.write_text("{not json", encoding="utf-8")
+    _touch(catalog_file, 10)
+    template_catalog._next_check = 0.0
+    assert template_catalog.render("STUDENT", "ANALYSIS") == "first"
+
+    _write(catalog_file, {("DEFAULT", "ANALYSIS", "en", "default"): "fixed"})
+    _touch(catalog_file, 20)
+    assert template_catalog.reload_catalog().resolve("STUDENT", "ANALYSIS", None, None).render({}) == "fixed"
@@ -0,0 +1,121 @@
+"""
+Overview: test_upload_cache.py
+Purpose: Covers reuse of cached page analyses across requests and the cache's disk tier pruning.
+Notes: Pruning tests use records with no metrics or feedback, so no analysis runs for them.
+"""
+
+from __future__ import annotations
+
+import base64
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from app import handwriting
+from app.models import UploadArtifact
+from app.upload_cache import CachedAnalysis, UploadAnalysisCache, content_key, upload_cache
+from app.uploads import InlineUpload
+from benchmarks.handwriting_metrics import synthetic_page
+
+EMPTY = CachedAnalysis(metrics=None, feedback=None)
+
+
+def _page(data: bytes) -> InlineUpload:
+    encoded = base64.b64encode(data).decode("ascii")
+    return InlineUpload(UploadArtifact(fileName="page.png", mimeType="image/png", base64Data=encoded))
+
+
+def _count_submissions(monkeypatch, submit=None) -> list:
+    submitted = []
+    original = submit or handwriting._submit
+
+    def counting(executor, data):
+        submitted.append(content_key(data))
+        return original(executor, data)
+
+    monkeypatch.setattr(handwriting, "_submit", counting)
+    return submitted
+
+
+def test_repeated_page_skips_the_pool(monkeypatch) -> None:
+    submitted = _count_submissions(monkeypatch)
+    page = _page(synthetic_page(1101, messy=True, width=800, height=1100))
+    before = upload_cache.stats()
+
+    first = handwriting._analyze_pages([page])
+    second = handwriting._analyze_pages([page])
+
+    assert len(submitted) == 1
+    assert len(first) == 1 and first[0].metrics is not None
+    assert second == first
+    after = upload_cache.stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hitsMemory"] == before["hitsMemory"] + 1
+
+
+def test_failed_page_is_not_cached(monkeypatch) -> None:
+    submitted = _count_submissions(monkeypatch)
+    # Valid base64 that is not an image: the worker raises and the page falls back.
+    page = _page(b"not an image 1102")
+    for _ in range(2):
+        assert handwriting._analyze_pages([page]) == []
+    assert len(submitted) == 2
+    assert upload_cache.get(content_key(b"not an image 1102")) is None
+
+
+def test_timed_out_page_is_not_cached(monkeypatch) -> None:
+    monkeypatch.setattr(handwriting, "handwriting_timeout_ms", 10)
+    # A future that never completes stands in for a page still running past the deadline.
+    submitted = _count_submissions(monkeypatch, submit=lambda executor, data: Future())
+    page = _page(b"slow page 1103")
+    for _ in range(2):
+        assert handwriting._analyze_pages([page]) == []
+    assert len(submitted) == 2
+    assert upload_cache.get(content_key(b"slow page 1103")) is None
+
+
+def test_disk_tier_serves_a_new_worker(tmp_path) -> None:
+    key = content_key(b"shared page")
+    UploadAnalysisCache(disk_dir=str(tmp_path)).put(key, EMPTY)
+    fresh = UploadAnalysisCache(disk_dir=str(tmp_path))
+    assert fresh.get(key) == EMPTY
+    assert fresh.stats()["hitsDisk"] == 1
+
+
+def test_prune_keeps_newest_files(tmp_path) -> None:
+    cache = UploadAnalysisCache(disk_dir=str(tmp_path), disk_max_entries=3)
+    keys = [content_key(bytes([index])) for index in range(5)]
+    for age, key in enumerate(reversed(keys)):
+        cache._write_disk(key, EMPTY)
+        stamp = time.time() - 100 * age
+        os.utime(cache._disk_path(key), (stamp, stamp))
+    cache._prune_disk()
+    assert sorted(path.name for path in tmp_path.glob("*/*/*.json")) == sorted(
+        cache._disk_path(key).name for key in keys[2:]
+    )
+
+
+def test_prune_skips_files_removed_during_the_walk(tmp_path) -> None:
+    cache = UploadAnalysisCache(disk_dir=str(tmp_path), disk_max_entries=1)
+    for index in range(3):
+        cache._write_disk(content_key(bytes([index])), EMPTY)
+    # A dangling link lists like a cache file but fails stat(), as a file unlinked by another worker does.
+    vanished = cache._disk_path(content_key(b"gone"))
+    vanished.parent.mkdir(parents=True, exist_ok=True)
+    vanished.symlink_to(tmp_path / "missing.json")
+    cache._prune_disk()
+    assert len([path for path in tmp_path.glob("*/*/*.json") if path.exists()]) == 1
+
+
+def test_prune_runs_off_the_writing_thread(tmp_path, monkeypatch) -> None:
+    cache = UploadAnalysisCache(disk_dir=str(tmp_path), disk_max_entries=1)
+    monkeypatch.setattr("app.upload_cache._DISK_PRUNE_INTERVAL", 2)
+    threads = []
+    monkeypatch.setattr(cache, "_prune_disk", lambda: threads.append(threading.current_thread().name))
+    for index in range(2):
+        cache._write_disk(content_key(bytes([index])), EMPTY)
+    deadline = time.monotonic() + 5
+    while not threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert threads == ["eduvane-upload-cache-prune"]
@@ -0,0 +1,44 @@
+"""
+Overview: test_uploads.py
+Purpose: Covers the upload source interface and the sizes its implementations report before reading.
+Notes: Sizes must match the decoded bytes, since limits are enforced from them.
+"""
+
+from __future__ import annotations
+
+import base64
+
+import pytest
+
+from app.models import UploadArtifact
+from app.uploads import BufferedUpload, InlineUpload, SpooledUpload, UploadSource
+
+
+def test_upload_source_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        UploadSource("page.png", "image/png")
+
+    class SizeOnly(UploadSource):
+        @property
+        def size(self) -> int:
+            return 0
+
+    with pytest.raises(TypeError):
+        SizeOnly("page.png", "image/png")
+
+
+@pytest.mark.parametrize("length", [1, 2, 3, 4, 1000])
+def test_sizes_match_decoded_bytes(length: int) -> None:
+    data = bytes(range(256)) * 4
+    data = data[:length]
+    inline = InlineUpload(
+        UploadArtifact(fileName="page.png", mimeType="image/png", base64Data=base64.b64encode(data).decode("ascii"))
+    )
+    spooled = SpooledUpload("page.png", "image/png")
+    spooled.write(data)
+    try:
+        for source in (inline, spooled, BufferedUpload("page.png", "image/png", data)):
+            assert source.size == len(data)
+            assert source.read() == data
+    finally:
+        spooled.close()
@@ -5,12 +5,81 @@
  */
 
 import { env } from "../config/env.js";
-import { AIEngineRequest, AIEngineResponse } from "../contracts.js";
+import {
+  AIEngineClassifyRequest,
+  AIEngineClassifyResponse,
+  AIEngineRequest,
+  AIEngineResponse
+} from "../contracts.js";
+
+/**
+ * The engine shed this request under load (HTTP 429). Callers should surface a
+ * retryable error instead of waiting on a request the engine will not run.
+ */
+export class AIEngineBusyError extends Error {
+  readonly retryAfterSeconds: number;
+
+  constructor(retryAfterSeconds: number) {
+    super("AI engine is at capacity.");
+    this.name = "AIEngineBusyError";
+    this.retryAfterSeconds = retryAfterSeconds;
+  }
+}
+
+function retryAfterSeconds(response: Response): number {
+  const value = Number.parseInt(response.headers.get("retry-after") ?? "", 10);
+  return Number.isFinite(value) && value > 0 ? value : 1;
+}
+
+export interface AIEngineRequestOptions {
+  /** Lets the engine replay its stored response when this call is retried. */
+  idempotencyKey?: string;
+}
 
 export async function requestAIEngine(
-  payload: AIEngineRequest
+  payload: AIEngineRequest,
+  options: AIEngineRequestOptions = {}
 ): Promise<AIEngineResponse> {
-  const response = await fetch(`${env.AI_ENGINE_URL}/v1/intelligence/respond`, {
+  const headers: Record<string, string> = {
+    "Content-Type": "application/json",
+    "x-eduvane-shared-secret": env.AI_ENGINE_SHARED_SECRET
+  };
+  if (options.idempotencyKey) {
+    headers["Idempotency-Key"] = options.idempotencyKey;
+  }
+  const send = () =>
+    fetch(`${env.AI_ENGINE_URL}/v1/intelligence/respond:raw`, {
+      method: "POST",
+      headers,
+      body: JSON.stringify(payload)
+    });
+
+  let response: Response;
+  try {
+    response = await send();
+  } catch (error) {
+    // A keyed retry never runs orchestration twice, so one retry on a dropped connection is safe.
+    if (!options.idempotencyKey) {
+      throw error;
+    }
+    response = await send();
+  }
+
+  if (response.status === 429) {
+    throw new AIEngineBusyError(retryAfterSeconds(response));
+  }
+  if (!response.ok) {
+    const text = await response.text();
+    throw new Error(text || "AI engine request failed.");
+  }
+
+  return (await response.json()) as AIEngineResponse;
+}
+
+export async function classifyAIEngineIntent(
+  payload: AIEngineClassifyRequest
+): Promise<AIEngineClassifyResponse> {
+  const response = await fetch(`${env.AI_ENGINE_URL}/v1/intelligence/classify`, {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -21,8 +90,8 @@ export async function requestAIEngine(
 
   if (!response.ok) {
     const text = await response.text();
-    throw new Error(text || "AI engine request failed.");
+    throw new Error(text || "AI engine classification failed.");
   }
 
-  return (await response.json()) as AIEngineResponse;
+  return (await response.json()) as AIEngineClassifyResponse;
 }
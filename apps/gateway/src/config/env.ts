@@ -40,7 +40,9 @@ const schema = z.object({
   REALIZATION_PROVIDER: z.string().default("openai_compatible"),
   REALIZATION_MODEL: z.string().default("gpt-4o-mini"),
   REALIZATION_API_BASE_URL: z.string().default("https://api.openai.com/v1"),
-  REALIZATION_API_KEY: z.string().optional()
+  REALIZATION_API_KEY: z.string().optional(),
+  HISTORY_CURSOR_MAX_ENTRIES: z.coerce.number().int().positive().default(50000),
+  HISTORY_CURSOR_TTL_MS: z.coerce.number().int().positive().default(3600000)
 });
 
 const parsed = schema.safeParse(process.env);
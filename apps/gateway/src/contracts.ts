@@ -35,6 +35,28 @@ export interface AIEngineRequest {
   message: string;
   uploads: UploadArtifact[];
   history: ConversationTurn[];
+  /** 1: `history` holds only the transcript turns from index `historyBase` on. */
+  historyProtocol?: number;
+  historyBase?: number;
+}
+
+export interface UploadDescriptor {
+  fileName: string;
+  mimeType: string;
+}
+
+export interface AIEngineClassifyRequest {
+  userId: string;
+  role: EduvaneRole;
+  sessionId: string;
+  message: string;
+  uploads: UploadDescriptor[];
+}
+
+export interface AIEngineClassifyResponse {
+  sessionId: string;
+  intent: EduvaneIntent;
+  role: EduvaneRole;
 }
 
 export interface HandwritingFeedback {
@@ -45,6 +67,20 @@ export interface HandwritingFeedback {
   suggestions: string[];
 }
 
+/** Comparison of an analysis attempt with the previous attempt and the session's running averages. */
+export interface ProgressReport {
+  attempt: number;
+  resolvedGaps: string[];
+  newGaps: string[];
+  persistentGaps: string[];
+  recurringGaps: string[];
+  gapLoad: number;
+  gapLoadChange: number;
+  gapLoadVsAverage: number;
+  handwritingChange?: Record<string, number> | null;
+  handwritingVsAverage?: Record<string, number> | null;
+}
+
 export interface AIEngineResponse {
   sessionId: string;
   intent: EduvaneIntent;
@@ -53,6 +89,9 @@ export interface AIEngineResponse {
   followUpSuggestion?: string;
   generatedQuestions?: string[];
   handwritingFeedback?: HandwritingFeedback;
+  progress?: ProgressReport | null;
+  /** Transcript length the engine holds after this exchange; null asks for a full window next time. */
+  historyCursor?: number | null;
 }
 
 export interface RealizationRequest {
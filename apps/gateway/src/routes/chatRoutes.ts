@@ -4,17 +4,30 @@
  * Notes: Keep exports focused and update comments when behavior changes.
  */
 
+import { randomUUID } from "node:crypto";
 import { Router } from "express";
 import { z } from "zod";
-import { requestAIEngine } from "../clients/aiEngineClient.js";
+import {
+  AIEngineBusyError,
+  classifyAIEngineIntent,
+  requestAIEngine
+} from "../clients/aiEngineClient.js";
 import { GatewayChatRequest } from "../contracts.js";
 import {
   getConversationHistory,
   listConversationSummaries,
   saveConversationExchange
 } from "../services/historyStore.js";
+import {
+  clearHistoryCursor,
+  getHistoryCursor,
+  setHistoryCursor
+} from "../services/historyCursorMemory.js";
 import { realizeLinguisticResponse } from "../services/linguisticRealizer.js";
-import { shapeAIRequest } from "../services/requestShaper.js";
+import {
+  shapeAIRequest,
+  shapeClassifyRequest
+} from "../services/requestShaper.js";
 
 const uploadSchema = z.object({
   fileName: z.string().min(1),
@@ -84,16 +97,16 @@ chatRouter.post("/intent", async (request, response) => {
 
   try {
     const body = parsed.data as GatewayChatRequest;
-    const aiRequest = shapeAIRequest({
-      body,
-      session: request.eduSession,
-      history: []
-    });
-    const aiResponse = await requestAIEngine(aiRequest);
+    const classification = await classifyAIEngineIntent(
+      shapeClassifyRequest({
+        body,
+        session: request.eduSession
+      })
+    );
 
     response.json({
-      intent: aiResponse.intent,
-      role: aiResponse.role
+      intent: classification.intent,
+      role: classification.role
     });
   } catch (error) {
     response.status(502).json({
@@ -124,9 +137,15 @@ chatRouter.post("/respond", async (request, response) => {
     const aiRequest = shapeAIRequest({
       body,
       session: request.eduSession,
-      history: priorTurns
+      history: priorTurns,
+      historyCursor: getHistoryCursor(request.eduSession.userId, body.sessionId)
+    });
+    // Clients may send their own key so their retries also reach the engine's replay cache.
+    const { historyCursor, ...aiResponse } = await requestAIEngine(aiRequest, {
+      idempotencyKey: request.header("idempotency-key") || randomUUID()
     });
-    const aiResponse = await requestAIEngine(aiRequest);
+    // Cleared until the exchange is saved: the engine's cursor counts this exchange, the transcript does not yet.
+    clearHistoryCursor(request.eduSession.userId, body.sessionId);
     const recentOutputs = priorTurns
       .filter((turn) => turn.role === "assistant")
       .map((turn) => turn.content)
@@ -159,9 +178,20 @@ chatRouter.post("/respond", async (request, response) => {
       userMessage: body.message.trim() || "Uploaded student work for analysis.",
       assistantMessage: finalResponse.responseText
     });
+    if (typeof historyCursor === "number") {
+      setHistoryCursor(request.eduSession.userId, body.sessionId, historyCursor);
+    }
+    // Otherwise the engine lost or never had this history, and the next request resends a full window.
 
     response.json(finalResponse);
   } catch (error) {
+    if (error instanceof AIEngineBusyError) {
+      response.setHeader("Retry-After", String(error.retryAfterSeconds));
+      response.status(503).json({
+        error: "Eduvane is busy right now. Please retry shortly."
+      });
+      return;
+    }
     response.status(502).json({
       error: "Unable to complete Eduvane orchestration request."
     });
@@ -0,0 +1,54 @@
+/**
+ * Overview: historyCursorMemory.ts
+ * Purpose: Remembers how much of each conversation transcript the AI engine already holds.
+ * Notes: Cursors are hints; a missing, evicted or stale cursor only makes the next request resend a full history window.
+ */
+
+import { env } from "../config/env.js";
+
+type CursorEntry = {
+  cursor: number;
+  expiresAt: number;
+};
+
+// Map iteration follows insertion order, so re-inserting on access keeps the least recent entry first.
+const historyCursors = new Map<string, CursorEntry>();
+
+function key(userId: string, sessionId: string): string {
+  return `${userId}::${sessionId}`;
+}
+
+function evictOverflow(): void {
+  while (historyCursors.size > env.HISTORY_CURSOR_MAX_ENTRIES) {
+    const oldest = historyCursors.keys().next();
+    if (oldest.done) {
+      return;
+    }
+    historyCursors.delete(oldest.value);
+  }
+}
+
+export function setHistoryCursor(userId: string, sessionId: string, cursor: number): void {
+  const cursorKey = key(userId, sessionId);
+  historyCursors.delete(cursorKey);
+  historyCursors.set(cursorKey, { cursor, expiresAt: Date.now() + env.HISTORY_CURSOR_TTL_MS });
+  evictOverflow();
+}
+
+export function getHistoryCursor(userId: string, sessionId: string): number | undefined {
+  const cursorKey = key(userId, sessionId);
+  const entry = historyCursors.get(cursorKey);
+  if (!entry) {
+    return undefined;
+  }
+  historyCursors.delete(cursorKey);
+  if (entry.expiresAt <= Date.now()) {
+    return undefined;
+  }
+  historyCursors.set(cursorKey, entry);
+  return entry.cursor;
+}
+
+export function clearHistoryCursor(userId: string, sessionId: string): void {
+  historyCursors.delete(key(userId, sessionId));
+}
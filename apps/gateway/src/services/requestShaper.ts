@@ -5,23 +5,53 @@
  */
 
 import {
+  AIEngineClassifyRequest,
   AIEngineRequest,
   ConversationTurn,
   GatewayChatRequest
 } from "../contracts.js";
 import { EduSessionContext } from "../session.js";
 
+export const HISTORY_PROTOCOL_VERSION = 1;
+// The engine keeps at most this many turns per session, so a resync never needs more.
+const ENGINE_TURN_WINDOW = 40;
+
 export function shapeAIRequest(input: {
   body: GatewayChatRequest;
   session: EduSessionContext;
   history: ConversationTurn[];
+  historyCursor?: number;
 }): AIEngineRequest {
+  // With a cursor, only turns the engine has not seen are sent (usually none).
+  const base =
+    input.historyCursor === undefined
+      ? Math.max(0, input.history.length - ENGINE_TURN_WINDOW)
+      : Math.min(input.historyCursor, input.history.length);
   return {
     userId: input.session.userId,
     role: input.session.role,
     sessionId: input.body.sessionId,
     message: input.body.message,
     uploads: input.body.uploads,
-    history: input.history.slice(-12)
+    history: input.history.slice(base),
+    historyProtocol: HISTORY_PROTOCOL_VERSION,
+    historyBase: base
+  };
+}
+
+export function shapeClassifyRequest(input: {
+  body: GatewayChatRequest;
+  session: EduSessionContext;
+}): AIEngineClassifyRequest {
+  // Classification only needs upload metadata; bodies stay in the gateway.
+  return {
+    userId: input.session.userId,
+    role: input.session.role,
+    sessionId: input.body.sessionId,
+    message: input.body.message,
+    uploads: input.body.uploads.map((upload) => ({
+      fileName: upload.fileName,
+      mimeType: upload.mimeType
+    }))
   };
 }
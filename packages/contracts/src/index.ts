@@ -32,6 +32,25 @@ export interface AIEngineRequest {
   history: ConversationTurn[];
 }
 
+export interface UploadDescriptor {
+  fileName: string;
+  mimeType: string;
+}
+
+export interface AIEngineClassifyRequest {
+  userId: string;
+  role: EduvaneRole;
+  sessionId: string;
+  message: string;
+  uploads: UploadDescriptor[];
+}
+
+export interface AIEngineClassifyResponse {
+  sessionId: string;
+  intent: EduvaneIntent;
+  role: EduvaneRole;
+}
+
 export interface HandwritingFeedback {
   legibility: string;
   lineConsistency: string;